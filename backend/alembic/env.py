@@ -14,6 +14,11 @@ import models.invoice
 import models.log
 import models.stock
 import models.WarehouseDoc
+import models.reservation
+import models.counter
+import models.payu_notification
+import models.idempotency
+import models.job
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
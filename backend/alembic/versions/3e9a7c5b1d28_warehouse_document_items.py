@@ -0,0 +1,125 @@
+"""Add warehouse_document_items, backfill it from warehouse_documents.items_json and drop the JSON column
+
+Revision ID: 3e9a7c5b1d28
+Revises: 8f3c2a6d4e17
+Create Date: 2026-10-19 23:18:52.640217
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '3e9a7c5b1d28'
+down_revision: Union[str, Sequence[str], None] = '8f3c2a6d4e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _parse_lines(items_json):
+    # Same tolerance as the old JSON readers: unparsable documents have no lines
+    try:
+        data = json.loads(items_json or "[]")
+    except ValueError:
+        return []
+    lines = []
+    for it in data if isinstance(data, list) else []:
+        if not isinstance(it, dict):
+            continue
+        try:
+            quantity = float(it.get("quantity") or it.get("qty") or 0)
+        except (TypeError, ValueError):
+            quantity = 0.0
+        lines.append({
+            "product_name": it.get("product_name") or "Nieznany produkt",
+            "product_code": it.get("product_code"),
+            "quantity": quantity,
+            "location": it.get("location"),
+        })
+    return lines
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'warehouse_document_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=True),
+        sa.Column('product_name', sa.String(), nullable=False),
+        sa.Column('product_code', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['warehouse_documents.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index(op.f('ix_warehouse_document_items_id'), 'warehouse_document_items', ['id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_warehouse_document_items_document_id'), 'warehouse_document_items', ['document_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_wz_items_product_document', 'warehouse_document_items', ['product_id', 'document_id'], unique=False, if_not_exists=True)
+
+    # Backfill in id batches; documents that already have lines (written by a newer app) are skipped.
+    # The JSON lines carry no product id, it is resolved by product code.
+    bind = op.get_bind()
+    product_ids = dict(bind.execute(sa.text("SELECT code, id FROM products")).fetchall())
+    items = sa.table(
+        'warehouse_document_items',
+        sa.column('document_id', sa.Integer), sa.column('product_id', sa.Integer), sa.column('product_name', sa.String),
+        sa.column('product_code', sa.String), sa.column('quantity', sa.Float), sa.column('location', sa.String),
+    )
+    last_id = 0
+    while True:
+        docs = bind.execute(
+            sa.text(
+                "SELECT id, items_json FROM warehouse_documents AS wd WHERE id > :last_id "
+                "AND NOT EXISTS (SELECT 1 FROM warehouse_document_items AS i WHERE i.document_id = wd.id) "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not docs:
+            break
+        rows = [
+            dict(line, document_id=doc_id, product_id=product_ids.get(line["product_code"]))
+            for doc_id, items_json in docs
+            for line in _parse_lines(items_json)
+        ]
+        if rows:
+            op.bulk_insert(items, rows)
+        last_id = docs[-1][0]
+
+    with op.batch_alter_table('warehouse_documents') as batch_op:
+        batch_op.drop_column('items_json')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('warehouse_documents') as batch_op:
+        batch_op.add_column(sa.Column('items_json', sa.Text(), nullable=True))
+
+    # Rebuild the JSON from the lines (same keys the old writers used)
+    bind = op.get_bind()
+    lines = {}
+    for doc_id, name, code, quantity, location in bind.execute(sa.text(
+        "SELECT document_id, product_name, product_code, quantity, location FROM warehouse_document_items ORDER BY id"
+    )):
+        lines.setdefault(doc_id, []).append(
+            {"product_name": name, "product_code": code, "quantity": quantity, "location": location}
+        )
+    for doc_id, doc_lines in lines.items():
+        bind.execute(
+            sa.text("UPDATE warehouse_documents SET items_json = :items_json WHERE id = :id"),
+            {"items_json": json.dumps(doc_lines), "id": doc_id},
+        )
+    bind.execute(sa.text("UPDATE warehouse_documents SET items_json = '[]' WHERE items_json IS NULL"))
+
+    op.drop_index('ix_wz_items_product_document', table_name='warehouse_document_items')
+    op.drop_index(op.f('ix_warehouse_document_items_document_id'), table_name='warehouse_document_items')
+    op.drop_index(op.f('ix_warehouse_document_items_id'), table_name='warehouse_document_items')
+    op.drop_table('warehouse_document_items')
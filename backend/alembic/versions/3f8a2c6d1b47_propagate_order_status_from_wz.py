@@ -0,0 +1,49 @@
+"""Propagate order status from WZ and index order lookups
+
+Revision ID: 3f8a2c6d1b47
+Revises: da4d563a80ee
+Create Date: 2026-10-19 11:05:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# Revision identifiers used by Alembic
+revision: str = '3f8a2c6d1b47'
+down_revision: Union[str, Sequence[str], None] = 'da4d563a80ee'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Index the per-user order list and the invoice -> WZ join (some databases already have the first one)
+    op.create_index(op.f('ix_orders_user_id'), 'orders', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_warehouse_documents_invoice_id'), 'warehouse_documents', ['invoice_id'], unique=False, if_not_exists=True)
+
+    # One-time backfill of statuses previously synced on every GET /orders
+    op.execute("""
+        UPDATE orders SET status = 'shipped'
+        WHERE status != 'shipped' AND id IN (
+            SELECT i.order_id FROM invoices i
+            JOIN warehouse_documents w ON w.invoice_id = i.id
+            WHERE w.status = 'RELEASED' AND i.order_id IS NOT NULL
+        )
+    """)
+    op.execute("""
+        UPDATE orders SET status = 'cancelled'
+        WHERE status != 'cancelled' AND id IN (
+            SELECT i.order_id FROM invoices i
+            JOIN warehouse_documents w ON w.invoice_id = i.id
+            WHERE w.status = 'CANCELLED' AND i.order_id IS NOT NULL
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Status backfill is not reverted; only the indexes are dropped
+    op.drop_index(op.f('ix_warehouse_documents_invoice_id'), table_name='warehouse_documents', if_exists=True)
+    op.drop_index(op.f('ix_orders_user_id'), table_name='orders', if_exists=True)
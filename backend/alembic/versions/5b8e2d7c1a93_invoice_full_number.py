@@ -0,0 +1,43 @@
+"""Store invoices.full_number (indexed) and backfill it
+
+Revision ID: 5b8e2d7c1a93
+Revises: 9d4b61e7a2f5
+Create Date: 2026-10-19 22:03:41.208514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '5b8e2d7c1a93'
+down_revision: Union[str, Sequence[str], None] = '9d4b61e7a2f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('invoices', sa.Column('full_number', sa.String(), nullable=True))
+
+    # Same rules as models.invoice.format_full_number: INV-{number or id};
+    # corrections use the corrected invoice's number (or id) plus /FK, /FK1, ...
+    op.execute(
+        "UPDATE invoices SET full_number = 'INV-' || COALESCE(NULLIF(number, 0), id) "
+        "WHERE full_number IS NULL AND (is_correction = 0 OR is_correction IS NULL)"
+    )
+    op.execute(
+        "UPDATE invoices SET full_number = 'INV-' || COALESCE("
+        "(SELECT NULLIF(p.number, 0) FROM invoices AS p WHERE p.id = invoices.parent_id), parent_id) || "
+        "CASE WHEN COALESCE(correction_seq, 1) = 1 THEN '/FK' ELSE '/FK' || (correction_seq - 1) END "
+        "WHERE full_number IS NULL AND is_correction = 1"
+    )
+    op.create_index('ix_invoices_full_number', 'invoices', ['full_number'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_invoices_full_number', table_name='invoices')
+    op.drop_column('invoices', 'full_number')
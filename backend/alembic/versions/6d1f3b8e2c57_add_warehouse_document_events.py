@@ -0,0 +1,39 @@
+"""Add outbox of WZ events for the live warehouse feed
+
+Revision ID: 6d1f3b8e2c57
+Revises: 3e9a7c5b1d28
+Create Date: 2026-10-20 09:42:17.305914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '6d1f3b8e2c57'
+down_revision: Union[str, Sequence[str], None] = '3e9a7c5b1d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'warehouse_document_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('origin', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index(op.f('ix_warehouse_document_events_created_at'), 'warehouse_document_events', ['created_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_warehouse_document_events_created_at'), table_name='warehouse_document_events')
+    op.drop_table('warehouse_document_events')
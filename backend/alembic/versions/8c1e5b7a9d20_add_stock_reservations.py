@@ -0,0 +1,51 @@
+"""Add stock_reservations table for checkout holds
+
+Revision ID: 8c1e5b7a9d20
+Revises: 3f8a2c6d1b47
+Create Date: 2026-10-19 13:42:07.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '8c1e5b7a9d20'
+down_revision: Union[str, Sequence[str], None] = '3f8a2c6d1b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('qty', sa.Float(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index(op.f('ix_stock_reservations_id'), 'stock_reservations', ['id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_stock_reservations_order_id'), 'stock_reservations', ['order_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_stock_reservations_product_status_expires', 'stock_reservations', ['product_id', 'status', 'expires_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_stock_reservations_status_expires', 'stock_reservations', ['status', 'expires_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_reservations_status_expires', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_product_status_expires', table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_order_id'), table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_id'), table_name='stock_reservations')
+    op.drop_table('stock_reservations')
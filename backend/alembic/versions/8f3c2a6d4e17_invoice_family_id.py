@@ -0,0 +1,34 @@
+"""Store invoices.family_id with a (family_id, is_correction, id) index
+
+Revision ID: 8f3c2a6d4e17
+Revises: 5b8e2d7c1a93
+Create Date: 2026-10-19 22:41:07.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '8f3c2a6d4e17'
+down_revision: Union[str, Sequence[str], None] = '5b8e2d7c1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('invoices', sa.Column('family_id', sa.Integer(), nullable=True))
+    # Corrections are listed under the corrected invoice, everything else under itself
+    op.execute("UPDATE invoices SET family_id = COALESCE(parent_id, id) WHERE family_id IS NULL")
+    op.create_index(
+        'ix_invoices_family_order', 'invoices', ['family_id', 'is_correction', 'id'], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_invoices_family_order', table_name='invoices')
+    op.drop_column('invoices', 'family_id')
@@ -0,0 +1,39 @@
+"""Add carts.updated_at and indexes for open-cart lookup and cleanup
+
+Revision ID: 9d4b61e7a2f5
+Revises: c7e3a9b24f60
+Create Date: 2026-10-19 21:14:02.665318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = '9d4b61e7a2f5'
+down_revision: Union[str, Sequence[str], None] = 'c7e3a9b24f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE carts SET updated_at = created_at WHERE updated_at IS NULL")
+
+    # The composite index replaces the single-column ones (user_id is its prefix)
+    op.drop_index('ix_carts_status', table_name='carts', if_exists=True)
+    op.drop_index('ix_carts_user_id', table_name='carts', if_exists=True)
+    op.create_index('ix_carts_user_id_status', 'carts', ['user_id', 'status'], unique=False, if_not_exists=True)
+    op.create_index('ix_carts_status_updated_at', 'carts', ['status', 'updated_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carts_status_updated_at', table_name='carts')
+    op.drop_index('ix_carts_user_id_status', table_name='carts')
+    op.create_index('ix_carts_user_id', 'carts', ['user_id'], unique=False)
+    op.create_index('ix_carts_status', 'carts', ['status'], unique=False)
+    op.drop_column('carts', 'updated_at')
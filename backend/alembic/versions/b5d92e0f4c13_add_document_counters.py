@@ -0,0 +1,41 @@
+"""Add document_counters table for invoice numbering
+
+Revision ID: b5d92e0f4c13
+Revises: 8c1e5b7a9d20
+Create Date: 2026-10-19 15:18:44.206117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = 'b5d92e0f4c13'
+down_revision: Union[str, Sequence[str], None] = '8c1e5b7a9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'document_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('period', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name', 'period'),
+        if_not_exists=True,
+    )
+    # Continue numbering from the highest regular invoice number issued so far
+    op.execute("""
+        INSERT INTO document_counters (name, period, value)
+        SELECT 'invoice', 0, COALESCE(MAX(number), 0) FROM invoices
+        WHERE is_correction = 0 OR is_correction IS NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('document_counters')
@@ -0,0 +1,54 @@
+"""Add jobs table for the background job queue
+
+Revision ID: c7e3a9b24f60
+Revises: 4a6f0d2c8e31
+Create Date: 2026-10-19 19:31:48.082651
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = 'c7e3a9b24f60'
+down_revision: Union[str, Sequence[str], None] = '4a6f0d2c8e31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('leased_until', sa.DateTime(), nullable=True),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_jobs_kind'), 'jobs', ['kind'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_state_priority_run_at', 'jobs', ['state', 'priority', 'run_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_state_leased_until', 'jobs', ['state', 'leased_until'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_state_leased_until', table_name='jobs')
+    op.drop_index('ix_jobs_state_priority_run_at', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_kind'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,52 @@
+"""Add payu_notifications table for webhook deduplication
+
+Revision ID: e2a7c4f19b85
+Revises: b5d92e0f4c13
+Create Date: 2026-10-19 16:52:31.774460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Revision identifiers used by Alembic
+revision: str = 'e2a7c4f19b85'
+down_revision: Union[str, Sequence[str], None] = 'b5d92e0f4c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'payu_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('payu_order_id', sa.String(), nullable=False),
+        sa.Column('payu_status', sa.String(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('ip', sa.String(length=64), nullable=True),
+        sa.Column('state', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('payu_order_id', 'payu_status', name='uq_payu_notifications_order_status'),
+        if_not_exists=True,
+    )
+    op.create_index(op.f('ix_payu_notifications_id'), 'payu_notifications', ['id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_payu_notifications_order_id'), 'payu_notifications', ['order_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_payu_notifications_state_next_attempt', 'payu_notifications', ['state', 'next_attempt_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payu_notifications_state_next_attempt', table_name='payu_notifications')
+    op.drop_index(op.f('ix_payu_notifications_order_id'), table_name='payu_notifications')
+    op.drop_index(op.f('ix_payu_notifications_id'), table_name='payu_notifications')
+    op.drop_table('payu_notifications')
@@ -0,0 +1,122 @@
+# backend/benchmark_pdf.py
+"""
+PDF rendering benchmark: documents per second for invoices, correction
+invoices and WZ documents, rendered in memory from synthetic data (no
+database access).
+
+Each kind is timed twice: "inline" draws the static elements directly on
+the page, as the renderers did before they were moved into utils/pdf.py,
+and "forms" records them as form XObjects, as utils/pdf.py does now.
+
+The shared module is a refactor with no measurable performance effect.
+Fonts were already registered once per process before it, and a form
+XObject belongs to one PDF document, so it only saves drawing commands
+where an element repeats within a document (the two tables of a
+correction, wave header on every page). Expect both columns to agree
+within run-to-run noise; rendering time goes to ReportLab's document
+serialization (TTF subsetting and number formatting).
+
+    python benchmark_pdf.py [--docs N] [--lines N] [--rounds N]
+"""
+import argparse
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils import pdf
+from utils.pdf import init_fonts, render_invoice_pdf, render_wz_pdf
+
+COMPANY = {"name": "Hurtownia Budowlana Sp. z o.o.", "nip": "5250000000", "address": "ul. Składowa 1, 00-001 Warszawa",
+           "phone": "+48 22 000 00 00", "email": "biuro@example.pl"}
+
+
+def _invoice(invoice_id: int, lines: int, parent=None) -> SimpleNamespace:
+    items = [
+        SimpleNamespace(product_id=i, product_name=f"Cement portlandzki CEM II 25kg, partia {i}", quantity=i % 7 + 1,
+                        price_net=21.5, tax_rate=23.0, total_net=21.5 * (i % 7 + 1), total_gross=26.45 * (i % 7 + 1))
+        for i in range(1, lines + 1)
+    ]
+    total_net = sum(it.total_net for it in items)
+    total_gross = sum(it.total_gross for it in items)
+    return SimpleNamespace(
+        id=invoice_id, full_number=f"INV-{invoice_id}" + ("/FK" if parent else ""), created_at=datetime(2026, 10, 19, 12, 0),
+        buyer_name="Budowa Kowalski", buyer_nip="1130000000", buyer_address="ul. Długa 5, 31-000 Kraków",
+        total_net=total_net, total_vat=total_gross - total_net, total_gross=total_gross,
+        is_correction=parent is not None, correction_reason="Zwrot towaru" if parent else None, parent=parent, items=items,
+    )
+
+
+def _wz(doc_id: int, lines: int) -> SimpleNamespace:
+    items = [
+        SimpleNamespace(product_name=f"Cement portlandzki CEM II 25kg, partia {i}", product_code=f"CEM-{i:04d}",
+                        quantity=i % 7 + 1, location=f"A-{i % 12:02d}-{i % 5:02d}")
+        for i in range(1, lines + 1)
+    ]
+    return SimpleNamespace(id=doc_id, created_at=datetime(2026, 10, 19, 12, 0), buyer_name="Budowa Kowalski",
+                           shipping_address="ul. Długa 5, 31-000 Kraków", items=items)
+
+
+@contextmanager
+def _inline_static_elements():
+    # Draw the static elements directly, without form XObjects (the renderers before the refactor)
+    def draw_inline(c, name, draw, x=0, y=0, bbox=None):
+        c.saveState()
+        c.translate(x, y)
+        draw(c)
+        c.restoreState()
+
+    static_form = pdf._static_form
+    pdf._static_form = draw_inline
+    try:
+        yield
+    finally:
+        pdf._static_form = static_form
+
+
+def _best_of(docs: int, render, rounds: int):
+    # Best of `rounds` runs, so background noise does not skew the comparison
+    elapsed = float("inf")
+    for _ in range(rounds):
+        sizes = 0
+        start = time.perf_counter()
+        for i in range(docs):
+            sizes += len(render(i))
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return docs / elapsed, sizes / docs / 1024
+
+
+def _measure(label: str, docs: int, render, rounds: int) -> None:
+    with _inline_static_elements():
+        inline_rate, inline_size = _best_of(docs, render, rounds)
+    forms_rate, forms_size = _best_of(docs, render, rounds)
+    print(f"{label:<12} {inline_rate:8.1f} {forms_rate:8.1f} docs/s   x{forms_rate / inline_rate:4.2f}"
+          f"   {inline_size:6.1f} {forms_size:6.1f} KiB/doc")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDF rendering benchmark")
+    parser.add_argument("--docs", type=int, default=200, help="Documents rendered per kind")
+    parser.add_argument("--lines", type=int, default=10, help="Line items per document")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per kind (best is reported)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    init_fonts()
+    print(f"Font registration: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)")
+
+    invoice = _invoice(1, args.lines)
+    correction = _invoice(2, args.lines, parent=invoice)
+    wz = _wz(1, args.lines)
+    print(f"{'':<12} {'inline':>8} {'forms':>8}")
+    _measure("invoice", args.docs, lambda i: render_invoice_pdf(invoice, invoice.items, company=COMPANY), args.rounds)
+    _measure("correction", args.docs, lambda i: render_invoice_pdf(correction, correction.items, company=COMPANY), args.rounds)
+    _measure("wz", args.docs, lambda i: render_wz_pdf(wz), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# backend/compact_storage.py
+"""
+Reclaims space taken by generated PDFs (storage/invoices, storage/wz).
+
+Removes temp leftovers, PDFs of deleted documents and superseded invoice
+and WZ versions, then applies PDF_STORAGE_QUOTA_MB. Pinned copies of issued
+invoices are never removed. All removed files are regenerated on demand.
+
+    python compact_storage.py [--dry-run] [--purge-cache]
+
+--purge-cache drops every regenerable PDF, e.g. to have old uncompressed
+files re-rendered with page compression.
+"""
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import SessionLocal
+from models.invoice import Invoice
+from models.WarehouseDoc import WarehouseDocument
+# Models referenced by relationships of the two above
+from models import product, order, users  # noqa: F401
+from utils.audit import write_log
+from utils.pdf_storage import compact, storage_stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact generated PDF storage")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--purge-cache", action="store_true", help="Remove every regenerable PDF (pinned copies stay)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        invoice_ids = {row.id for row in db.query(Invoice.id)}
+        wz_ids = {row.id for row in db.query(WarehouseDocument.id)}
+        before = storage_stats()["cache_bytes"]
+        stats = compact(invoice_ids, wz_ids, purge_cache=args.purge_cache, dry_run=args.dry_run)
+        stats["cache_bytes_before"] = before
+        stats["cache_bytes_after"] = storage_stats()["cache_bytes"]
+        if not args.dry_run:
+            write_log(db, user_id=None, action="PDF_STORAGE_COMPACT", resource="storage", status="SUCCESS", meta=stats)
+        print(json.dumps(stats, indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,82 @@ class Settings(BaseSettings):
     # Public backend URL used for PayU notifications (webhook)
     BACKEND_URL: str = "http://127.0.0.1:8000"
 
+    # PayU HTTP client: timeouts, connection pool and OAuth token refresh margin
+    PAYU_TIMEOUT_SECONDS: float = 15.0
+    PAYU_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    PAYU_MAX_CONNECTIONS: int = 20
+    PAYU_KEEPALIVE_SECONDS: float = 30.0
+    PAYU_TOKEN_REFRESH_MARGIN_SECONDS: int = 60
+
+    # PayU notification processing: retry schedule and sweep interval
+    PAYU_NOTIFY_MAX_ATTEMPTS: int = 5
+    PAYU_NOTIFY_RETRY_SECONDS: int = 30
+    PAYU_NOTIFY_SWEEP_SECONDS: int = 15
+
+    # Idempotency-Key records: retention, in-flight lock lease and max wait for a duplicate
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_LOCK_SECONDS: int = 120
+    IDEMPOTENCY_WAIT_SECONDS: int = 30
+    IDEMPOTENCY_PURGE_SECONDS: int = 3600
+
+    # Job queue: embedded worker in the API process, polling, leases, retries and retention
+    JOBS_EMBEDDED_WORKER: bool = True
+    JOBS_POLL_SECONDS: float = 1.0
+    JOBS_VISIBILITY_TIMEOUT_SECONDS: int = 300
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: int = 10
+    JOBS_RETRY_MAX_SECONDS: int = 3600
+    JOBS_RETENTION_HOURS: int = 72
+    JOBS_PURGE_SECONDS: int = 3600
+
+    # Cart cleanup: idle open carts expire, ordered/expired carts are deleted after retention
+    CART_IDLE_EXPIRY_DAYS: int = 30
+    CART_RETENTION_DAYS: int = 30
+    CART_CLEANUP_BATCH_SIZE: int = 500
+    CART_CLEANUP_MAX_BATCHES: int = 20
+    CART_CLEANUP_SECONDS: int = 3600
+
+    # PDF downloads: on-demand renders up to this size are served from memory without a disk copy
+    # (larger ones are cached); browser reuse time before revalidating with the ETag
+    PDF_MEMORY_MAX_BYTES: int = 1048576
+    PDF_BROWSER_MAX_AGE_SECONDS: int = 300
+
+    # PDF storage: page compression, quota of regenerable PDFs (LRU eviction) and the eviction sweep interval
+    PDF_PAGE_COMPRESSION: bool = True
+    PDF_STORAGE_QUOTA_MB: int = 1024
+    PDF_STORAGE_SWEEP_SECONDS: int = 900
+
+    # Bulk invoice PDF export: render processes (0 = one per core), invoices loaded per batch, status retention
+    INVOICE_EXPORT_WORKERS: int = 0
+    INVOICE_EXPORT_BATCH_SIZE: int = 100
+    INVOICE_EXPORT_MAX_INVOICES: int = 20000
+    INVOICE_EXPORT_STATUS_TTL_SECONDS: int = 3600
+
+    # JPK_FA export: tax office code and seller address parts the company record does not hold
+    # (street, house number, postal code and city are taken from the company address)
+    JPK_TAX_OFFICE_CODE: str = ""
+    JPK_SELLER_VOIVODESHIP: str = ""
+    JPK_SELLER_COUNTY: str = ""
+    JPK_SELLER_COMMUNE: str = ""
+    JPK_BATCH_SIZE: int = 500
+
+    # Wave picking: maximum number of WZ documents picked in one wave
+    WAVE_MAX_DOCUMENTS: int = 200
+    # Bulk WZ status change: maximum number of documents per request
+    WZ_BULK_STATUS_MAX_DOCUMENTS: int = 1000
+    # Live WZ counter/feed: recount from the database every N seconds, keep-alive interval of the SSE stream
+    WZ_COUNTER_RESYNC_SECONDS: int = 60
+    WZ_FEED_KEEPALIVE_SECONDS: int = 15
+    # Live WZ feed: how long committed events stay in the outbox, and how often old ones are purged
+    WZ_FEED_EVENT_RETENTION_SECONDS: int = 3600
+    WZ_FEED_PURGE_SECONDS: int = 600
+    # Live WZ feed: lifetime of the query-string token (EventSource cannot send an Authorization header)
+    WZ_FEED_TOKEN_SECONDS: int = 60
+
+    # Checkout stock reservations: hold lifetime and expiry sweep interval
+    RESERVATION_TTL_MINUTES: int = 30
+    RESERVATION_SWEEP_SECONDS: int = 60
+
     class Config:
         env_file: ClassVar[str] = str(env_path)
 
@@ -1,4 +1,6 @@
 # backend/main.py
+import os
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -28,6 +30,13 @@ from routes.payu import router as payu_router
 # Import stock management router
 from routes.stock import router as stock_router 
 
+from utils.recommender import shutdown_pool as shutdown_recommender_pool
+from utils.invoice_export import shutdown_pool as shutdown_export_pool
+from utils.pdf import init_fonts
+from utils.payu_client import payu_client
+from worker import run_worker
+from config import settings
+
 # Initialize database and create tables
 init_db()
 Base.metadata.create_all(bind=engine)
@@ -67,6 +76,40 @@ app.include_router(payu_router)
 # Register stock router with specific prefix
 app.include_router(stock_router, prefix="/stock") 
 
+_worker_stop = threading.Event()
+_worker_threads = []
+
+# Register PDF fonts once, before the first document is rendered
+@app.on_event("startup")
+async def init_pdf_fonts():
+    try:
+        init_fonts()
+    except ImportError as e:
+        print(f"PDF rendering unavailable: {e}")
+
+# Start the embedded worker thread: the live WZ feed, plus jobs and periodic maintenance unless JOBS_EMBEDDED_WORKER is off
+@app.on_event("startup")
+async def start_background_workers():
+    _worker_stop.clear()
+    embedded = settings.JOBS_EMBEDDED_WORKER
+    thread = threading.Thread(
+        target=run_worker, args=(_worker_stop, f"api-{os.getpid()}"),
+        kwargs={"run_periodic": embedded, "run_jobs": embedded, "serve_feed": True}, daemon=True,
+    )
+    thread.start()
+    _worker_threads.append(thread)
+
+# Release background resources on shutdown
+@app.on_event("shutdown")
+async def shutdown_background_workers():
+    _worker_stop.set()
+    for thread in _worker_threads:
+        thread.join(timeout=5)
+    _worker_threads.clear()
+    shutdown_recommender_pool()
+    shutdown_export_pool()
+    await payu_client.aclose()
+
 @app.get("/")
 def read_root():
     return {"message": "Warehouse App API działa!"}
\ No newline at end of file
@@ -1,6 +1,7 @@
 # backend/models/WarehouseDoc.py
 import enum
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum, func
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Enum, Index, JSON, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -16,12 +17,43 @@ class WarehouseDocument(Base):
     __tablename__ = "warehouse_documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=True) # Reference to the associated invoice
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True, nullable=True) # Reference to the associated invoice
     buyer_name = Column(String, nullable=True)
     shipping_address = Column(String, nullable=True) 
     invoice_date = Column(DateTime(timezone=True), nullable=True)
     status = Column(Enum(WarehouseStatus), default=WarehouseStatus.NEW) # Current status of the document
-    items_json = Column(Text, nullable=True) # Serialized JSON string of items included in the document
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    invoice = relationship("Invoice", back_populates="warehouse_doc")
\ No newline at end of file
+    invoice = relationship("Invoice", back_populates="warehouse_doc")
+    items = relationship("WarehouseDocumentItem", back_populates="document", cascade="all, delete-orphan",
+                         order_by="WarehouseDocumentItem.id")
+
+# Represents a product line to be released on a warehouse document
+class WarehouseDocumentItem(Base):
+    __tablename__ = "warehouse_document_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("warehouse_documents.id"), index=True, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True) # Null for legacy lines whose product no longer exists
+    product_name = Column(String, nullable=False) # Snapshot at issue time, like invoice items
+    product_code = Column(String, nullable=True)
+    quantity = Column(Float, nullable=False) # Same unit as OrderItem.qty, may be fractional
+    location = Column(String, nullable=True)
+
+    document = relationship("WarehouseDocument", back_populates="items")
+
+    # "Which WZs contain product X" / pending quantity per product
+    __table_args__ = (
+        Index("ix_wz_items_product_document", "product_id", "document_id"),
+    )
+
+# Outbox of committed WZ events (created / status), written in the transaction of the change;
+# API processes deliver the ones made elsewhere to their terminals (see utils/wz_feed.py)
+class WarehouseDocumentEvent(Base):
+    __tablename__ = "warehouse_document_events"
+
+    id = Column(Integer, primary_key=True) # Commit order (SQLite has a single writer)
+    payload = Column(JSON, nullable=False)
+    delta = Column(Integer, nullable=False, default=0) # Change of the active (NEW + IN_PROGRESS) count
+    origin = Column(String(100), nullable=False) # Process that committed the change
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True) # UTC, for the purge
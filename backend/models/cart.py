@@ -1,5 +1,5 @@
 # backend/models/cart.py
-from sqlalchemy import Column, Integer, ForeignKey, String, DateTime, Float, UniqueConstraint, func
+from sqlalchemy import Column, Integer, ForeignKey, String, DateTime, Float, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -8,13 +8,21 @@ class Cart(Base):
     __tablename__ = "carts" # Table name
 
     id = Column(Integer, primary_key=True, index=True) # Primary key
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False) # Foreign key to users
-    status = Column(String, default="open", index=True)  # Cart status
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False) # Foreign key to users
+    status = Column(String, default="open")  # Cart status: open, ordered, expired
     created_at = Column(DateTime, server_default=func.now()) # Creation timestamp
+    updated_at = Column(DateTime, nullable=True) # Last change (UTC), drives idle expiry and retention
 
     # One-to-many relationship with cart items
     items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Open-cart lookup done on every cart call (also serves plain user_id lookups)
+        Index("ix_carts_user_id_status", "user_id", "status"),
+        # Cleanup scans by status and age
+        Index("ix_carts_status_updated_at", "status", "updated_at"),
+    )
+
 
 # Represents a single item (product + quantity) within a cart
 class CartItem(Base):
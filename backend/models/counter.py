@@ -0,0 +1,17 @@
+# backend/models/counter.py
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+# Counter names
+INVOICE_COUNTER = "invoice"
+
+# Period value for counters that never reset
+NO_PERIOD = 0
+
+# Monotonic document number sequence, optionally partitioned (e.g. per year)
+class DocumentCounter(Base):
+    __tablename__ = "document_counters"
+
+    name = Column(String, primary_key=True)
+    period = Column(Integer, primary_key=True, default=NO_PERIOD)
+    value = Column(Integer, nullable=False, default=0)
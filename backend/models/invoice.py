@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func, Enum, Boolean, Index, event, select, update
 from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm.attributes import set_committed_value
 from database import Base
 import enum
 
@@ -15,6 +16,7 @@ class Invoice(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     number = Column(Integer, index=True, nullable=True) 
+    full_number = Column(String, index=True, nullable=True) # Printed number, e.g. INV-12 or INV-12/FK (set on insert)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True)
     order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=True)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING, nullable=True)
@@ -38,27 +40,55 @@ class Invoice(Base):
     correction_reason = Column(String, nullable=True)
     parent_id = Column(Integer, ForeignKey("invoices.id"), nullable=True)
     correction_seq = Column(Integer, default=1, nullable=True)
+    # Invoice this one is listed under: coalesce(parent_id, id), set on insert
+    family_id = Column(Integer, nullable=True)
+
+    # Family ordering of the invoice list (corrections right after their invoice), usable for keyset pagination
+    __table_args__ = (
+        Index("ix_invoices_family_order", "family_id", "is_correction", "id"),
+    )
 
     # Relationships
     parent = relationship("Invoice", remote_side=[id], backref=backref("corrections", cascade="all, delete-orphan"))
-    items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
+    items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan", order_by="InvoiceItem.id")
     warehouse_doc = relationship("WarehouseDocument", back_populates="invoice", uselist=False)
 
-    # Generates the formatted invoice number string (handles corrections)
-    @property
-    def full_number(self):
-        if self.is_correction:
-            if self.parent:
-                base_num = self.parent.number if self.parent.number else self.parent.id
-            else:
-                base_num = self.parent_id
-            base = f"INV-{base_num}"
-            seq = self.correction_seq or 1
-            suffix = "/FK" if seq == 1 else f"/FK{seq - 1}"
-            return f"{base}{suffix}"
-        else:
-            num = self.number if self.number else self.id
-            return f"INV-{num}"
+# Formats the invoice number string; corrections use the corrected invoice's number plus a /FK suffix
+def format_full_number(number, is_correction: bool = False, correction_seq=None) -> str:
+    if is_correction:
+        seq = correction_seq or 1
+        suffix = "/FK" if seq == 1 else f"/FK{seq - 1}"
+        return f"INV-{number}{suffix}"
+    return f"INV-{number}"
+
+# full_number and family_id are stored at insert time, so lists neither load parent invoices nor sort on an expression
+@event.listens_for(Invoice, "before_insert")
+def _assign_listing_fields(mapper, connection, target):
+    if target.family_id is None and target.parent_id is not None:
+        target.family_id = target.parent_id
+    if target.full_number:
+        return
+    if target.is_correction:
+        parent_number = connection.execute(
+            select(Invoice.number).where(Invoice.id == target.parent_id)
+        ).scalar()
+        target.full_number = format_full_number(parent_number or target.parent_id, True, target.correction_seq)
+    elif target.number:
+        target.full_number = format_full_number(target.number)
+
+# Values derived from the id (family_id of regular invoices, INV-{id} fallback) are known only after the INSERT
+@event.listens_for(Invoice, "after_insert")
+def _assign_id_derived_fields(mapper, connection, target):
+    values = {}
+    if target.family_id is None:
+        values["family_id"] = target.id
+    if not target.full_number:
+        values["full_number"] = format_full_number(target.id)
+    if not values:
+        return
+    connection.execute(update(Invoice).where(Invoice.id == target.id).values(**values))
+    for key, value in values.items():
+        set_committed_value(target, key, value)
 
 # Represents a line item on an invoice
 class InvoiceItem(Base):
@@ -0,0 +1,43 @@
+# backend/models/job.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+from database import Base
+
+# Job lifecycle states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"  # gave up after max_attempts
+
+# Priorities (higher runs first)
+PRIORITY_LOW = -10
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10
+
+# Unit of deferred work processed by the job worker
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False, index=True)
+    payload = Column(JSON, nullable=True)
+    priority = Column(Integer, default=PRIORITY_NORMAL, nullable=False)
+
+    state = Column(String(20), default=JOB_QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    # All timestamps are UTC
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False) # earliest start (backoff / delay)
+    leased_until = Column(DateTime, nullable=True) # visibility timeout of a running job
+    locked_by = Column(String(100), nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Lease query: next queued job by priority, and running jobs whose lease ran out
+        Index("ix_jobs_state_priority_run_at", "state", "priority", "run_at"),
+        Index("ix_jobs_state_leased_until", "state", "leased_until"),
+    )
@@ -2,11 +2,14 @@ from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, fun
 from sqlalchemy.orm import relationship
 from database import Base
 
+# Paid, but the checkout hold lapsed and the stock was sold meanwhile: needs manual handling
+ORDER_AWAITING_STOCK = "awaiting_stock"
+
 class Order(Base):
     __tablename__ = "orders"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
     status = Column(String, default="pending_payment")
     total_amount = Column(Float, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
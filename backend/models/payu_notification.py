@@ -0,0 +1,33 @@
+# backend/models/payu_notification.py
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, UniqueConstraint, func
+from database import Base
+
+# Processing states of a recorded notification
+NOTIFICATION_PENDING = "pending"
+NOTIFICATION_DONE = "done"
+NOTIFICATION_FAILED = "failed"  # gave up after the maximum number of attempts
+
+# PayU webhook call, stored before acknowledging and processed in the background
+class PayUNotification(Base):
+    __tablename__ = "payu_notifications"
+
+    id = Column(Integer, primary_key=True, index=True)
+    payu_order_id = Column(String, nullable=False)
+    payu_status = Column(String, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=True)
+    payload = Column(Text, nullable=False)
+    ip = Column(String(64), nullable=True)
+
+    state = Column(String, default=NOTIFICATION_PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=False) # UTC; also acts as the processing lease
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # PayU re-sends the same status until acknowledged; process each one once
+        UniqueConstraint("payu_order_id", "payu_status", name="uq_payu_notifications_order_status"),
+        Index("ix_payu_notifications_state_next_attempt", "state", "next_attempt_at"),
+    )
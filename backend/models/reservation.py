@@ -0,0 +1,32 @@
+# backend/models/reservation.py
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, func
+from sqlalchemy.orm import relationship
+from database import Base
+
+# Reservation lifecycle states
+RESERVATION_ACTIVE = "active"
+RESERVATION_CONVERTED = "converted"  # turned into a stock deduction after payment
+RESERVATION_EXPIRED = "expired"
+RESERVATION_RELEASED = "released"
+
+# Time-limited hold on product stock created at checkout
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    qty = Column(Float, nullable=False)
+    status = Column(String, default=RESERVATION_ACTIVE, nullable=False)
+    expires_at = Column(DateTime, nullable=False) # UTC
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    product = relationship("Product")
+
+    __table_args__ = (
+        # Covers the "active holds per product" aggregate used for availability
+        Index("ix_stock_reservations_product_status_expires", "product_id", "status", "expires_at"),
+        # Used by the expiry sweeper
+        Index("ix_stock_reservations_status_expires", "status", "expires_at"),
+    )
@@ -1,7 +1,6 @@
 import os
 import pandas as pd
 import random
-import json
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, joinedload
 from datetime import datetime, timedelta
@@ -186,7 +185,6 @@ def load_all_data():
             invoice_id=invoice.id,
             buyer_name=invoice.buyer_name,
             invoice_date=invoice.created_at,
-            items_json=json.dumps([]), # Empty items list as irrelevant here
             status=WarehouseStatus.RELEASED,
         )
         session.add(warehouse_doc)
@@ -1,10 +1,12 @@
 # backend/routes/admin.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List
+from typing import List, Dict
 from sqlalchemy.orm import Session
 from database import get_db
 from models.users import User
 from utils.tokenJWT import get_current_user
+from utils.jobs import queue_stats
+from utils.pdf_storage import storage_stats
 from schemas.user import RoleUpdate, UserResponse
 from pydantic import BaseModel
 from typing import Optional, Literal
@@ -19,6 +21,39 @@ class PaginatedUsersResponse(BaseModel):
     page: int
     page_size: int
 
+# Latency summary (seconds) of recently finished jobs
+class JobLatency(BaseModel):
+    avg: Optional[float] = None
+    p95: Optional[float] = None
+    max: Optional[float] = None
+
+# Job queue health: depth per state/kind and wait/run latency
+class JobQueueStats(BaseModel):
+    depth: Dict[str, Dict[str, int]]
+    queued: int
+    running: int
+    failed: int
+    oldest_due_age_seconds: Optional[float] = None
+    completed_in_window: int
+    wait_seconds: JobLatency
+    run_seconds: JobLatency
+
+# Usage of one PDF storage area
+class StorageAreaStats(BaseModel):
+    files: int
+    bytes: int
+    oldest_access_age_seconds: Optional[float] = None
+
+# PDF storage usage: evictable cache areas vs quota, pinned invoices, free disk space
+class PdfStorageStats(BaseModel):
+    areas: Dict[str, StorageAreaStats]
+    pinned: StorageAreaStats
+    cache_bytes: int
+    quota_bytes: int
+    quota_used_ratio: Optional[float] = None
+    disk_total_bytes: int
+    disk_free_bytes: int
+
 
 # Retrieve a list of users with filtering, sorting, and pagination (Admin only)
 @router.get("/users", response_model=PaginatedUsersResponse)
@@ -119,4 +154,25 @@ def delete_user(
     db.delete(user)
     db.commit()
 
-    return {"message": f"User {user.email} has been deleted"}
\ No newline at end of file
+    return {"message": f"User {user.email} has been deleted"}
+
+
+# Job queue depth and latency (Admin only)
+@router.get("/admin/jobs", response_model=JobQueueStats)
+def get_job_queue_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role.lower() != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return queue_stats(db)
+
+
+# PDF storage usage and quota (Admin only)
+@router.get("/admin/storage", response_model=PdfStorageStats)
+def get_pdf_storage_stats(
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role.lower() != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return storage_stats()
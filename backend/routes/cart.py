@@ -1,14 +1,19 @@
 # backend/routes/cart.py
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.orm import Session, joinedload
 from database import get_db
 from utils.tokenJWT import get_current_user
 from utils.audit import write_log
+from utils.inventory import available_quantities
 from models.users import User
 from models.product import Product
 from models.cart import Cart, CartItem
-from schemas.cart import CartAddItem, CartUpdateItem, CartOut, CartItemOut
+from schemas.cart import (
+    CartAddItem, CartUpdateItem, CartOut, CartItemOut,
+    CartBatchOp, CartBatchRequest, CartBatchOut, CartBatchLineResult,
+)
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
@@ -17,18 +22,40 @@ def _ensure_client(user: User):
     if not user or not user.id:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+def _find_open_cart(db: Session, user_id: int) -> Optional[Cart]:
+    # Load the active cart with its lines and products in one query (no writes)
+    return (
+        db.query(Cart)
+        .options(joinedload(Cart.items).joinedload(CartItem.product))
+        .filter(Cart.user_id == user_id, Cart.status == "open")
+        .first()
+    )
+
 def _get_open_cart(db: Session, user_id: int) -> Cart:
-    # Retrieve active cart or create a new one
-    cart = db.query(Cart).filter(Cart.user_id == user_id, Cart.status == "open").first()
+    # Retrieve active cart or create a new one (flushed, committed by the caller)
+    cart = _find_open_cart(db, user_id)
     if not cart:
-        cart = Cart(user_id=user_id, status="open")
+        cart = Cart(user_id=user_id, status="open", items=[], updated_at=datetime.utcnow())
         db.add(cart)
-        db.commit()
-        db.refresh(cart)
+        db.flush()
     return cart
 
-def _cart_to_out(cart: Cart) -> CartOut:
+def _touch(cart: Cart) -> None:
+    # Record activity so idle-cart expiry only hits abandoned carts
+    cart.updated_at = datetime.utcnow()
+
+def _find_item(cart: Optional[Cart], item_id: int) -> CartItem:
+    item = next((it for it in cart.items if it.id == item_id), None) if cart else None
+    if not item:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    return item
+
+def _cart_to_out(db: Session, cart: Optional[Cart]) -> CartOut:
+    # Build the response from already loaded lines; availability comes from one grouped query
+    if cart is None or not cart.items:
+        return CartOut(items=[], total=0.0)
     items_out = []
+    available = available_quantities(db, [it.product_id for it in cart.items])
     total_gross = 0.0 # Calculate total gross amount
 
     for it in cart.items:
@@ -54,7 +81,8 @@ def _cart_to_out(cart: Cart) -> CartOut:
             name=name,
             qty=it.qty,
             unit_price=round(price_gross, 2), # Return gross unit price
-            line_total=round(line_total_gross, 2) # Return line total gross
+            line_total=round(line_total_gross, 2), # Return line total gross
+            available_qty=available.get(it.product_id), # On-hand minus active checkout holds
         ))
         
     return CartOut(items=items_out, total=round(total_gross, 2))
@@ -66,20 +94,8 @@ def get_cart(
     current_user: User = Depends(get_current_user)
 ):
     _ensure_client(current_user)
-    cart = _get_open_cart(db, current_user.id)
-    out = _cart_to_out(cart)
-
-    # Log cart view action
-    write_log(
-        db,
-        user_id=current_user.id,
-        action="CART_VIEW",
-        resource="cart",
-        status="SUCCESS",
-        ip=request.client.host,
-        meta={"items": len(out.items), "total": out.total},
-    )
-    return out
+    # Read-only: no cart is created and nothing is logged for a plain view
+    return _cart_to_out(db, _find_open_cart(db, current_user.id))
 
 @router.post("/add", response_model=CartOut, status_code=status.HTTP_200_OK)
 def add_to_cart(
@@ -95,30 +111,28 @@ def add_to_cart(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Validate stock availability
-    if product.stock_quantity is not None and payload.qty > product.stock_quantity:
+    # Validate stock availability (excluding stock held by other checkouts)
+    available = available_quantities(db, [product.id])
+    if payload.qty > available.get(product.id, 0):
         raise HTTPException(status_code=400, detail="Insufficient stock")
 
-    item = db.query(CartItem).filter(
-        CartItem.cart_id == cart.id, CartItem.product_id == payload.product_id
-    ).first()
+    item = next((it for it in cart.items if it.product_id == payload.product_id), None)
 
     if item:
         item.qty += payload.qty
     else:
         # Save NET price snapshot for consistency, display will use gross
         item = CartItem(
-            cart_id=cart.id,
-            product_id=product.id,
+            product=product,
             qty=payload.qty,
             unit_price_snapshot=product.sell_price_net, 
         )
-        db.add(item)
+        cart.items.append(item)
+    _touch(cart)
+    db.flush()
 
-    db.commit()
-    db.refresh(cart)
-
-    out = _cart_to_out(cart)
+    # Response is built from the in-memory cart; the audit entry commits the change
+    out = _cart_to_out(db, cart)
     write_log(
         db,
         user_id=current_user.id,
@@ -139,22 +153,19 @@ def update_cart_item(
     current_user: User = Depends(get_current_user)
 ):
     _ensure_client(current_user)
-    cart = _get_open_cart(db, current_user.id)
-
-    item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Cart item not found")
+    cart = _find_open_cart(db, current_user.id)
+    item = _find_item(cart, item_id)
 
-    # Validate stock for the new quantity
-    product = db.query(Product).filter(Product.id == item.product_id).first()
-    if product and product.stock_quantity is not None and payload.qty > product.stock_quantity:
+    # Validate stock for the new quantity (excluding stock held by other checkouts)
+    available = available_quantities(db, [item.product_id])
+    if item.product_id in available and payload.qty > available[item.product_id]:
         raise HTTPException(status_code=400, detail="Insufficient stock")
 
     item.qty = payload.qty
-    db.commit()
-    db.refresh(cart)
+    _touch(cart)
+    db.flush()
 
-    out = _cart_to_out(cart)
+    out = _cart_to_out(db, cart)
     write_log(
         db,
         user_id=current_user.id,
@@ -174,17 +185,15 @@ def delete_cart_item(
     current_user: User = Depends(get_current_user)
 ):
     _ensure_client(current_user)
-    cart = _get_open_cart(db, current_user.id)
-
-    item = db.query(CartItem).filter(CartItem.id == item_id, CartItem.cart_id == cart.id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Cart item not found")
+    cart = _find_open_cart(db, current_user.id)
+    item = _find_item(cart, item_id)
 
-    db.delete(item)
-    db.commit()
-    db.refresh(cart)
+    # Removing from the collection deletes the row (delete-orphan cascade)
+    cart.items.remove(item)
+    _touch(cart)
+    db.flush()
 
-    out = _cart_to_out(cart)
+    out = _cart_to_out(db, cart)
     write_log(
         db,
         user_id=current_user.id,
@@ -194,4 +203,82 @@ def delete_cart_item(
         ip=request.client.host,
         meta={"item_id": item_id, "cart_items": len(out.items), "total": out.total},
     )
-    return out
\ No newline at end of file
+    return out
+
+def _apply_batch_op(cart: Cart, lines: dict, products: dict, available: dict, op: CartBatchOp) -> Optional[str]:
+    # Apply one batch operation to the in-memory cart; returns an error message or None
+    # Removed lines stay in `lines` with qty 0 until the batch ends, so a later add reuses the row
+    item = lines.get(op.product_id)
+    if op.op == "remove":
+        if not item or item.qty == 0:
+            return "Product not in cart"
+        item.qty = 0
+        return None
+
+    product = products.get(op.product_id)
+    if not product:
+        return "Product not found"
+    if op.qty is None:
+        return "Quantity is required"
+
+    new_qty = (item.qty if item else 0) + op.qty if op.op == "add" else op.qty
+    if new_qty > available.get(op.product_id, 0):
+        return "Insufficient stock"
+
+    if item:
+        item.qty = new_qty
+    else:
+        item = CartItem(product=product, qty=new_qty, unit_price_snapshot=product.sell_price_net)
+        cart.items.append(item)
+        lines[op.product_id] = item
+    return None
+
+@router.post("/batch", response_model=CartBatchOut)
+def batch_update_cart(
+    payload: CartBatchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Apply add/set/remove operations in order, in one transaction; one failed line rejects the whole batch
+    _ensure_client(current_user)
+    cart = _get_open_cart(db, current_user.id)
+
+    # Products and availability for every referenced id, one IN query each
+    product_ids = list({op.product_id for op in payload.ops})
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+    available = available_quantities(db, product_ids)
+    lines = {it.product_id: it for it in cart.items}
+
+    results = []
+    for index, op in enumerate(payload.ops):
+        error = _apply_batch_op(cart, lines, products, available, op)
+        results.append(CartBatchLineResult(
+            index=index, op=op.op, product_id=op.product_id, ok=error is None, error=error
+        ))
+
+    if any(not r.ok for r in results):
+        # Nothing is applied; the per-line results tell the client which lines to fix
+        db.rollback()
+        raise HTTPException(status_code=400, detail={
+            "message": "Batch rejected, cart unchanged",
+            "results": [r.model_dump() for r in results],
+        })
+
+    for item in [it for it in cart.items if it.qty == 0]:
+        cart.items.remove(item)
+    _touch(cart)
+    db.flush()
+
+    # One audit entry for the whole batch; its commit persists the cart changes
+    out = _cart_to_out(db, cart)
+    write_log(
+        db,
+        user_id=current_user.id,
+        action="CART_BATCH",
+        resource="cart",
+        status="SUCCESS",
+        ip=request.client.host,
+        meta={"ops": len(results), "cart_items": len(out.items), "total": out.total},
+    )
+    return CartBatchOut(cart=out, results=results)
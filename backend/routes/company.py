@@ -6,6 +6,8 @@ from models.company import Company
 from models.users import User
 from utils.tokenJWT import get_current_user
 from utils.audit import write_log
+from utils.jobs import enqueue
+from models.job import PRIORITY_LOW
 from schemas.company import CompanyOut, CompanyUpdate
 
 router = APIRouter(prefix="/company", tags=["Company"])
@@ -50,6 +52,8 @@ def update_company(payload: CompanyUpdate, request: Request, db: Session = Depen
     if payload.email is not None:
         c.email = payload.email
 
+    # Seller data is printed on invoices: cached (not pinned) PDFs are dropped in the background
+    enqueue(db, "pdf.invoice.refresh_cached", priority=PRIORITY_LOW)
     db.commit()
     db.refresh(c)
 
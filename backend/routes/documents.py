@@ -1,9 +1,10 @@
 # backend/routes/documents.py
 from typing import Optional, Literal, List, Dict, Any
 from datetime import datetime
+import json
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from database import get_db
 from utils.tokenJWT import get_current_user
@@ -28,6 +29,13 @@ def _parse_iso(s: Optional[str]) -> Optional[datetime]:
         raise HTTPException(status_code=400, detail=f"Bad datetime format: {s}")
 
 
+# WZ lines in the JSON shape the list has always returned (items_json)
+def _wz_items_json(doc: WarehouseDocument) -> str:
+    return json.dumps([
+        {"product_name": it.product_name, "product_code": it.product_code, "quantity": it.quantity, "location": it.location}
+        for it in doc.items
+    ])
+
 # Retrieve a list of documents with filtering, pagination, and sorting
 @router.get("/documents", response_model=DocumentsPage)
 def list_documents(
@@ -124,7 +132,7 @@ def list_documents(
             wq = wq.order_by(WarehouseDocument.id.asc() if order == "asc" else WarehouseDocument.id.desc())
 
         # Fetch paginated results and map to dictionary
-        wz_page = wq.offset((page - 1) * page_size).limit(page_size).all()
+        wz_page = wq.options(selectinload(WarehouseDocument.items)).offset((page - 1) * page_size).limit(page_size).all()
         for w in wz_page:
             wz_items.append({
                 "type": "wz",
@@ -134,7 +142,7 @@ def list_documents(
                 "status": getattr(w, "status", None),
                 "order_id": getattr(w, "invoice_id", None),
                 "buyer": getattr(w, "buyer_name", None),
-                "items_json": getattr(w, "items_json", None),
+                "items_json": _wz_items_json(w),
             })
 
     # Combine results and construct final response
@@ -1,24 +1,34 @@
 # backend/routes/invoice.py
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Header
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from typing import Optional, Literal, List, Dict, Any, Union
-from sqlalchemy import or_, func, case
+from sqlalchemy import or_, and_, case, insert
 from pathlib import Path
-import json
-from datetime import datetime
+from datetime import date, datetime
 
 # Models
-from models.invoice import Invoice, InvoiceItem, PaymentStatus
+from models.invoice import Invoice, InvoiceItem
 from models.product import Product
-from models.WarehouseDoc import WarehouseDocument, WarehouseStatus
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentItem, WarehouseStatus
 from models.company import Company
 from models.users import User
 from database import get_db
+from config import settings
 from utils.tokenJWT import get_current_user
 from utils.audit import write_log
+from utils.inventory import StockDelta, apply_stock_deltas, failed_lines
+from utils.numbering import next_invoice_number
+from utils.idempotency import run_idempotent
+from utils.jobs import job_handler, enqueue
+from models.job import PRIORITY_LOW
 from schemas import invoice as invoice_schemas
-from utils.pdf import generate_invoice_pdf, get_pdf_path
+from utils.pdf_storage import pin_invoice_pdf, pinned_invoice_pdf
+from utils.invoice_export import start_export, export_status, stream_export
+from utils.jpk import seller_block, stream_jpk_fa, unsupported_tax_rates
+from utils.pdf import (
+    ensure_invoice_pdf, invoice_pdf_version, invoice_pdf_content, render_invoice_pdf, etag_matches, pdf_cache_headers, pdf_response, STORAGE_DIR,
+)
 
 router = APIRouter(tags=["Invoices"])
 
@@ -27,10 +37,7 @@ router = APIRouter(tags=["Invoices"])
 # =========================
 def _check_pdf_permission(db: Session, invoice_id: int, user: User) -> Invoice:
     # Verify user access rights for invoice PDF generation
-    invoice = db.query(Invoice).options(
-        joinedload(Invoice.items),
-        joinedload(Invoice.parent).joinedload(Invoice.items)
-    ).filter(Invoice.id == invoice_id).first()
+    invoice = _load_invoice_for_pdf(db, invoice_id)
     
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
@@ -43,6 +50,67 @@ def _check_pdf_permission(db: Session, invoice_id: int, user: User) -> Invoice:
         
     return invoice
 
+# Seller details printed on invoice PDFs
+def _company_dict(db: Session) -> Optional[dict]:
+    company = db.query(Company).first()
+    if not company:
+        return None
+    return {
+        "name": company.name, 
+        "nip": company.nip, 
+        "address": company.address,
+        "phone": getattr(company, "phone", None),
+        "email": getattr(company, "email", None)
+    }
+
+def _load_invoice_for_pdf(db: Session, invoice_id: int) -> Optional[Invoice]:
+    # Invoice with items and, for corrections, the corrected invoice and its items
+    return db.query(Invoice).options(
+        joinedload(Invoice.items),
+        joinedload(Invoice.parent).joinedload(Invoice.items)
+    ).filter(Invoice.id == invoice_id).first()
+
+# Pins an issued invoice or correction right after it is created, whatever its payment
+# status: an issued invoice is final, so its PDF keeps the seller data of the issue date
+# and is never evicted or re-rendered. A no-op when the invoice is already pinned.
+@job_handler("pdf.invoice")
+def _pin_invoice_pdf_job(db: Session, payload: dict) -> None:
+    invoice = _load_invoice_for_pdf(db, payload["invoice_id"])
+    if not invoice or pinned_invoice_pdf(invoice.id):
+        return
+    company = _company_dict(db)
+    version = invoice_pdf_version(invoice, invoice.items, company)
+    pin_invoice_pdf(invoice.id, version, render_invoice_pdf(invoice, invoice.items, company=company))
+
+# Seller data changed: cached PDFs were rendered with the old data and are dropped (the next
+# download renders the current version). Pinned copies stay as issued.
+@job_handler("pdf.invoice.refresh_cached")
+def _refresh_cached_invoice_pdfs_job(db: Session, payload: dict) -> None:
+    for path in STORAGE_DIR.glob("INV-*.pdf"):
+        path.unlink(missing_ok=True)
+
+# Filters shared by the invoice list and the bulk export
+def _filter_invoices(query, q: Optional[str], search_id: Optional[str],
+                     date_from: Optional[datetime], date_to: Optional[datetime]):
+    # Filter by text (buyer name or NIP)
+    if q:
+        like = f"%{q}%"
+        query = query.filter(or_(Invoice.buyer_name.ilike(like), Invoice.buyer_nip.ilike(like)))
+    
+    # Filter by specific ID or number
+    if search_id:
+        try:
+            s_id = int(search_id)
+            query = query.filter(or_(Invoice.id == s_id, Invoice.number == s_id, Invoice.parent_id == s_id))
+        except ValueError:
+            # Printed number, e.g. INV-12/FK (stored and indexed)
+            query = query.filter(Invoice.full_number == search_id.strip().upper())
+
+    # Filter by date range
+    if date_from: query = query.filter(Invoice.created_at >= date_from)
+    if date_to: query = query.filter(Invoice.created_at <= date_to)
+    return query
+
 # =========================
 # LIST (FOR CUSTOMER)
 # =========================
@@ -67,6 +135,106 @@ def list_my_invoices(
     return {"items": invoices, "total": total, "page": page, "page_size": page_size}
 
 
+# =========================
+# BULK PDF EXPORT (ZIP)
+# Registered before /invoices/{invoice_id} so "export" is not taken for an id
+# =========================
+@router.get("/invoices/export")
+def export_invoices_zip(
+    request: Request,
+    q: Optional[str] = Query(None),
+    search_id: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Stream a ZIP with PDFs of all invoices matching the list filters (Admin/Salesman only).
+    # The X-Export-Id header is the handle for GET /invoices/export/{export_id}.
+    if (current_user.role or "").upper() not in {"ADMIN", "SALESMAN"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    query = _filter_invoices(db.query(Invoice.id), q, search_id, date_from, date_to)
+    invoice_ids = [row.id for row in query.order_by(Invoice.id).all()]
+    if not invoice_ids:
+        raise HTTPException(status_code=404, detail="Brak faktur do eksportu")
+    if len(invoice_ids) > settings.INVOICE_EXPORT_MAX_INVOICES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many invoices to export ({len(invoice_ids)}), narrow the filters (max {settings.INVOICE_EXPORT_MAX_INVOICES})",
+        )
+
+    export_id = start_export(current_user.id, len(invoice_ids))
+    company = _company_dict(db)
+    write_log(
+        db, user_id=current_user.id, action="INVOICE_EXPORT", resource="invoices", status="SUCCESS",
+        ip=request.client.host,
+        meta={"export_id": export_id, "count": len(invoice_ids), "date_from": str(date_from), "date_to": str(date_to)}
+    )
+
+    period = "_".join(d.strftime("%Y-%m-%d") for d in (date_from, date_to) if d) or datetime.utcnow().strftime("%Y-%m-%d")
+    return StreamingResponse(
+        stream_export(export_id, invoice_ids, company),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="Faktury_{period}.zip"',
+            "X-Export-Id": export_id,
+        },
+    )
+
+@router.get("/invoices/export/{export_id}", response_model=invoice_schemas.InvoiceExportStatus)
+def get_invoice_export_status(
+    export_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    # Progress of a running or recently finished export (owner or admin)
+    progress = export_status(export_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if progress["user_id"] != current_user.id and (current_user.role or "").upper() != "ADMIN":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return progress
+
+
+# =========================
+# JPK_FA (SAF-T) EXPORT
+# Registered before /invoices/{invoice_id} so "jpk" is not taken for an id
+# =========================
+@router.get("/invoices/jpk")
+def export_jpk_fa(
+    request: Request,
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Stream the JPK_FA XML of invoices issued in the date range (Admin/Salesman only)
+    if (current_user.role or "").upper() not in {"ADMIN", "SALESMAN"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+    # Everything that would make the file invalid is rejected before streaming starts
+    company = _company_dict(db)
+    try:
+        seller_block(company)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    unsupported = unsupported_tax_rates(db, date_from, date_to)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Stawki VAT bez pola w JPK_FA: {unsupported}")
+
+    write_log(
+        db, user_id=current_user.id, action="INVOICE_JPK_EXPORT", resource="invoices", status="SUCCESS",
+        ip=request.client.host, meta={"date_from": str(date_from), "date_to": str(date_to)}
+    )
+    return StreamingResponse(
+        stream_jpk_fa(date_from, date_to, company),
+        media_type="application/xml",
+        headers={"Content-Disposition": f'attachment; filename="JPK_FA_{date_from}_{date_to}.xml"'},
+    )
+
+
 # =========================
 # MANUAL INVOICE CREATION + AUTO WZ
 # =========================
@@ -76,27 +244,39 @@ def create_invoice(
     invoice_data: invoice_schemas.InvoiceCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     # Restrict invoice creation to Admin and Salesman roles
     if (current_user.role or "").upper() not in {"ADMIN", "SALESMAN"}:
         raise HTTPException(status_code=403, detail="Not authorized to issue invoices")
 
-    # Determine next invoice number
-    last_number = db.query(func.max(Invoice.number)).filter(
-        (Invoice.is_correction == False) | (Invoice.is_correction == None)
-    ).scalar()
-    new_number = (last_number or 0) + 1
+    # Retries with the same Idempotency-Key get the original response instead of a second invoice
+    return run_idempotent(
+        idempotency_key, current_user.id, "invoices.create", invoice_data,
+        lambda: _create_invoice(request, invoice_data, db, current_user),
+    )
+
+def _create_invoice(
+    request: Request,
+    invoice_data: invoice_schemas.InvoiceCreate,
+    db: Session,
+    current_user: User,
+) -> invoice_schemas.InvoiceResponse:
+    # Allocate next invoice number (atomic counter, rolled back with the invoice)
+    new_number = next_invoice_number(db)
 
     total_net, total_vat, total_gross = 0.0, 0.0, 0.0
     items = []
 
+    # Load every referenced product once; reused for totals, stock deduction and the WZ payload
+    product_ids = {item_data.product_id for item_data in invoice_data.items}
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+
     # Process invoice items and validate stock
     for item_data in invoice_data.items:
-        product = db.query(Product).filter(Product.id == item_data.product_id).first()
+        product = products.get(item_data.product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product ID {item_data.product_id} not found")
-        if product.stock_quantity < item_data.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough stock for product '{product.name}'")
 
         price_net = item_data.price_net or product.sell_price_net
         tax_rate = item_data.tax_rate or product.tax_rate
@@ -109,18 +289,30 @@ def create_invoice(
         total_vat += (total_item_gross - total_item_net)
         total_gross += total_item_gross
 
-        items.append(
-            InvoiceItem(
-                product_id=product.id,
-                product_name=product.name,
-                quantity=quantity,
-                price_net=price_net,
-                tax_rate=tax_rate,
-                total_net=total_item_net,
-                total_gross=total_item_gross,
-            )
+        items.append(dict(
+            product_id=product.id,
+            product_name=product.name,
+            quantity=quantity,
+            price_net=price_net,
+            tax_rate=tax_rate,
+            total_net=total_item_net,
+            total_gross=total_item_gross,
+        ))
+
+    # Deduct stock in one conditional update; reject the invoice if any line would oversell
+    stock_results = apply_stock_deltas(
+        db, [StockDelta(item["product_id"], -item["quantity"]) for item in items],
+        user_id=current_user.id, movement_type="OUT", reason=f"Faktura INV-{new_number}",
+        respect_reservations=True,
+    )
+    failed = failed_lines(stock_results)
+    if failed:
+        db.rollback()
+        names = {item["product_id"]: item["product_name"] for item in items}
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough stock for product '{names.get(failed[0].product_id, failed[0].product_id)}'",
         )
-        product.stock_quantity -= quantity
 
     # Use buyer address as default shipping address
     shipping_addr = invoice_data.buyer_address
@@ -139,41 +331,45 @@ def create_invoice(
         total_net=total_net,
         total_vat=total_vat,
         total_gross=total_gross,
-        items=items,
         number=new_number
     )
     db.add(invoice)
-    db.commit()
-    db.refresh(invoice)
+    db.flush()
+    # Lines are written with one executemany per table, not one INSERT per line
+    db.execute(insert(InvoiceItem), [dict(item, invoice_id=invoice.id) for item in items])
 
     # Automatically generate associated Warehouse Document (WZ)
-    warehouse_items = [
-        {
-            "product_name": item.product_name,
-            "product_code": db.query(Product.code).filter(Product.id == item.product_id).scalar(),
-            "quantity": item.quantity,
-            "location": db.query(Product.location).filter(Product.id == item.product_id).scalar(),
-        } for item in items
-    ]
-
     warehouse_doc = WarehouseDocument(
         invoice_id=invoice.id,
         buyer_name=invoice.buyer_name,
         invoice_date=now,
         created_at=now,
-        items_json=json.dumps(warehouse_items),
         status=WarehouseStatus.NEW,
         shipping_address=shipping_addr 
     )
     db.add(warehouse_doc)
-    db.commit()
-
+    db.flush()
+    db.execute(insert(WarehouseDocumentItem), [
+        dict(
+            document_id=warehouse_doc.id,
+            product_id=item["product_id"],
+            product_name=item["product_name"],
+            product_code=products[item["product_id"]].code,
+            quantity=item["quantity"],
+            location=products[item["product_id"]].location,
+        ) for item in items
+    ])
+    # Pin the issued invoice off the request path; the WZ PDF is rendered on first download
+    enqueue(db, "pdf.invoice", {"invoice_id": invoice.id}, priority=PRIORITY_LOW)
+
+    # Lines come back in one SELECT; the audit entry commits invoice, WZ and stock together
+    response = invoice_schemas.InvoiceResponse.model_validate(invoice)
     write_log(
         db, user_id=current_user.id, action="INVOICE_CREATE", resource="invoices", status="SUCCESS",
         ip=request.client.host,
         meta={"invoice_id": invoice.id, "total_gross": total_gross, "wz_id": warehouse_doc.id}
     )
-    return invoice
+    return response
 
 
 # =========================
@@ -254,6 +450,8 @@ def create_invoice_correction(
     )
 
     db.add(correction_invoice)
+    db.flush()
+    enqueue(db, "pdf.invoice", {"invoice_id": correction_invoice.id}, priority=PRIORITY_LOW)
     db.commit()
     db.refresh(correction_invoice)
 
@@ -324,6 +522,27 @@ def get_invoice(
     }
 
 
+# Resolves a list cursor (id of the last invoice on the previous page) to its family ordering position
+def _invoice_cursor_position(db: Session, cursor: str):
+    try:
+        last_id = int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    last = db.query(Invoice.family_id, Invoice.is_correction, Invoice.id).filter(Invoice.id == last_id).first()
+    if not last:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last
+
+# Rows after `last` in the family ordering: families in `order`, inside a family parent first, then corrections by id
+def _after_family_position(last, order: str):
+    next_family = Invoice.family_id < last.family_id if order == "desc" else Invoice.family_id > last.family_id
+    if last.is_correction:
+        rest_of_family = and_(Invoice.is_correction == True, Invoice.id > last.id)
+    else:
+        rest_of_family = or_(Invoice.is_correction == True, Invoice.id > last.id)
+    return or_(next_family, and_(Invoice.family_id == last.family_id, rest_of_family))
+
+
 @router.get("/invoices", response_model=invoice_schemas.InvoiceListPage)
 def list_invoices(
     request: Request,
@@ -331,6 +550,7 @@ def list_invoices(
     search_id: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Kursor z poprzedniej strony (next_cursor)"),
     sort_by: Literal["created_at", "buyer_name", "total_gross", "id"] = "created_at",
     order: Literal["asc", "desc"] = "desc",
     date_from: Optional[datetime] = Query(None),
@@ -342,33 +562,18 @@ def list_invoices(
     if (current_user.role or "").upper() not in {"ADMIN", "SALESMAN"}:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    query = db.query(Invoice)
-    
-    # Filter by text (buyer name or NIP)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Invoice.buyer_name.ilike(like), Invoice.buyer_nip.ilike(like)))
-    
-    # Filter by specific ID or number
-    if search_id:
-        try:
-            s_id = int(search_id)
-            query = query.filter(or_(Invoice.id == s_id, Invoice.number == s_id, Invoice.parent_id == s_id))
-        except ValueError:
-            pass
-
-    # Filter by date range
-    if date_from: query = query.filter(Invoice.created_at >= date_from)
-    if date_to: query = query.filter(Invoice.created_at <= date_to)
+    query = _filter_invoices(db.query(Invoice), q, search_id, date_from, date_to)
 
-    family_id = func.coalesce(Invoice.parent_id, Invoice.id)
+    # The total is counted for the first page only; cursor pages would repeat the same full count
+    total = query.count() if not cursor else None
+    family_sort = sort_by in ("created_at", "id")
 
-    # Sort logic grouping corrections with parents
-    if sort_by == "created_at" or sort_by == "id":
+    # Sort logic grouping corrections with parents (stored family_id, served by ix_invoices_family_order)
+    if family_sort:
         if order == "desc":
-             query = query.order_by(family_id.desc(), Invoice.is_correction.asc(), Invoice.id.asc())
+             query = query.order_by(Invoice.family_id.desc(), Invoice.is_correction.asc(), Invoice.id.asc())
         else:
-             query = query.order_by(family_id.asc(), Invoice.is_correction.asc(), Invoice.id.asc())
+             query = query.order_by(Invoice.family_id.asc(), Invoice.is_correction.asc(), Invoice.id.asc())
     else:
         sort_map = {
             "buyer_name": Invoice.buyer_name,
@@ -377,10 +582,21 @@ def list_invoices(
         col = sort_map.get(sort_by, Invoice.created_at)
         query = query.order_by(col.asc() if order == "asc" else col.desc())
 
-    total = query.count()
-    invoices = query.offset((page - 1) * page_size).limit(page_size).all()
+    # Keyset pagination when a cursor is given (family ordering only), offset pagination otherwise
+    if cursor:
+        if not family_sort:
+            raise HTTPException(status_code=400, detail="Cursor is supported only for created_at/id sorting")
+        last = _invoice_cursor_position(db, cursor)
+        query = query.filter(_after_family_position(last, order))
+    else:
+        query = query.offset((page - 1) * page_size)
 
-    return {"items": invoices, "total": total, "page": page, "page_size": page_size}
+    invoices = query.limit(page_size + 1).all()
+    has_more = len(invoices) > page_size
+    invoices = invoices[:page_size]
+
+    next_cursor = str(invoices[-1].id) if has_more and family_sort else None
+    return {"items": invoices, "total": total, "page": page, "page_size": page_size, "next_cursor": next_cursor}
 
 
 @router.post("/invoices/{invoice_id}/pdf")
@@ -390,27 +606,15 @@ def generate_invoice_pdf_endpoint(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # Trigger PDF generation for an invoice
+    # Make sure the current version of the invoice PDF is rendered (cached versions are reused)
     invoice = _check_pdf_permission(db, invoice_id, current_user)
-    out_path = get_pdf_path(invoice.id)
-    
-    company = db.query(Company).first()
-    company_dict = None
-    if company:
-        company_dict = {
-            "name": company.name, 
-            "nip": company.nip, 
-            "address": company.address,
-            "phone": getattr(company, "phone", None),
-            "email": getattr(company, "email", None)
-        }
     
     try:
-        generate_invoice_pdf(invoice, invoice.items, out_path, company=company_dict)
+        out_path, version = ensure_invoice_pdf(invoice, invoice.items, company=_company_dict(db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Błąd generowania PDF: {e}")
     
-    return {"message": "PDF generated", "path": str(out_path)}
+    return {"message": "PDF generated", "path": str(out_path), "version": version}
 
 
 @router.get("/invoices/{invoice_id}/download")
@@ -419,37 +623,28 @@ def download_invoice_pdf_endpoint(
     request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
 ):
-    # Download invoice PDF, generate if missing
-    invoice_for_check = _check_pdf_permission(db, invoice_id, current_user)
-    pdf_path = get_pdf_path(invoice_for_check.id)
-    
-    if not pdf_path.exists():
-        try:
-            full_invoice_details = _check_pdf_permission(db, invoice_id, current_user)
-            company = db.query(Company).first()
-            company_dict = None
-            if company:
-                company_dict = {
-                    "name": company.name, 
-                    "nip": company.nip, 
-                    "address": company.address,
-                    "phone": getattr(company, "phone", None),
-                    "email": getattr(company, "email", None)
-                }
-            generate_invoice_pdf(full_invoice_details, full_invoice_details.items, pdf_path, company=company_dict)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Could not generate PDF: {e}")
+    # Download invoice PDF: the pinned copy of an issued invoice, else the cached version from disk,
+    # else rendered in memory (large ones get cached)
+    invoice = _check_pdf_permission(db, invoice_id, current_user)
+    pinned = pinned_invoice_pdf(invoice.id)
+    company = None if pinned else _company_dict(db)
+
+    # The content version is the ETag: a client holding the current file gets 304 without a body
+    version = pinned[1] if pinned else invoice_pdf_version(invoice, invoice.items, company)
+    if etag_matches(if_none_match, version):
+        return Response(status_code=304, headers=pdf_cache_headers(version))
+
+    try:
+        content = pinned[0] if pinned else invoice_pdf_content(invoice, invoice.items, company, version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not generate PDF: {e}")
 
     write_log(
         db, user_id=current_user.id, action="INVOICE_PDF_DOWNLOAD", resource="invoices", status="SUCCESS",
-        ip=request.client.host, meta={"invoice_id": invoice_for_check.id}
+        ip=request.client.host, meta={"invoice_id": invoice.id, "version": version}
     )
 
-    filename = f"Faktura_{invoice_for_check.full_number.replace('/', '_')}.pdf"
-
-    return FileResponse(
-        path=str(pdf_path),
-        media_type="application/pdf",
-        filename=filename 
-    )
\ No newline at end of file
+    filename = f"Faktura_{invoice.full_number.replace('/', '_')}.pdf"
+    return pdf_response(content, filename, version)
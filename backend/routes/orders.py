@@ -1,29 +1,36 @@
 # backend/routes/orders.py
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
-from sqlalchemy.orm import Session, joinedload
-import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Header
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
 import httpx
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from database import get_db
 import logging
 from utils.tokenJWT import get_current_user
 from utils.audit import write_log
 from utils.payu_client import payu_client
+from utils.numbering import next_invoice_number
+from utils.idempotency import run_idempotent_async
+from utils.jobs import enqueue
+from utils.inventory import (
+    StockDelta, apply_stock_deltas, failed_lines,
+    reserve_stock, convert_reservations, release_reservations,
+)
 from config import settings
 from models.users import User
 from models.product import Product
 from models.cart import Cart, CartItem
 from models.order import Order, OrderItem
 from models.invoice import Invoice, InvoiceItem, PaymentStatus
-from models.WarehouseDoc import WarehouseDocument, WarehouseStatus
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentItem, WarehouseStatus
+from models.job import PRIORITY_LOW
 from schemas.order import (
     OrderResponse, OrdersPage, OrderStatusPatch, OrderItemOut,
     OrderCreatePayload, PaymentInitiationResponse
 )
-from sqlalchemy import func 
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 logger = logging.getLogger(__name__)
@@ -57,23 +64,39 @@ def _order_to_out(order: Order) -> OrderResponse:
         # invoice_id is set later or defaults to None
     )
 
-def _fulfill_order(db: Session, order: Order, request: Request):
+def _fulfill_order(db: Session, order: Order, ip: Optional[str] = None):
     """
     Executes order fulfillment: stock deduction, invoice generation, and WZ document creation.
     """
-    db.refresh(order)
-    for item in order.items:
-        db.refresh(item)
+    db.flush() # keep status changes made by the caller across the reload
+    # Reload the order with its lines and products in two queries
+    order = (
+        db.query(Order)
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+        .populate_existing()
+        .filter(Order.id == order.id)
+        .one()
+    )
 
-    # 1. Deduct stock quantity
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).with_for_update().first()
-        if product:
-            product.stock_quantity -= item.qty
+    # 1. Deduct stock quantity (conditional update, never oversells). The order's own holds are
+    # consumed first, so the deduction only has to respect other customers' holds: a live hold
+    # always covers it, and a hold that lapsed before the payment is re-acquired from free stock
+    convert_reservations(db, order.id)
+    stock_results = apply_stock_deltas(
+        db, [StockDelta(item.product_id, -item.qty) for item in order.items],
+        user_id=order.user_id, movement_type="OUT", reason=f"Zamówienie #{order.id}",
+        respect_reservations=True,
+    )
+    failed = failed_lines(stock_results)
+    if failed:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Brak stanu dla produktów: {', '.join(str(r.product_id) for r in failed)}",
+        )
 
     # 2. Calculate totals and prepare Invoice/WZ items
     total_net, total_vat, total_gross = 0.0, 0.0, 0.0
-    invoice_items, wz_items_json = [], []
+    invoice_items, wz_items = [], []
 
     for item in order.items:
         prod = item.product
@@ -92,10 +115,10 @@ def _fulfill_order(db: Session, order: Order, request: Request):
             product_id=prod.id, product_name=prod.name, quantity=quantity, price_net=price_net,
             tax_rate=tax_rate, total_net=total_item_net, total_gross=total_item_gross
         ))
-        wz_items_json.append({
-            "product_name": prod.name, "product_code": prod.code,
-            "quantity": quantity, "location": prod.location or ""
-        })
+        wz_items.append(WarehouseDocumentItem(
+            product_id=prod.id, product_name=prod.name, product_code=prod.code,
+            quantity=quantity, location=prod.location or ""
+        ))
 
     # Address formatting
     billing_addr = f"{order.invoice_address_street}, {order.invoice_address_zip} {order.invoice_address_city}"
@@ -106,11 +129,8 @@ def _fulfill_order(db: Session, order: Order, request: Request):
     else:
         shipping_addr = billing_addr
 
-    # Generate sequential invoice number
-    last_number = db.query(func.max(Invoice.number)).filter(
-        (Invoice.is_correction == False) | (Invoice.is_correction == None)
-    ).scalar()
-    new_number = (last_number or 0) + 1
+    # Allocate sequential invoice number (atomic counter, rolled back with the order)
+    new_number = next_invoice_number(db)
 
     # Common creation timestamp
     now = datetime.now()
@@ -135,37 +155,61 @@ def _fulfill_order(db: Session, order: Order, request: Request):
         buyer_name=invoice.buyer_name, 
         invoice_date=now, 
         created_at=now,   
-        items_json=json.dumps(wz_items_json), 
+        items=wz_items,
         status=WarehouseStatus.NEW,
         shipping_address=shipping_addr 
     )
     db.add(warehouse_doc)
+    db.flush()
+
+    # Pin the issued invoice off the request path; the WZ PDF is rendered on first download
+    enqueue(db, "pdf.invoice", {"invoice_id": invoice.id}, priority=PRIORITY_LOW)
 
     write_log(
         db, user_id=order.user_id, action="ORDER_FULFILL_AFTER_PAYMENT", resource="orders", status="SUCCESS",
-        ip=request.client.host,
+        ip=ip,
         meta={"order_id": order.id, "invoice_id": invoice.id, "wz_id": warehouse_doc.id}
     )
 
-# Initiate payment process, create order, and trigger fulfillment
+# Release stock holds of an order that will never be paid
+def _cancel_unpaid_order(db: Session, order: Order) -> None:
+    db.rollback()
+    release_reservations(db, order.id)
+    order.status = "cancelled"
+    db.commit()
+
+# Initiate payment process: create order, reserve stock and register the PayU payment
 @router.post("/initiate-payment", response_model=PaymentInitiationResponse)
 async def initiate_payment(
     payload: OrderCreatePayload,
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    # Retries with the same Idempotency-Key get the original response instead of a second order
+    return await run_idempotent_async(
+        idempotency_key, current_user.id, "orders.initiate_payment", payload,
+        lambda: _initiate_payment(payload, request, db, current_user),
+    )
+
+async def _initiate_payment(
+    payload: OrderCreatePayload,
+    request: Request,
+    db: Session,
+    current_user: User,
+) -> PaymentInitiationResponse:
     cart = _cart_open(db, current_user.id)
     if not cart or not cart.items:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
-    # Validate stock and calculate total
-    product_cache, total_gross = {}, 0.0
+    # Validate products and calculate total (stock is checked by the reservation below)
+    product_cache = {p.id: p for p in db.query(Product).filter(Product.id.in_([ci.product_id for ci in cart.items])).all()}
+    total_gross = 0.0
     for ci in cart.items:
-        prod = db.query(Product).filter(Product.id == ci.product_id).first()
-        if not prod or prod.stock_quantity < ci.qty:
-            raise HTTPException(status_code=400, detail=f"Brak stanu dla: {prod.name if prod else 'Brak produktu'}")
-        product_cache[ci.product_id] = prod
+        prod = product_cache.get(ci.product_id)
+        if not prod:
+            raise HTTPException(status_code=400, detail="Brak stanu dla: Brak produktu")
         total_gross += ci.qty * ci.unit_price_snapshot * (1 + prod.tax_rate / 100)
 
     # Prepare order data
@@ -190,8 +234,22 @@ async def initiate_payment(
         order=order, product_id=ci.product_id, qty=ci.qty, unit_price=ci.unit_price_snapshot
     ) for ci in cart.items]
     db.add_all(order_items)
+    db.flush()
+
+    # Hold stock for the duration of the payment; deducted when PayU confirms it
+    reservation_results = reserve_stock(
+        db, [StockDelta(ci.product_id, ci.qty) for ci in cart.items],
+        user_id=current_user.id, order_id=order.id,
+        ttl=timedelta(minutes=settings.RESERVATION_TTL_MINUTES),
+    )
+    failed = failed_lines(reservation_results)
+    if failed:
+        db.rollback()
+        prod = product_cache.get(failed[0].product_id)
+        raise HTTPException(status_code=400, detail=f"Brak stanu dla: {prod.name if prod else 'Brak produktu'}")
 
     cart.status = "ordered"
+    cart.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(order)
 
@@ -229,20 +287,9 @@ async def initiate_payment(
         "products": payu_products
     }
 
-    # Attempt immediate order fulfillment (Invoice/WZ creation)
-    try:
-        order.status = "processing"
-        _fulfill_order(db, order, request)
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to fulfill order immediately: {e}")
-        raise HTTPException(status_code=500, detail=f"Błąd generowania faktury: {e}")
-    
-    # Call PayU API
+    # Call PayU API (fulfillment happens on the COMPLETED notification)
     try:
-        token = await payu_client.get_auth_token()
-        payu_response = await payu_client.create_order(token, payu_order_data)
+        payu_response = await payu_client.submit_order(payu_order_data)
 
         redirect = None
         if isinstance(payu_response, dict):
@@ -255,53 +302,70 @@ async def initiate_payment(
         return PaymentInitiationResponse(redirect_url=redirect, order_id=order.id)
     except httpx.HTTPError as e:
         logger.exception("PayU create order failed: %s", e)
+        _cancel_unpaid_order(db, order)
         raise HTTPException(status_code=500, detail=f"Błąd komunikacji z systemem płatności: {e}")
     except Exception as e:
         logger.exception("Unexpected error in initiate_payment: %s", e)
+        _cancel_unpaid_order(db, order)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# List user orders, syncing status with warehouse documents
+# The cursor is the id of the last order on the previous page; resolve it to its (created_at, id) position
+def _order_cursor_position(db: Session, cursor: str, user_id: int):
+    try:
+        last_id = int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    last = db.query(Order.created_at, Order.id).filter(Order.id == last_id, Order.user_id == user_id).first()
+    if not last:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last
+
+
+# List user orders with invoice id and WZ status (read-only; status is propagated on WZ changes)
 @router.get("", response_model=OrdersPage)
 def list_my_orders(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Kursor z poprzedniej strony (next_cursor)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    orders = db.query(Order).filter(Order.user_id == current_user.id).all()
-    # Sync status logic
-    for order in orders:
-        invoice = db.query(Invoice).filter(Invoice.order_id == order.id).first()
-        if invoice:
-            wz = db.query(WarehouseDocument).filter(WarehouseDocument.invoice_id == invoice.id).first()
-            if wz:
-                if wz.status == "RELEASED" and order.status != "shipped":
-                    order.status = "shipped"
-                    db.commit()
-                elif wz.status == "CANCELLED" and order.status != "cancelled":
-                    order.status = "cancelled"
-                    db.commit()
-                    
-    q = db.query(Order).options(
-        joinedload(Order.items).joinedload(OrderItem.product)
-    ).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc())
-    
-    total = q.count()
-    rows = q.offset((page - 1) * page_size).limit(page_size).all()
-    
-    # === ZMIANA: Pobranie ID faktur dla strony zamówień ===
-    order_ids = [o.id for o in rows]
-    invoices = db.query(Invoice.order_id, Invoice.id).filter(Invoice.order_id.in_(order_ids)).all()
-    inv_map = {oid: iid for oid, iid in invoices}
+    base = db.query(Order).filter(Order.user_id == current_user.id)
+    total = base.count()
+
+    q = (
+        db.query(Order, Invoice.id, WarehouseDocument.status)
+        .outerjoin(Invoice, Invoice.order_id == Order.id)
+        .outerjoin(WarehouseDocument, WarehouseDocument.invoice_id == Invoice.id)
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+        .filter(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+
+    # Keyset pagination on (created_at, id) when a cursor is given, offset pagination otherwise
+    if cursor:
+        last = _order_cursor_position(db, cursor, current_user.id)
+        q = q.filter(or_(
+            Order.created_at < last.created_at,
+            and_(Order.created_at == last.created_at, Order.id < last.id),
+        ))
+    else:
+        q = q.offset((page - 1) * page_size)
+
+    rows = q.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
 
     items = []
-    for o in rows:
+    for o, invoice_id, wz_status in rows:
         resp = _order_to_out(o)
-        resp.invoice_id = inv_map.get(o.id) # Przypisz ID faktury
+        resp.invoice_id = invoice_id
+        resp.wz_status = wz_status.value if wz_status else None
         items.append(resp)
-        
-    return {"items": items, "total": total, "page": page, "page_size": page_size}
+
+    next_cursor = str(rows[-1][0].id) if has_more and rows else None
+    return {"items": items, "total": total, "page": page, "page_size": page_size, "next_cursor": next_cursor}
 
 
 # Get details of a specific order
@@ -349,6 +413,8 @@ def update_order_status(
         raise HTTPException(status_code=400, detail=f"Cannot change status from {old_status}")
 
     order.status = new_status
+    if new_status == "cancelled":
+        release_reservations(db, order.id)
     db.commit()
     write_log(db, user_id=current_user.id, action="ORDER_STATUS_CHANGE", resource="orders", status="SUCCESS",
         ip=request.client.host, meta={"order_id": order.id, "old": old_status, "new": new_status})
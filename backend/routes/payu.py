@@ -2,14 +2,23 @@
 import hashlib
 import json
 import logging
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Request, Depends, HTTPException, Header
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, SessionLocal
 from config import settings
-from models.order import Order
+from models.order import Order, ORDER_AWAITING_STOCK
+from models.job import PRIORITY_HIGH
+from models.payu_notification import (
+    PayUNotification, NOTIFICATION_PENDING, NOTIFICATION_DONE, NOTIFICATION_FAILED,
+)
 from routes.orders import _fulfill_order
 from utils.audit import write_log
+from utils.inventory import release_reservations
+from utils.jobs import job_handler, enqueue
 
 router = APIRouter(prefix="/payu", tags=["PayU"])
 logger = logging.getLogger(__name__)
@@ -31,7 +40,130 @@ def verify_payu_signature(header_signature: str, request_body: bytes) -> bool:
     
     return expected_signature == signature_from_header
 
-# Handle PayU webhook notifications
+# =========================
+# BACKGROUND PROCESSING
+# =========================
+
+def _claim_notification(db: Session, notification_id: int, now: datetime) -> bool:
+    # Lease the notification so the queued job and the retry sweep never run it twice
+    stmt = (
+        update(PayUNotification)
+        .where(
+            PayUNotification.id == notification_id,
+            PayUNotification.state == NOTIFICATION_PENDING,
+            PayUNotification.next_attempt_at <= now,
+        )
+        .values(
+            attempts=PayUNotification.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=settings.PAYU_NOTIFY_RETRY_SECONDS),
+        )
+        .returning(PayUNotification.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = db.execute(stmt).scalar() is not None
+    db.commit()
+    return claimed
+
+def _move_pending_order(db: Session, order_id: int, values: dict) -> bool:
+    # Conditional transition out of pending_payment; False if another notification got there first
+    return db.query(Order).filter(
+        Order.id == order_id, Order.status == "pending_payment"
+    ).update(values, synchronize_session=False) == 1
+
+def _apply_notification(db: Session, notification: PayUNotification) -> None:
+    order = db.query(Order).filter(Order.id == notification.order_id).first()
+    if not order:
+        return
+
+    # Payment abandoned or rejected: free the stock held at checkout
+    if notification.payu_status == "CANCELED":
+        if _move_pending_order(db, order.id, {"status": "cancelled", "payment_status": "cancelled"}):
+            release_reservations(db, order.id)
+            db.commit()
+        return
+
+    # Payment completed: deduct stock, issue invoice and WZ
+    if not _move_pending_order(db, order.id, {"status": "processing", "payment_status": "paid"}):
+        return
+    try:
+        _fulfill_order(db, order, notification.ip)
+    except HTTPException as e:
+        if e.status_code != 409:
+            raise
+        # The hold expired before the payment and the stock has been sold meanwhile: retrying cannot
+        # help, so the paid order is set aside for manual handling (restock or refund)
+        db.rollback()
+        if _move_pending_order(db, order.id, {"status": ORDER_AWAITING_STOCK, "payment_status": "paid"}):
+            release_reservations(db, order.id)
+        db.commit()
+        logger.warning("Paid order %s could not be fulfilled: %s", order.id, e.detail)
+        write_log(
+            db, user_id=order.user_id, action="ORDER_AWAITING_STOCK", resource="orders", status="FAIL",
+            ip=notification.ip, meta={"order_id": order.id, "detail": e.detail}
+        )
+        return
+    db.commit()
+
+    try:
+        write_log(
+            db, user_id=order.user_id, action="PAYU_NOTIFY", resource="orders", status="SUCCESS",
+            ip=notification.ip, meta={"order_id": order.id, "payu_status": notification.payu_status}
+        )
+    except Exception as log_e:
+        logger.exception("Failed to write audit log after PayU notify: %s", log_e)
+
+def process_notification(notification_id: int) -> None:
+    """Processes one recorded notification; failures are retried with exponential backoff."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        if not _claim_notification(db, notification_id, now):
+            return
+        notification = db.query(PayUNotification).filter(PayUNotification.id == notification_id).first()
+
+        try:
+            _apply_notification(db, notification)
+            notification.state = NOTIFICATION_DONE
+            notification.processed_at = datetime.utcnow()
+            notification.last_error = None
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            detail = getattr(e, "detail", None) or str(e)
+            if notification.attempts >= settings.PAYU_NOTIFY_MAX_ATTEMPTS:
+                notification.state = NOTIFICATION_FAILED
+                logger.exception("CRITICAL: Failed to fulfill order %s after payment. Error: %s", notification.order_id, detail)
+            else:
+                delay = settings.PAYU_NOTIFY_RETRY_SECONDS * 2 ** (notification.attempts - 1)
+                notification.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning("PayU notification %s failed (attempt %s), retrying in %ss: %s",
+                               notification.id, notification.attempts, delay, detail)
+            notification.last_error = str(detail)[:2000]
+            db.commit()
+    finally:
+        db.close()
+
+@job_handler("payu.notification")
+def _process_notification_job(db: Session, payload: dict) -> None:
+    # Runs in the job worker; retries are scheduled on the notification itself
+    process_notification(payload["notification_id"])
+
+def process_pending_notifications(limit: int = 50) -> int:
+    """Retries notifications that are due (failed attempts or lost background tasks)."""
+    db = SessionLocal()
+    try:
+        due_ids = [nid for (nid,) in db.query(PayUNotification.id).filter(
+            PayUNotification.state == NOTIFICATION_PENDING,
+            PayUNotification.next_attempt_at <= datetime.utcnow(),
+        ).order_by(PayUNotification.id).limit(limit).all()]
+    finally:
+        db.close()
+    for nid in due_ids:
+        process_notification(nid)
+    return len(due_ids)
+
+
+# Handle PayU webhook notifications: verify, record and acknowledge; fulfillment runs in the job worker
 @router.post("/notify")
 async def payu_notify(
     request: Request,
@@ -63,47 +195,44 @@ async def payu_notify(
         raise HTTPException(status_code=403, detail="Signature verification failed")
 
     notification_data = json.loads(body)
-    payu_order_status = notification_data.get("order", {}).get("status")
-    
-    # Process only completed payments
-    if payu_order_status == "COMPLETED":
-        ext_order_id_str = notification_data.get("order", {}).get("extOrderId")
-        if not ext_order_id_str:
-            return {"status": "error", "message": "Missing extOrderId"}
+    payu_order = notification_data.get("order", {})
+    payu_order_status = payu_order.get("status")
 
-        # Extract internal order ID from external reference (removes timestamp suffix)
-        try:
-            order_id = int(ext_order_id_str.split('_')[0])
-        except ValueError:
-            return {"status": "error", "message": "Invalid ID format"}
-
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return {"status": "error", "message": "Order not found"}
-            
-        # Update status and trigger fulfillment if not already processed
-        if order.status == "pending_payment":
-            order.status = "processing"
-            order.payment_status = "paid" 
-
-            try:
-                # Execute stock deduction and invoice generation
-                _fulfill_order(db, order, request)
-                db.commit()
-
-                # Log successful payment processing
-                try:
-                    write_log(
-                        db, user_id=order.user_id, action="PAYU_NOTIFY", resource="orders", status="SUCCESS",
-                        ip=request.client.host if request.client else None,
-                        meta={"order_id": order.id, "payu_status": payu_order_status}
-                    )
-                except Exception as log_e:
-                    logger.exception("Failed to write audit log after PayU notify: %s", log_e)
-
-            except Exception as e:
-                db.rollback()
-                logger.exception("CRITICAL: Failed to fulfill order %s after payment. Error: %s", order.id, e)
-                raise HTTPException(status_code=500, detail="Failed to fulfill order after payment")
-            
-    return {"status": "ok"}
\ No newline at end of file
+    # Only final payment states are acted upon
+    if payu_order_status not in ("COMPLETED", "CANCELED"):
+        return {"status": "ok"}
+
+    ext_order_id_str = payu_order.get("extOrderId")
+    if not ext_order_id_str:
+        return {"status": "error", "message": "Missing extOrderId"}
+
+    # Extract internal order ID from external reference (removes timestamp suffix)
+    try:
+        order_id = int(ext_order_id_str.split('_')[0])
+    except ValueError:
+        return {"status": "error", "message": "Invalid ID format"}
+
+    if not db.query(Order.id).filter(Order.id == order_id).first():
+        return {"status": "error", "message": "Order not found"}
+
+    # Record durably; a repeated (PayU order, status) pair is acknowledged without reprocessing
+    notification = PayUNotification(
+        payu_order_id=payu_order.get("orderId") or ext_order_id_str,
+        payu_status=payu_order_status,
+        order_id=order_id,
+        payload=body_text,
+        ip=request.client.host if request.client else None,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(notification)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        logger.info("Duplicate PayU notification ignored: order=%s status=%s", order_id, payu_order_status)
+        return {"status": "ok"}
+
+    # Queued in the same transaction as the notification record
+    enqueue(db, "payu.notification", {"notification_id": notification.id}, priority=PRIORITY_HIGH)
+    db.commit()
+    return {"status": "ok"}
@@ -10,12 +10,11 @@ from utils.tokenJWT import get_current_user
 
 # Import recommendation engine with fallback mechanism
 try:
-    from utils.recommender import generate_recommendations
+    from utils.recommender import mine_rules
 except ImportError:
-    # Fallback if ML libraries are missing
-    def generate_recommendations(**kwargs):
-        import pandas as pd
-        return pd.DataFrame()
+    # Fallback if the recommender module is unavailable
+    def mine_rules(**kwargs):
+        return []
 
 router = APIRouter(prefix="/salesman", tags=["Salesman"])
 
@@ -38,26 +37,18 @@ def get_sales_recommendations(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        # Generate recommendation rules
-        rules_df = generate_recommendations(min_support=0.01, min_confidence=0.2)
-        
-        if rules_df.empty:
-            return []
-
-        results = []
-        for _, row in rules_df.iterrows():
-            # Convert frozensets to lists for JSON serialization
-            ants = list(row['antecedents'])
-            cons = list(row['consequents'])
-            
-            results.append({
-                "product_in": ants,
-                "product_out": cons,
-                "confidence": f"{row['confidence']:.2f}",
-                "lift": f"{row['lift']:.2f}",
-            })
-            
-        return results
+        # Mine rules in the isolated worker process; only the compact rule list comes back
+        rules = mine_rules(min_support=0.01, min_confidence=0.2)
+
+        return [
+            {
+                "product_in": rule["product_in"],
+                "product_out": rule["product_out"],
+                "confidence": f"{rule['confidence']:.2f}",
+                "lift": f"{rule['lift']:.2f}",
+            }
+            for rule in rules
+        ]
 
     except Exception as e:
         print(f"Salesman Recommendation Error: {e}")
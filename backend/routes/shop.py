@@ -8,6 +8,7 @@ from database import get_db
 from utils.tokenJWT import get_current_user
 from models.users import User
 from models.product import Product
+from utils.inventory import available_quantities
 
 # Schema for product display in the shop
 class ProductShopResponse(BaseModel):
@@ -19,6 +20,7 @@ class ProductShopResponse(BaseModel):
     sell_price_net: float
     tax_rate: Optional[float] = 23.0
     stock_quantity: int
+    available_quantity: Optional[float] = None # Stock minus active checkout reservations
     image_url: Optional[str] = None
     
     class Config:
@@ -95,4 +97,12 @@ def list_products_for_shop(
     total = query.count()
     items: List[Product] = query.offset((page - 1) * page_size).limit(page_size).all()
 
-    return {"items": items, "total": total, "page": page, "page_size": page_size}
\ No newline at end of file
+    # Reservable quantity for the whole page in one grouped query
+    available = available_quantities(db, [p.id for p in items])
+    out = []
+    for p in items:
+        resp = ProductShopResponse.model_validate(p)
+        resp.available_quantity = available.get(p.id)
+        out.append(resp)
+
+    return {"items": out, "total": total, "page": page, "page_size": page_size}
\ No newline at end of file
@@ -9,6 +9,7 @@ from models.product import Product
 from models.users import User
 from utils.tokenJWT import get_current_user
 from utils.audit import write_log
+from utils.inventory import StockDelta, apply_stock_deltas
 import schemas.stock as stock_schemas
 
 router = APIRouter(tags=["Stock"])
@@ -91,22 +92,18 @@ def adjust_stock(
     product = db.query(Product).filter(Product.id == payload.product_id).first()
     if not product: raise HTTPException(404, "Product not found")
 
-    # Update stock quantity
-    qty_delta = payload.qty 
-    new_quantity = product.stock_quantity + qty_delta
-    if qty_delta < 0 and new_quantity < 0:
+    # Apply the change atomically; rejected if stock would drop below zero
+    result = apply_stock_deltas(
+        db, [StockDelta(product.id, payload.qty)],
+        user_id=current_user.id, movement_type=payload.type,
+        reason=payload.reason, supplier=payload.supplier,
+    )[0]
+    if not result.ok:
+        db.rollback()
         raise HTTPException(status_code=400, detail=f"Stan magazynowy nie może być ujemny")
 
-    product.stock_quantity = new_quantity
-    
-    # Create movement record
-    movement = StockMovement(
-        product_id=product.id, user_id=current_user.id,
-        qty=qty_delta, reason=payload.reason, type=payload.type, supplier=payload.supplier 
-    )
-    db.add(movement)
     db.commit()
-    db.refresh(movement)
+    movement = db.query(StockMovement).filter(StockMovement.id == result.movement_id).first()
     write_log(db, user_id=current_user.id, action="STOCK_ADJUSTMENT", resource="stock", status="SUCCESS", meta={"id": movement.id})
     return {
         "id": movement.id, "created_at": movement.created_at,
@@ -126,19 +123,13 @@ def receive_delivery(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     if not payload.items: raise HTTPException(400, "Brak produktów")
-    count = 0
-    # Process bulk delivery items
-    for item in payload.items:
-        if item.quantity <= 0: continue
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock_quantity += item.quantity
-            move = StockMovement(
-                product_id=product.id, user_id=current_user.id,
-                qty=item.quantity, type="IN", reason=payload.reason or "Dostawa", supplier=payload.supplier
-            )
-            db.add(move)
-            count += 1
+    # Process bulk delivery items in one set-based update (unknown products are skipped)
+    results = apply_stock_deltas(
+        db, [StockDelta(item.product_id, item.quantity) for item in payload.items if item.quantity > 0],
+        user_id=current_user.id, movement_type="IN",
+        reason=payload.reason or "Dostawa", supplier=payload.supplier,
+    )
+    count = sum(1 for r in results if r.ok)
     db.commit()
     write_log(db, user_id=current_user.id, action="STOCK_DELIVERY", resource="stock", status="SUCCESS", meta={"count": count})
     return {"message": f"Przyjęto {count} pozycji"}
\ No newline at end of file
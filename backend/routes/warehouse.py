@@ -1,22 +1,33 @@
 # backend/routes/warehouse.py
 from typing import Optional, Literal, List
 from datetime import datetime
-from pathlib import Path
-import json
+import hashlib
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Header
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, SessionLocal
 from models.users import User
-from models.WarehouseDoc import WarehouseDocument, WarehouseStatus
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentItem, WarehouseStatus
 from models.invoice import Invoice
 from models.order import Order
-from utils.tokenJWT import get_current_user
+from utils.tokenJWT import create_scoped_token, get_current_user, get_scoped_user
 from utils.audit import write_log
-
-from schemas.warehouse import WarehouseStatusUpdate, WarehouseDocPage, WarehouseDocDetail, WzProductItem 
+from utils.jobs import job_handler
+from utils.pdf import (
+    ensure_wz_pdf, get_wz_pdf_path, render_wz_pdf, render_wave_pdf, store_wz_pdf, wz_pdf_version, etag_matches,
+    pdf_cache_headers, pdf_response,
+)
+from utils.picking import build_wave, load_wave_documents
+from utils.wz_feed import active_count, feed_events, record_status_change
+from config import settings
+
+from schemas.warehouse import (
+    WarehouseStatusUpdate, WarehouseBulkStatusUpdate, WarehouseBulkStatusResult, WarehouseDocPage, WarehouseDocDetail, WzProductItem,
+    PendingProductQuantity, PendingProductDocument, PendingProductDetail, WavePickRequest, WavePickList,
+)
 
 router = APIRouter(prefix="/warehouse-documents", tags=["Warehouse"])
 
@@ -24,26 +35,52 @@ router = APIRouter(prefix="/warehouse-documents", tags=["Warehouse"])
 def _role_ok(user: User) -> bool:
     return (user.role or "").upper() in {"ADMIN", "WAREHOUSE", "SALESMAN"}
 
-# Convert database model to detail schema with JSON parsing
+# Documents still awaiting release
+OPEN_STATUSES = (WarehouseStatus.NEW, WarehouseStatus.IN_PROGRESS)
+
+# Transitions accepted by the bulk status change (single-document edits stay unrestricted)
+BULK_TRANSITIONS = {
+    WarehouseStatus.NEW: {WarehouseStatus.IN_PROGRESS, WarehouseStatus.RELEASED, WarehouseStatus.CANCELLED},
+    WarehouseStatus.IN_PROGRESS: {WarehouseStatus.NEW, WarehouseStatus.RELEASED, WarehouseStatus.CANCELLED},
+    WarehouseStatus.RELEASED: set(),
+    WarehouseStatus.CANCELLED: set(),
+}
+
+# Order status implied by a final WZ status
+ORDER_STATUS_BY_WZ = {
+    WarehouseStatus.RELEASED: "shipped",
+    WarehouseStatus.CANCELLED: "cancelled",
+}
+
+# Propagate a WZ status change to the linked orders with one set-based UPDATE
+def _propagate_order_status(db: Session, doc_ids: List[int], wz_status: WarehouseStatus) -> int:
+    order_status = ORDER_STATUS_BY_WZ.get(wz_status)
+    if not order_status or not doc_ids:
+        return 0
+    order_ids = (
+        select(Invoice.order_id)
+        .join(WarehouseDocument, WarehouseDocument.invoice_id == Invoice.id)
+        .where(WarehouseDocument.id.in_(doc_ids), Invoice.order_id.isnot(None))
+    )
+    return (
+        db.query(Order)
+        .filter(Order.id.in_(order_ids), Order.status != order_status)
+        .update({Order.status: order_status}, synchronize_session=False)
+    )
+
+# Convert database model to detail schema
 def _document_to_detail_schema(doc: WarehouseDocument) -> WarehouseDocDetail:
-    try:
-        items_data = json.loads(doc.items_json or "[]")
-    except Exception:
-        items_data = []
-        
-    items = []
-    for it in items_data:
-        raw_qty = it.get('quantity') or it.get('qty') or 0
-        try: qty_val = float(raw_qty)
-        except: qty_val = 0.0
-
-        items.append(WzProductItem(
-            product_name=it.get('product_name', 'Nieznany produkt'),
-            product_code=it.get('product_code', 'N/A'),
-            quantity=qty_val,
-            location=it.get('location', None),
-        ))
-        
+    items = [
+        WzProductItem(
+            product_id=it.product_id,
+            product_name=it.product_name,
+            product_code=it.product_code or 'N/A',
+            quantity=it.quantity,
+            location=it.location,
+        )
+        for it in doc.items
+    ]
+
     return WarehouseDocDetail(
         id=doc.id,
         invoice_id=doc.invoice_id,
@@ -57,7 +94,6 @@ def _document_to_detail_schema(doc: WarehouseDocument) -> WarehouseDocDetail:
 # Retrieve count of active documents (NEW or IN_PROGRESS)
 @router.get("/active-count")
 def get_active_wz_count(
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -66,15 +102,38 @@ def get_active_wz_count(
     if not _role_ok(current_user): 
         raise HTTPException(403, "Not authorized")
     
-    # Count records with specific statuses
-    count = db.query(WarehouseDocument).filter(
-        WarehouseDocument.status.in_([
-            WarehouseStatus.NEW, 
-            WarehouseStatus.IN_PROGRESS
-        ])
-    ).count()
-    
-    return {"total": count}
+    # Served from the in-memory counter (see utils/wz_feed.py), no COUNT per poll
+    return {"total": active_count()}
+
+# Scope of the short-lived tokens accepted by the feed
+FEED_TOKEN_SCOPE = "wz_feed"
+
+# Short-lived token for the live feed (EventSource cannot send the Authorization header)
+@router.post("/feed-token")
+def create_feed_token(current_user: User = Depends(get_current_user)):
+    if not _role_ok(current_user):
+        raise HTTPException(403, "Not authorized")
+    return {
+        "token": create_scoped_token(current_user.email, FEED_TOKEN_SCOPE, settings.WZ_FEED_TOKEN_SECONDS),
+        "expires_in": settings.WZ_FEED_TOKEN_SECONDS,
+    }
+
+# Live feed for warehouse terminals (Server-Sent Events): active count, new documents, status changes
+@router.get("/feed")
+async def wz_event_feed(request: Request, token: str = Query(None)):
+    # Checked on connect only; the session is not held open for the lifetime of the stream
+    db = SessionLocal()
+    try:
+        current_user = get_scoped_user(token, FEED_TOKEN_SCOPE, db)
+    finally:
+        db.close()
+    if not _role_ok(current_user):
+        raise HTTPException(403, "Not authorized")
+    return StreamingResponse(
+        feed_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # List warehouse documents with filtering and pagination
@@ -133,6 +192,113 @@ def list_warehouse_documents(
     items = q.offset((page - 1) * page_size).limit(page_size).all()
     return {"items": items, "total": total, "page": page, "page_size": page_size}
 
+# Pending release quantities per product over open WZ documents
+@router.get("/pending", response_model=List[PendingProductQuantity])
+def list_pending_quantities(
+    product_id: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not _role_ok(current_user): raise HTTPException(403, "Not authorized")
+    pending = func.sum(WarehouseDocumentItem.quantity).label("pending_quantity")
+    q = (
+        db.query(
+            WarehouseDocumentItem.product_id,
+            WarehouseDocumentItem.product_code,
+            func.max(WarehouseDocumentItem.product_name).label("product_name"),
+            pending,
+            func.count(func.distinct(WarehouseDocumentItem.document_id)).label("documents"),
+        )
+        .join(WarehouseDocument, WarehouseDocument.id == WarehouseDocumentItem.document_id)
+        .filter(WarehouseDocument.status.in_(OPEN_STATUSES))
+    )
+    if product_id:
+        q = q.filter(WarehouseDocumentItem.product_id.in_(product_id))
+    rows = q.group_by(WarehouseDocumentItem.product_id, WarehouseDocumentItem.product_code).order_by(pending.desc()).all()
+    return [PendingProductQuantity.model_validate(row, from_attributes=True) for row in rows]
+
+# Open WZ documents containing a product (served by ix_wz_items_product_document)
+@router.get("/pending/{product_id}", response_model=PendingProductDetail)
+def get_pending_for_product(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not _role_ok(current_user): raise HTTPException(403, "Not authorized")
+    rows = (
+        db.query(WarehouseDocumentItem, WarehouseDocument)
+        .join(WarehouseDocument, WarehouseDocument.id == WarehouseDocumentItem.document_id)
+        .filter(WarehouseDocumentItem.product_id == product_id, WarehouseDocument.status.in_(OPEN_STATUSES))
+        .order_by(WarehouseDocument.created_at, WarehouseDocument.id)
+        .all()
+    )
+    documents = [
+        PendingProductDocument(
+            document_id=doc.id, status=doc.status, buyer_name=doc.buyer_name, created_at=doc.created_at,
+            quantity=item.quantity, location=item.location,
+        )
+        for item, doc in rows
+    ]
+    return {"product_id": product_id, "pending_quantity": sum(d.quantity for d in documents), "documents": documents}
+
+# Validate and load the documents of a wave; optionally start picking them (NEW -> IN_PROGRESS)
+def _prepare_wave(db: Session, payload: WavePickRequest, user: User):
+    doc_ids = sorted(set(payload.document_ids))
+    if len(doc_ids) > settings.WAVE_MAX_DOCUMENTS:
+        raise HTTPException(400, f"Too many documents in one wave (max {settings.WAVE_MAX_DOCUMENTS})")
+    documents = load_wave_documents(db, doc_ids)
+    missing = sorted(set(doc_ids) - {doc.id for doc in documents})
+    if missing:
+        raise HTTPException(404, f"WZ not found: {missing}")
+    closed = [doc.id for doc in documents if doc.status not in OPEN_STATUSES]
+    if closed:
+        raise HTTPException(400, f"Dokumenty nie są otwarte (NEW/IN_PROGRESS): {closed}")
+
+    lines = build_wave(db, documents)
+    if payload.mark_in_progress:
+        started = [doc.id for doc in documents if doc.status == WarehouseStatus.NEW]
+        if started:
+            # Same status guard as the bulk endpoint: a document started meanwhile fails the whole wave
+            count = db.query(WarehouseDocument).filter(
+                WarehouseDocument.id.in_(started), WarehouseDocument.status == WarehouseStatus.NEW
+            ).update({WarehouseDocument.status: WarehouseStatus.IN_PROGRESS}, synchronize_session=False)
+            if count != len(started):
+                db.rollback()
+                raise HTTPException(409, "Documents changed meanwhile, reload and retry")
+            record_status_change(db, {WarehouseStatus.NEW: started}, WarehouseStatus.IN_PROGRESS)
+            write_log(db, user_id=user.id, action="WZ_WAVE", resource="wz", status="SUCCESS",
+                      meta={"documents": doc_ids, "started": started, "lines": len(lines)})
+    return documents, lines
+
+# Aggregated pick list for a wave of open WZ documents, sorted along the pick path
+@router.post("/wave", response_model=WavePickList)
+def create_wave_pick_list(
+    payload: WavePickRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
+):
+    if not _role_ok(current_user): raise HTTPException(403, "Not authorized")
+    documents, lines = _prepare_wave(db, payload, current_user)
+    return {
+        "document_ids": [doc.id for doc in documents],
+        "lines": lines,
+        "total_quantity": sum(line.quantity for line in lines),
+        "created_at": datetime.now(),
+    }
+
+# Printable pick list for a wave (same body as POST /wave)
+@router.post("/wave/pdf")
+def create_wave_pick_list_pdf(
+    payload: WavePickRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
+):
+    if not _role_ok(current_user): raise HTTPException(403, "Not authorized")
+    documents, lines = _prepare_wave(db, payload, current_user)
+    created_at = datetime.now()
+    try:
+        content = render_wave_pdf(documents, lines, created_at)
+    except ImportError as e:
+        raise HTTPException(500, str(e))
+    version = hashlib.sha256(content).hexdigest()[:20]
+    return pdf_response(content, f"Lista_kompletacji_{created_at.strftime('%Y%m%d_%H%M')}.pdf", version)
+
 # Get detailed view of a single warehouse document
 @router.get("/{doc_id}", response_model=WarehouseDocDetail)
 def get_wz_detail(
@@ -143,7 +309,7 @@ def get_wz_detail(
     if not doc: raise HTTPException(404, "WZ not found")
     return _document_to_detail_schema(doc)
 
-# Update document status and sync with Order status if released
+# Update document status and propagate it to the linked Order in the same transaction
 @router.patch("/{doc_id}/status")
 def update_warehouse_status(
     doc_id: int, status_data: WarehouseStatusUpdate, request: Request,
@@ -155,147 +321,104 @@ def update_warehouse_status(
     
     old = doc.status
     doc.status = status_data.status
+
+    # Sync order status ('shipped' on release, 'cancelled' on cancellation)
+    _propagate_order_status(db, [doc.id], doc.status)
+    record_status_change(db, {old: [doc.id]}, doc.status)
     db.commit()
-    
-    # Sync order status to 'shipped' if WZ is released
-    if doc.status == WarehouseStatus.RELEASED and doc.invoice_id:
-        inv = db.query(Invoice).filter(Invoice.id == doc.invoice_id).first()
-        if inv and inv.order_id:
-            ord = db.query(Order).filter(Order.id == inv.order_id).first()
-            if ord: 
-                ord.status = "shipped"
-                db.commit()
 
     write_log(db, user_id=current_user.id, action="WZ_STATUS", resource="wz", status="SUCCESS", meta={"id": doc.id, "new": doc.status})
     return {"message": "Status updated"}
 
-WZ_STORAGE_DIR = Path("storage/wz")
-
-# Ensure storage directory exists
-def _ensure_wz_dir() -> None:
-    WZ_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+# Change the status of many documents in one transaction (all or nothing), with one audit entry
+@router.patch("/status", response_model=WarehouseBulkStatusResult)
+def bulk_update_warehouse_status(
+    payload: WarehouseBulkStatusUpdate, request: Request,
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user),
+):
+    if not _role_ok(current_user): raise HTTPException(403, "Not authorized")
+    doc_ids = sorted(set(payload.document_ids))
+    if len(doc_ids) > settings.WZ_BULK_STATUS_MAX_DOCUMENTS:
+        raise HTTPException(400, f"Too many documents (max {settings.WZ_BULK_STATUS_MAX_DOCUMENTS})")
 
-# Get PDF file path
-def _wz_pdf_path(doc_id: int) -> Path:
-    return WZ_STORAGE_DIR / f"WZ-{doc_id}.pdf"
+    current = dict(
+        db.query(WarehouseDocument.id, WarehouseDocument.status).filter(WarehouseDocument.id.in_(doc_ids)).all()
+    )
+    missing = [i for i in doc_ids if i not in current]
+    if missing:
+        raise HTTPException(404, f"WZ not found: {missing}")
+
+    target = payload.status
+    unchanged = [i for i in doc_ids if current[i] == target]
+    invalid = {i: current[i].value for i in doc_ids if current[i] != target and target not in BULK_TRANSITIONS[current[i]]}
+    if invalid:
+        raise HTTPException(400, f"Niedozwolona zmiana statusu na {target.value}: {invalid}")
+
+    # One UPDATE per source status; the status guard catches documents changed concurrently
+    updated, changes = [], {}
+    for source in {current[i] for i in doc_ids if i not in unchanged}:
+        ids = [i for i in doc_ids if current[i] == source]
+        count = (
+            db.query(WarehouseDocument)
+            .filter(WarehouseDocument.id.in_(ids), WarehouseDocument.status == source)
+            .update({WarehouseDocument.status: target}, synchronize_session=False)
+        )
+        if count != len(ids):
+            db.rollback()
+            raise HTTPException(409, "Documents changed meanwhile, reload and retry")
+        updated.extend(ids)
+        changes[source] = ids
+    updated.sort()
+
+    orders_updated = _propagate_order_status(db, updated, target)
+    record_status_change(db, changes, target)
+    db.commit()
 
-BACKEND_DIR = Path(__file__).resolve().parents[1]
-FONT_DIRS = [BACKEND_DIR / "assets" / "fonts", BACKEND_DIR / "fonts"]
+    write_log(
+        db, user_id=current_user.id, action="WZ_STATUS_BULK", resource="wz", status="SUCCESS", ip=request.client.host,
+        meta={"new": target.value, "updated": updated, "unchanged": unchanged, "orders_updated": orders_updated},
+    )
+    return {"status": target, "updated": updated, "unchanged": unchanged, "orders_updated": orders_updated}
 
-# Locate font file in known directories
-def _find_font(name: str) -> Optional[Path]:
-    for d in FONT_DIRS:
-        p = d / name
-        if p.exists(): return p
+# WZ PDFs are no longer pre-rendered (most are printed once); the handler only lets
+# pdf.wz jobs queued by older versions finish instead of failing
+@job_handler("pdf.wz")
+def _render_wz_pdf_job(db: Session, payload: dict) -> None:
     return None
 
-# Generate PDF document using ReportLab
-def _generate_wz_pdf(doc: WarehouseDocument, out_path: Path) -> None:
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import mm
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-    except ImportError:
-        raise HTTPException(status_code=500, detail="reportlab missing")
-
-    regular_path = _find_font("DejaVuSans.ttf")
-    bold_path    = _find_font("DejaVuSans-Bold.ttf")
-
-    if "DejaVu" not in pdfmetrics.getRegisteredFontNames() and regular_path:
-        pdfmetrics.registerFont(TTFont("DejaVu", str(regular_path)))
-    if "DejaVu-Bold" not in pdfmetrics.getRegisteredFontNames() and bold_path:
-        pdfmetrics.registerFont(TTFont("DejaVu-Bold", str(bold_path)))
-
-    _ensure_wz_dir()
-    c = canvas.Canvas(str(out_path), pagesize=A4)
-    y = 297 * mm - 30 * mm
-
-    try: c.setFont("DejaVu-Bold", 16)
-    except: c.setFont("Helvetica-Bold", 16)
-    c.drawString(20 * mm, y, f"Wydanie zewnętrzne WZ-{doc.id}")
-    y -= 10 * mm
-
-    try: c.setFont("DejaVu", 10)
-    except: c.setFont("Helvetica", 10)
-    
-    date_str = doc.created_at.strftime('%Y-%m-%d') if doc.created_at else "BRAK DATY"
-    c.drawString(20 * mm, y, f"Data dokumentu: {date_str}")
-    y -= 6 * mm
-    
-    c.drawString(20 * mm, y, f"Odbiorca: {str(doc.buyer_name or '')}")
-    y -= 5 * mm
-    
-    if doc.shipping_address:
-        c.drawString(20 * mm, y, f"Adres dostawy: {doc.shipping_address}")
-        y -= 5 * mm
-    
-    y -= 5 * mm 
-
-    try: c.setFont("DejaVu-Bold", 10)
-    except: c.setFont("Helvetica-Bold", 10)
-    c.drawString(20 * mm, y, "Produkt")
-    c.drawString(95 * mm, y, "Kod")
-    c.drawString(130 * mm, y, "Ilość")
-    c.drawString(155 * mm, y, "Lokalizacja")
-    y -= 6 * mm
-    c.line(20 * mm, y, 190 * mm, y)
-    y -= 6 * mm
-
-    try: c.setFont("DejaVu", 10)
-    except: c.setFont("Helvetica", 10)
-    
-    try: items = json.loads(doc.items_json or "[]")
-    except: items = []
-
-    for it in items:
-        name = str(it.get("product_name", "") or "")
-        code = str(it.get("product_code", "") or "")
-        qty  = str(it.get("quantity", "") or it.get("qty") or "")
-        loc  = str(it.get("location", "") or "")
-
-        c.drawString(20 * mm, y, name[:45])
-        c.drawString(95 * mm, y, code[:20])
-        c.drawRightString(145 * mm, y, str(qty))
-        c.drawString(155 * mm, y, loc[:20])
-        y -= 6 * mm
-        if y < 30 * mm:
-            c.showPage()
-            y = 297 * mm - 20 * mm
-            try: c.setFont("DejaVu", 10)
-            except: c.setFont("Helvetica", 10)
-
-    y -= 15 * mm
-    c.line(20 * mm, y, 190 * mm, y)
-    y -= 8 * mm
-    c.drawString(20 * mm, y, "Uwagi: __________________________")
-    y -= 15 * mm
-    c.drawString(20 * mm, y, "Wydal: __________________________")
-    c.drawString(110 * mm, y, "Odebral: ________________________")
-    
-    c.showPage()
-    c.save()
-
-# Endpoint to trigger PDF generation
+# Endpoint to trigger PDF generation (cached versions are reused)
 @router.post("/{doc_id}/pdf")
-def generate_wz_pdf(doc_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def generate_wz_pdf_endpoint(doc_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     if not _role_ok(user): raise HTTPException(403, "Not authorized")
     doc = db.query(WarehouseDocument).filter(WarehouseDocument.id == doc_id).first()
     if not doc: raise HTTPException(404, "Not found")
-    out = _wz_pdf_path(doc.id)
-    _generate_wz_pdf(doc, out)
+    ensure_wz_pdf(doc)
     return {"message": "Generated"}
 
-# Endpoint to download PDF, generating on demand if missing
+# Endpoint to download PDF: cached file of the current version when present, otherwise rendered in memory
+# (large documents are written to storage for the next download)
 @router.get("/{doc_id}/download")
-def download_wz_pdf(doc_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def download_wz_pdf(
+    doc_id: int,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
     if not _role_ok(user): raise HTTPException(403, "Not authorized")
     doc = db.query(WarehouseDocument).filter(WarehouseDocument.id == doc_id).first()
     if not doc: raise HTTPException(404, "Not found")
-    path = _wz_pdf_path(doc.id)
-    if not path.exists():
+
+    version = wz_pdf_version(doc)
+    if etag_matches(if_none_match, version):
+        return Response(status_code=304, headers=pdf_cache_headers(version))
+
+    # Cached files carry their content version, so a file of an older version is never served
+    path = get_wz_pdf_path(doc.id, version)
+    content = path if path.exists() else None
+    if content is None:
         try:
-            _generate_wz_pdf(doc, path)
-        except: raise HTTPException(404, "PDF not found")
-    return FileResponse(str(path), media_type="application/pdf", filename=path.name)
\ No newline at end of file
+            content = render_wz_pdf(doc)
+        except Exception: raise HTTPException(404, "PDF not found")
+        if len(content) > settings.PDF_MEMORY_MAX_BYTES:
+            store_wz_pdf(doc.id, version, content)
+    return pdf_response(content, f"WZ-{doc.id}.pdf", version)
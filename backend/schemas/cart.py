@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional, Literal
 
 # Request schema for adding an item to the cart
 class CartAddItem(BaseModel):
@@ -18,6 +18,7 @@ class CartItemOut(BaseModel):
     qty: float
     unit_price: float
     line_total: float
+    available_qty: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -25,4 +26,27 @@ class CartItemOut(BaseModel):
 # Response schema for the entire cart summary
 class CartOut(BaseModel):
     items: List[CartItemOut]
-    total: float
\ No newline at end of file
+    total: float
+
+# Single operation of a batch cart update (qty is required for add/set)
+class CartBatchOp(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    qty: Optional[float] = Field(None, gt=0)
+
+# Request schema for applying many cart operations at once
+class CartBatchRequest(BaseModel):
+    ops: List[CartBatchOp] = Field(min_length=1, max_length=500)
+
+# Outcome of one batch operation
+class CartBatchLineResult(BaseModel):
+    index: int
+    op: str
+    product_id: int
+    ok: bool
+    error: Optional[str] = None
+
+# Response schema for a batch update: final cart plus per-operation results
+class CartBatchOut(BaseModel):
+    cart: CartOut
+    results: List[CartBatchLineResult]
@@ -101,9 +101,10 @@ class InvoiceListItem(BaseModel):
 # Paginated response wrapper for invoice lists
 class InvoiceListPage(BaseModel):
     items: List[InvoiceListItem]
-    total: int
+    total: Optional[int] = None # Not counted again on cursor pages
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 # Input schema for creating a correction invoice
 class InvoiceCorrectionCreate(BaseModel):
@@ -111,4 +112,16 @@ class InvoiceCorrectionCreate(BaseModel):
     buyer_nip: Optional[str] = None
     buyer_address: Optional[str] = None
     items: List[InvoiceItemCreate]
-    correction_reason: str
\ No newline at end of file
+    correction_reason: str
+
+# Progress of a bulk PDF export (GET /invoices/export/{export_id})
+class InvoiceExportStatus(BaseModel):
+    export_id: str
+    state: str # running, done, failed, cancelled
+    total: int
+    done: int
+    rendered: int # PDFs rendered for this export (the rest came from the cache)
+    failed: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -33,6 +33,7 @@ class OrderResponse(BaseModel):
     created_at: datetime
     items: List[OrderItemOut]
     invoice_id: Optional[int] = None
+    wz_status: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -43,6 +44,7 @@ class OrdersPage(BaseModel):
     total: int
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 # Schema for updating order status
 class OrderStatusPatch(BaseModel):
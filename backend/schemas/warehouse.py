@@ -6,6 +6,7 @@ from models.WarehouseDoc import WarehouseStatus
 
 # Represents a single product line within a warehouse document
 class WzProductItem(BaseModel):
+    product_id: Optional[int] = None
     product_name: str
     product_code: str
     quantity: float
@@ -39,9 +40,75 @@ class WarehouseDocItem(BaseModel):
 class WarehouseStatusUpdate(BaseModel):
     status: WarehouseStatus
 
+# Bulk status change of WZ documents (end-of-day dispatch)
+class WarehouseBulkStatusUpdate(BaseModel):
+    document_ids: List[int] = Field(..., min_length=1)
+    status: WarehouseStatus
+
+# Outcome of a bulk status change
+class WarehouseBulkStatusResult(BaseModel):
+    status: WarehouseStatus
+    updated: List[int]
+    unchanged: List[int] # Already in the requested status
+    orders_updated: int
+
 # Paginated response schema for warehouse documents
 class WarehouseDocPage(BaseModel):
     items: List[WarehouseDocItem]
     total: int
     page: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+# Quantity of a product still to be released on open (NEW / IN_PROGRESS) WZ documents
+class PendingProductQuantity(BaseModel):
+    product_id: Optional[int] = None
+    product_code: Optional[str] = None
+    product_name: str
+    pending_quantity: float
+    documents: int
+
+# Open WZ document line for a given product
+class PendingProductDocument(BaseModel):
+    document_id: int
+    status: WarehouseStatus
+    buyer_name: Optional[str] = None
+    created_at: datetime
+    quantity: float
+    location: Optional[str] = None
+
+# Open WZ documents containing a product, with the total still to be released
+class PendingProductDetail(BaseModel):
+    product_id: int
+    pending_quantity: float
+    documents: List[PendingProductDocument]
+
+# Request to pick several open WZ documents in one wave
+class WavePickRequest(BaseModel):
+    document_ids: List[int] = Field(..., min_length=1)
+    mark_in_progress: bool = False # Move NEW documents of the wave to IN_PROGRESS
+
+# Part of a pick line that belongs to one WZ document
+class WaveAllocationOut(BaseModel):
+    document_id: int
+    quantity: float
+
+    class Config:
+        from_attributes = True
+
+# One stop of the pick walk
+class WavePickLine(BaseModel):
+    product_id: Optional[int] = None
+    product_code: Optional[str] = None
+    product_name: str
+    location: Optional[str] = None
+    quantity: float
+    allocations: List[WaveAllocationOut]
+
+    class Config:
+        from_attributes = True
+
+# Aggregated pick list of a wave, lines in pick path order
+class WavePickList(BaseModel):
+    document_ids: List[int]
+    lines: List[WavePickLine]
+    total_quantity: float
+    created_at: datetime
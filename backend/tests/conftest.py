@@ -0,0 +1,124 @@
+# backend/tests/conftest.py
+"""
+Shared test setup.
+
+database.py, storage/ and static/ are relative to the working directory, so
+the tests run from a throw-away directory: every run gets its own SQLite file
+(file-backed, so threads see each other's commits) and its own PDF storage.
+The schema is recreated and the PDF storage emptied before each test.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+WORK_DIR = tempfile.mkdtemp(prefix="warehouse_tests_")
+os.chdir(WORK_DIR)
+
+# Fixed settings, so a developer's .env (real PayU credentials) is never used
+os.environ.update({
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "DATABASE_URL": "sqlite:///./database_warehouseapp.db",
+    "PAYU_API_URL": "https://payu.test",
+    "PAYU_POS_ID": "145227",
+    "PAYU_CLIENT_ID": "145227",
+    "PAYU_CLIENT_SECRET": "client-secret",
+    "PAYU_SECOND_KEY_MD5": "second-key",
+    "FRONTEND_URL": "http://localhost:5173",
+})
+
+# App imports only after the environment is in place (main registers every model)
+import main
+from sqlalchemy import event
+from database import Base, SessionLocal, engine
+from models.company import Company
+from models.product import Product
+from models.users import User
+from utils import jobs
+from utils.tokenJWT import create_access_token
+
+
+@pytest.fixture(autouse=True)
+def fresh_schema():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Ids start over, so PDFs of an earlier test would pass for this test's documents
+    shutil.rmtree(Path(WORK_DIR) / "storage", ignore_errors=True)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    # Not used as a context manager: startup hooks (embedded workers, sweeps) stay off
+    return TestClient(main.app)
+
+
+def add_user(db, email: str, role: str) -> User:
+    user = User(email=email, password_hash="x", role=role, first_name="Jan", last_name="Kowalski")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def add_product(db, stock: int = 10, price: int = 100, tax_rate: int = 23, **fields) -> Product:
+    n = db.query(Product).count() + 1
+    product = Product(
+        name=fields.pop("name", f"Produkt {n}"), code=fields.pop("code", f"P-{n:03d}"),
+        buy_price=price // 2, sell_price_net=price, tax_rate=tax_rate, stock_quantity=stock, **fields,
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+
+def add_company(db) -> Company:
+    company = Company(name="Hurtownia Budowlana Sp. z o.o.", nip="5260250274", address="ul. Prosta 12, 00-850 Warszawa")
+    db.add(company)
+    db.commit()
+    return company
+
+
+def auth_header(email: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+def drain_jobs() -> int:
+    """Runs queued background jobs until none is due; returns how many ran."""
+    runs = 0
+    while jobs.run_next("test-worker"):
+        runs += 1
+    return runs
+
+
+@contextmanager
+def count_statements():
+    """Collects the SQL statements sent to the database inside the block (executemany counts once)."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,50 @@
+# backend/tests/test_cart_batch.py
+# POST /cart/batch: many cart operations in one transaction, all or nothing
+from models.log import Log
+
+from conftest import add_product, add_user, auth_header
+
+
+def _cart(client, headers) -> dict:
+    return {it["product_id"]: it["qty"] for it in client.get("/cart", headers=headers).json()["items"]}
+
+
+def test_batch_with_one_invalid_line_changes_nothing(client, db):
+    add_user(db, "klient@example.com", "customer")
+    cement, bricks, sand = add_product(db, stock=10), add_product(db, stock=2), add_product(db, stock=5)
+    headers = auth_header("klient@example.com")
+    assert client.post("/cart/add", json={"product_id": cement.id, "qty": 1}, headers=headers).status_code == 200
+    assert client.post("/cart/add", json={"product_id": sand.id, "qty": 1}, headers=headers).status_code == 200
+
+    response = client.post("/cart/batch", headers=headers, json={"ops": [
+        {"op": "add", "product_id": cement.id, "qty": 2},
+        {"op": "remove", "product_id": sand.id},
+        {"op": "set", "product_id": bricks.id, "qty": 5},  # only 2 in stock
+    ]})
+    assert response.status_code == 400
+    results = response.json()["detail"]["results"]
+    assert [(r["index"], r["ok"], r["error"]) for r in results] == [
+        (0, True, None), (1, True, None), (2, False, "Insufficient stock"),
+    ]
+    # The valid lines before the failing one were not applied either
+    assert _cart(client, headers) == {cement.id: 1, sand.id: 1}
+    assert db.query(Log).filter(Log.action == "CART_BATCH").count() == 0
+
+
+def test_valid_batch_is_applied_with_one_audit_entry(client, db):
+    add_user(db, "klient@example.com", "customer")
+    cement, bricks, sand = add_product(db, stock=10), add_product(db, stock=2), add_product(db, stock=5)
+    headers = auth_header("klient@example.com")
+    assert client.post("/cart/add", json={"product_id": sand.id, "qty": 1}, headers=headers).status_code == 200
+
+    response = client.post("/cart/batch", headers=headers, json={"ops": [
+        {"op": "add", "product_id": cement.id, "qty": 2},
+        {"op": "add", "product_id": cement.id, "qty": 1},
+        {"op": "set", "product_id": bricks.id, "qty": 2},
+        {"op": "remove", "product_id": sand.id},
+    ]})
+    assert response.status_code == 200, response.text
+    assert all(r["ok"] for r in response.json()["results"])
+    assert {it["product_id"]: it["qty"] for it in response.json()["cart"]["items"]} == {cement.id: 3, bricks.id: 2}
+    assert _cart(client, headers) == {cement.id: 3, bricks.id: 2}
+    assert db.query(Log).filter(Log.action == "CART_BATCH").count() == 1
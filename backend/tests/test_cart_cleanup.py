@@ -0,0 +1,65 @@
+# backend/tests/test_cart_cleanup.py
+# Cart expiry/retention: what is removed, and that both batch queries are index range scans
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from database import engine
+from models.cart import Cart, CartItem
+from utils.cart_cleanup import cleanup_carts
+
+from conftest import add_product, add_user
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def _cart(db, user, status, idle_days, items=1):
+    cart = Cart(user_id=user.id, status=status, updated_at=NOW - timedelta(days=idle_days))
+    cart.items = [CartItem(product_id=add_product(db).id, qty=1, unit_price_snapshot=100) for _ in range(items)]
+    db.add(cart)
+    db.commit()
+    return cart.id
+
+
+def test_cleanup_expires_idle_and_deletes_old_closed_carts(db):
+    user = add_user(db, "klient@example.com", "customer")
+    active = _cart(db, user, "open", idle_days=2)
+    idle = _cart(db, user, "open", idle_days=45)
+    recent_order = _cart(db, user, "ordered", idle_days=10)
+    old_order = _cart(db, user, "ordered", idle_days=60, items=3)
+    old_legacy = _cart(db, user, "pending_payment", idle_days=90)
+
+    stats = cleanup_carts(db, now=NOW)
+
+    assert stats["expired_carts"] == 1
+    assert stats["deleted_carts"] == 2 and stats["deleted_items"] == 4
+    db.expire_all()
+    statuses = dict(db.query(Cart.id, Cart.status).all())
+    assert statuses == {active: "open", idle: "expired", recent_order: "ordered"}
+    assert old_order not in statuses and old_legacy not in statuses
+    assert db.query(CartItem).filter(CartItem.cart_id.in_([old_order, old_legacy])).count() == 0
+
+
+def test_cleanup_queries_search_the_status_updated_at_index(db):
+    user = add_user(db, "klient@example.com", "customer")
+    _cart(db, user, "open", idle_days=45)
+    _cart(db, user, "expired", idle_days=60)
+
+    selects = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM carts" in statement:
+            selects.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        cleanup_carts(db, now=NOW)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert selects
+    with engine.connect() as conn:
+        for statement, parameters in selects:
+            plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            assert "ix_carts_status_updated_at" in plan and "updated_at<" in plan.replace(" ", ""), plan
+            assert "SCAN carts" not in plan, plan
@@ -0,0 +1,134 @@
+# backend/tests/test_idempotency.py
+# Idempotency-Key: a duplicate of an in-flight request waits and replays, a reused key with another body is rejected
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from models.invoice import Invoice
+from utils.idempotency import run_idempotent, run_idempotent_async
+
+from conftest import add_company, add_product, add_user, auth_header
+
+BODY = {"buyer_name": "Budimex S.A.", "items": [{"product_id": 1, "quantity": 2}]}
+
+
+def test_duplicate_waits_for_the_original_and_replays(db):
+    user = add_user(db, "handlowiec@example.com", "salesman")
+    started, finish = threading.Event(), threading.Event()
+    calls, results = [], {}
+
+    def handler():
+        calls.append(threading.current_thread().name)
+        started.set()
+        assert finish.wait(5)
+        return {"id": 7, "number": "INV-7"}
+
+    def send(name):
+        results[name] = run_idempotent("key-1", user.id, "invoices.create", BODY, handler)
+
+    original = threading.Thread(target=send, args=("original",), name="original")
+    original.start()
+    assert started.wait(5)
+    duplicate = threading.Thread(target=send, args=("duplicate",), name="duplicate")
+    duplicate.start()
+
+    # The duplicate does not run the handler and does not return while the original is in flight
+    duplicate.join(0.5)
+    assert duplicate.is_alive()
+    finish.set()
+    original.join(5)
+    duplicate.join(5)
+
+    assert calls == ["original"]
+    assert results["original"] == {"id": 7, "number": "INV-7"}
+    replay = results["duplicate"]
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.body == b'{"id":7,"number":"INV-7"}'
+
+
+def test_async_duplicate_waits_for_the_original_and_replays(db):
+    user = add_user(db, "klient@example.com", "customer")
+    calls = []
+
+    async def scenario():
+        finish = asyncio.Event()
+
+        async def handler():
+            calls.append(1)
+            await finish.wait()
+            return {"order_id": 3, "redirect_url": "https://secure.payu.test/pay"}
+
+        original = asyncio.create_task(run_idempotent_async("key-1", user.id, "orders.initiate_payment", BODY, handler))
+        await asyncio.sleep(0.1)
+        duplicate = asyncio.create_task(run_idempotent_async("key-1", user.id, "orders.initiate_payment", BODY, handler))
+        await asyncio.sleep(0.5)
+        assert not duplicate.done()
+        finish.set()
+        return await original, await duplicate
+
+    result, replay = asyncio.run(scenario())
+    assert calls == [1]
+    assert result["order_id"] == 3
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.body == b'{"order_id":3,"redirect_url":"https://secure.payu.test/pay"}'
+
+
+def test_key_reused_with_another_body_is_rejected(db):
+    user = add_user(db, "handlowiec@example.com", "salesman")
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_handler():
+        started.set()
+        assert finish.wait(5)
+        return {"id": 1}
+
+    original = threading.Thread(target=run_idempotent, args=("key-1", user.id, "invoices.create", BODY, slow_handler))
+    original.start()
+    assert started.wait(5)
+    other_body = dict(BODY, buyer_name="Inny nabywca")
+    try:
+        # While the original is in flight...
+        with pytest.raises(HTTPException) as in_flight:
+            run_idempotent("key-1", user.id, "invoices.create", other_body, lambda: pytest.fail("must not run"))
+        assert in_flight.value.status_code == 422
+    finally:
+        finish.set()
+        original.join(5)
+
+    # ...and after it completed
+    with pytest.raises(HTTPException) as completed:
+        run_idempotent("key-1", user.id, "invoices.create", other_body, lambda: pytest.fail("must not run"))
+    assert completed.value.status_code == 422
+
+
+def test_failed_request_releases_its_key(db):
+    user = add_user(db, "handlowiec@example.com", "salesman")
+
+    def failing():
+        raise HTTPException(status_code=400, detail="Not enough stock")
+
+    with pytest.raises(HTTPException):
+        run_idempotent("key-1", user.id, "invoices.create", BODY, failing)
+    assert run_idempotent("key-1", user.id, "invoices.create", BODY, lambda: {"id": 1}) == {"id": 1}
+
+
+def test_invoice_retry_with_the_same_key_creates_one_invoice(client, db):
+    add_company(db)
+    add_user(db, "handlowiec@example.com", "salesman")
+    product = add_product(db, stock=10)
+    headers = dict(auth_header("handlowiec@example.com"), **{"Idempotency-Key": "faktura-1"})
+    body = {"buyer_name": "Budimex S.A.", "items": [{"product_id": product.id, "quantity": 2}]}
+
+    first = client.post("/invoices", json=body, headers=headers)
+    retry = client.post("/invoices", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert db.query(Invoice).count() == 1
+
+    changed = client.post("/invoices", json=dict(body, buyer_name="Inny nabywca"), headers=headers)
+    assert changed.status_code == 422
+    assert db.query(Invoice).count() == 1
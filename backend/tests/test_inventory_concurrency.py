@@ -0,0 +1,65 @@
+# backend/tests/test_inventory_concurrency.py
+# Concurrent stock releases through apply_stock_deltas must never oversell
+import threading
+
+import pytest
+
+from database import SessionLocal
+from models.product import Product
+from models.stock import StockMovement
+from utils.inventory import StockDelta, apply_stock_deltas, failed_lines
+
+from conftest import add_product, add_user
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 20
+
+
+@pytest.mark.parametrize("initial_stock, qty", [(50, 1), (51, 2)])
+def test_concurrent_decrements_never_oversell(db, initial_stock, qty):
+    user = add_user(db, "magazyn@example.com", "warehouse")
+    product = add_product(db, stock=initial_stock)
+    product_id, user_id = product.id, user.id
+
+    successes, rejections, errors = [], [], []
+    start = threading.Barrier(THREADS)
+
+    def release_goods():
+        start.wait()
+        for _ in range(ATTEMPTS_PER_THREAD):
+            session = SessionLocal()
+            try:
+                results = apply_stock_deltas(
+                    session, [StockDelta(product_id, -qty)], user_id=user_id, movement_type="OUT",
+                )
+                if failed_lines(results):
+                    session.rollback()
+                    rejections.append(qty)
+                else:
+                    session.commit()
+                    successes.append(qty)
+            except Exception as e:
+                session.rollback()
+                errors.append(e)
+            finally:
+                session.close()
+
+    threads = [threading.Thread(target=release_goods) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(successes) + len(rejections) == THREADS * ATTEMPTS_PER_THREAD
+
+    db.expire_all()
+    final_stock = db.get(Product, product_id).stock_quantity
+    assert final_stock >= 0
+    # Every unit that could be released was released, and not one more
+    assert sum(successes) == initial_stock - initial_stock % qty
+    assert final_stock == initial_stock - sum(successes)
+
+    movements = [m.qty for m in db.query(StockMovement).filter(StockMovement.product_id == product_id)]
+    assert len(movements) == len(successes)
+    assert sum(movements) == -sum(successes)
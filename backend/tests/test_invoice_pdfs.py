@@ -0,0 +1,61 @@
+# backend/tests/test_invoice_pdfs.py
+# Invoice PDFs: every issued invoice and correction is pinned as issued, whatever its payment status
+from models.invoice import Invoice, PaymentStatus
+from utils.pdf import STORAGE_DIR
+from utils.pdf_storage import WZ_DIR, pinned_invoice_pdf
+
+from conftest import add_company, add_product, add_user, auth_header, drain_jobs
+
+BUYER = {"buyer_name": "Budimex S.A.", "buyer_nip": "7010002012", "buyer_address": "ul. Siedmiogrodzka 9, 01-204 Warszawa"}
+
+
+def _issue(client, headers, product_id, quantity=2) -> dict:
+    response = client.post("/invoices", json=dict(BUYER, items=[{"product_id": product_id, "quantity": quantity}]), headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_manual_invoice_and_correction_are_pinned(client, db):
+    add_company(db)
+    add_user(db, "handlowiec@example.com", "salesman")
+    product = add_product(db, stock=10)
+    headers = auth_header("handlowiec@example.com")
+
+    invoice = _issue(client, headers, product.id)
+    correction = client.post(f"/invoices/{invoice['id']}/correction", headers=headers, json=dict(
+        BUYER, items=[{"product_id": product.id, "quantity": 1}], correction_reason="Zwrot towaru",
+    ))
+    assert correction.status_code == 200, correction.text
+    drain_jobs()
+
+    for invoice_id in (invoice["id"], correction.json()["id"]):
+        assert db.get(Invoice, invoice_id).payment_status != PaymentStatus.PAID
+        assert pinned_invoice_pdf(invoice_id) is not None
+    # Pinned directly; nothing is left in the evictable cache, and WZ PDFs wait for their first download
+    assert list(STORAGE_DIR.glob("INV-*.pdf")) == []
+    assert list(WZ_DIR.glob("*.pdf")) == []
+
+
+def test_pinned_copy_outlives_seller_changes(client, db):
+    add_company(db)
+    add_user(db, "admin@example.com", "admin")
+    product = add_product(db, stock=10)
+    headers = auth_header("admin@example.com")
+    invoice_id = _issue(client, headers, product.id)["id"]
+    drain_jobs()
+    path, version = pinned_invoice_pdf(invoice_id)
+    # An explicitly generated copy lands in the cache
+    assert client.post(f"/invoices/{invoice_id}/pdf", headers=headers).status_code == 200
+    assert len(list(STORAGE_DIR.glob("INV-*.pdf"))) == 1
+
+    response = client.patch("/company/", json={"name": "Nowa Nazwa Sp. z o.o."}, headers=headers)
+    assert response.status_code == 200, response.text
+    drain_jobs()
+
+    # Cached copies rendered with the old seller data are dropped; the issued document is unchanged
+    assert list(STORAGE_DIR.glob("INV-*.pdf")) == []
+    assert pinned_invoice_pdf(invoice_id) == (path, version)
+    response = client.get(f"/invoices/{invoice_id}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{version}"'
+    assert response.content == path.read_bytes()
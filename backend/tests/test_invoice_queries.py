@@ -0,0 +1,103 @@
+# backend/tests/test_invoice_queries.py
+# Query-count regressions: the number of statements must not grow with the number of lines or rows
+import pytest
+
+from models.invoice import Invoice, InvoiceItem
+from models.product import Product
+from models.stock import StockMovement
+from models.WarehouseDoc import WarehouseDocumentItem
+
+from conftest import add_product, add_user, auth_header, count_statements
+
+
+def _issue_invoice(client, product_ids, headers):
+    payload = {"buyer_name": "Budimex S.A.", "items": [{"product_id": pid, "quantity": 2} for pid in product_ids]}
+    with count_statements() as statements:
+        response = client.post("/invoices", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), statements
+
+
+def test_create_invoice_query_count_does_not_depend_on_lines(client, db):
+    add_user(db, "admin@example.com", "admin")
+    headers = auth_header("admin@example.com")
+    product_ids = [add_product(db, stock=100).id for _ in range(300)]
+
+    # The first invoice also creates the numbering counter row
+    _issue_invoice(client, product_ids[:1], headers)
+
+    small, small_statements = _issue_invoice(client, product_ids[:5], headers)
+    large, large_statements = _issue_invoice(client, product_ids, headers)
+
+    assert len(large_statements) == len(small_statements)
+    assert len(large_statements) <= 15, large_statements
+
+    assert len(large["items"]) == 300
+    assert db.query(InvoiceItem).filter(InvoiceItem.invoice_id == large["id"]).count() == 300
+    assert db.query(WarehouseDocumentItem).count() == 1 + 5 + 300
+    assert db.query(StockMovement).count() == 1 + 5 + 300
+    assert db.get(Product, product_ids[-1]).stock_quantity == 98
+    assert db.get(Product, product_ids[0]).stock_quantity == 94
+
+
+def _invoice_history(db, owner, count):
+    # Regular invoices with three lines each; every fourth one also has a correction
+    product = add_product(db, stock=1000)
+    for n in range(1, count + 1):
+        invoice = Invoice(
+            number=n, buyer_name=f"Klient {n}", user_id=owner.id, total_net=300, total_vat=69, total_gross=369,
+            items=[InvoiceItem(product_id=product.id, product_name=product.name, quantity=1, price_net=100,
+                               tax_rate=23, total_net=100, total_gross=123) for _ in range(3)],
+        )
+        db.add(invoice)
+        db.flush()
+        if n % 4 == 0:
+            db.add(Invoice(
+                number=n, buyer_name=f"Klient {n}", user_id=owner.id, parent_id=invoice.id, is_correction=True,
+                correction_seq=1, correction_reason="Zwrot", total_net=-100, total_vat=-23, total_gross=-123,
+                items=[InvoiceItem(product_id=product.id, product_name=product.name, quantity=-1, price_net=100,
+                                   tax_rate=23, total_net=-100, total_gross=-123)],
+            ))
+    db.commit()
+
+
+def _page_statements(client, url, headers):
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), len(statements)
+
+
+@pytest.mark.parametrize("url, sizes", [
+    ("/invoices", (10, 100)),
+    ("/invoices/me", (10, 50)),
+])
+def test_invoice_list_query_count_does_not_depend_on_page_size(client, db, url, sizes):
+    admin = add_user(db, "admin@example.com", "admin")
+    _invoice_history(db, admin, 120)
+    headers = auth_header("admin@example.com")
+
+    counts = []
+    for size in sizes:
+        page, statements = _page_statements(client, f"{url}?page_size={size}", headers)
+        assert len(page["items"]) == size
+        counts.append(statements)
+
+    # User lookup, COUNT and the page itself: no per-row parent or line loads
+    assert counts[0] == counts[1] == 3, counts
+    corrections = [item["full_number"] for item in page["items"] if item["full_number"].endswith("/FK")]
+    assert corrections
+
+
+def test_invoice_cursor_pages_keep_a_constant_query_count(client, db):
+    admin = add_user(db, "admin@example.com", "admin")
+    _invoice_history(db, admin, 120)
+    headers = auth_header("admin@example.com")
+
+    first, first_count = _page_statements(client, "/invoices?page_size=100", headers)
+    second, second_count = _page_statements(client, f"/invoices?page_size=100&cursor={first['next_cursor']}", headers)
+
+    assert len(first["items"]) + len(second["items"]) == 150
+    assert first["total"] == 150 and second["total"] is None
+    # The cursor lookup replaces the COUNT of the first page
+    assert second_count <= first_count
@@ -0,0 +1,78 @@
+# backend/tests/test_numbering.py
+# Invoice numbers from the counter table: unique and gap-free under concurrency and rollbacks
+import threading
+
+from database import SessionLocal
+from models.invoice import Invoice
+from utils.numbering import allocate_number, next_invoice_number
+
+THREADS = 8
+ALLOCATIONS_PER_THREAD = 25
+
+
+def _allocate_concurrently(allocate, on_number=None):
+    committed, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for i in range(ALLOCATIONS_PER_THREAD):
+            session = SessionLocal()
+            try:
+                number = allocate(session)
+                # Every fifth transaction fails after taking a number
+                if i % 5 == 4:
+                    session.rollback()
+                    continue
+                if on_number:
+                    on_number(session, number)
+                session.commit()
+                with lock:
+                    committed.append(number)
+            except Exception as e:
+                session.rollback()
+                errors.append(e)
+            finally:
+                session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return committed, errors
+
+
+def _add_invoice(session, number):
+    session.add(Invoice(number=number, buyer_name="Klient", total_net=100, total_vat=23, total_gross=123))
+
+
+def test_invoice_numbers_are_unique_and_gap_free(db):
+    committed, errors = _allocate_concurrently(next_invoice_number, _add_invoice)
+
+    assert errors == []
+    expected = THREADS * ALLOCATIONS_PER_THREAD * 4 // 5
+    assert sorted(committed) == list(range(1, expected + 1))
+    numbers = [n for (n,) in db.query(Invoice.number).all()]
+    assert sorted(numbers) == list(range(1, expected + 1))
+
+
+def test_counter_is_seeded_from_existing_invoices(db):
+    for number in (1, 2, 7):
+        _add_invoice(db, number)
+    db.commit()
+
+    assert next_invoice_number(db) == 8
+    db.commit()
+    assert next_invoice_number(db) == 9
+    db.rollback()
+    assert next_invoice_number(db) == 9
+
+
+def test_first_use_of_a_counter_under_concurrency():
+    # All threads race to create the missing counter row
+    committed, errors = _allocate_concurrently(lambda session: allocate_number(session, "test_counter", 2026))
+
+    assert errors == []
+    assert sorted(committed) == list(range(1, THREADS * ALLOCATIONS_PER_THREAD * 4 // 5 + 1))
@@ -0,0 +1,113 @@
+# backend/tests/test_order_flow.py
+# Checkout end to end: reservation -> PayU notification (delivered twice) -> job worker -> invoice + WZ
+import hashlib
+import json
+
+from models.invoice import Invoice
+from models.job import Job, JOB_DONE
+from models.order import Order
+from models.payu_notification import PayUNotification, NOTIFICATION_DONE
+from models.product import Product
+from models.reservation import StockReservation, RESERVATION_CONVERTED
+from models.stock import StockMovement
+from models.WarehouseDoc import WarehouseDocument, WarehouseStatus
+from utils.payu_client import payu_client
+
+from conftest import add_company, add_product, add_user, auth_header, drain_jobs
+
+ADDRESS = {
+    "invoice_buyer_name": "Jan Kowalski",
+    "invoice_address_street": "ul. Długa 5",
+    "invoice_address_zip": "00-238",
+    "invoice_address_city": "Warszawa",
+}
+
+
+def _signed_notification(client, order_id: int, payu_order_id: str, status: str = "COMPLETED"):
+    body = json.dumps({"order": {"orderId": payu_order_id, "extOrderId": f"{order_id}_1760000000", "status": status}}).encode()
+    signature = hashlib.sha256(body + b"second-key").hexdigest()
+    return client.post(
+        "/payu/notify", content=body,
+        headers={"OpenPayU-Signature": f"sender=checkout;signature={signature};algorithm=SHA-256"},
+    )
+
+
+def test_paid_order_is_fulfilled_exactly_once(client, db, monkeypatch):
+    submitted = []
+
+    async def fake_submit_order(order_data):
+        submitted.append(order_data)
+        return {"redirectUri": "https://secure.payu.test/pay", "orderId": "PAYU-1"}
+
+    monkeypatch.setattr(payu_client, "submit_order", fake_submit_order)
+    add_company(db)
+    add_user(db, "klient@example.com", "customer")
+    product = add_product(db, stock=10, location="A-01-02")
+    product_id = product.id
+    headers = auth_header("klient@example.com")
+
+    assert client.post("/cart/add", json={"product_id": product_id, "qty": 3}, headers=headers).status_code == 200
+    response = client.post("/orders/initiate-payment", json=ADDRESS, headers=headers)
+    assert response.status_code == 200, response.text
+    order_id = response.json()["order_id"]
+    assert response.json()["redirect_url"] == "https://secure.payu.test/pay"
+    assert len(submitted) == 1 and submitted[0]["totalAmount"] == 36900
+
+    # Held, not yet deducted
+    db.expire_all()
+    assert db.get(Product, product_id).stock_quantity == 10
+    assert db.query(StockReservation).filter(StockReservation.order_id == order_id).count() == 1
+
+    # PayU delivers the same notification twice; both are acknowledged, one is recorded
+    for _ in range(2):
+        notify = _signed_notification(client, order_id, "PAYU-1")
+        assert notify.status_code == 200 and notify.json() == {"status": "ok"}
+    assert db.query(PayUNotification).count() == 1
+
+    # Nothing is fulfilled in the request itself
+    assert db.query(Invoice).count() == 0
+    assert drain_jobs() >= 1
+
+    db.expire_all()
+    order = db.get(Order, order_id)
+    assert order.status == "processing"
+    assert order.payment_status == "paid"
+
+    invoices = db.query(Invoice).all()
+    assert len(invoices) == 1
+    assert invoices[0].total_gross == 369
+
+    documents = db.query(WarehouseDocument).all()
+    assert len(documents) == 1
+    assert documents[0].invoice_id == invoices[0].id
+    assert documents[0].status == WarehouseStatus.NEW
+    assert [(it.product_id, it.quantity) for it in documents[0].items] == [(product_id, 3)]
+
+    assert db.get(Product, product_id).stock_quantity == 7
+    movements = db.query(StockMovement).filter(StockMovement.product_id == product_id).all()
+    assert [(m.qty, m.type) for m in movements] == [(-3, "OUT")]
+    reservation = db.query(StockReservation).filter(StockReservation.order_id == order_id).one()
+    assert reservation.status == RESERVATION_CONVERTED
+
+    assert db.query(PayUNotification).one().state == NOTIFICATION_DONE
+    assert {job.state for job in db.query(Job).all()} == {JOB_DONE}
+
+    # A late repeat after fulfilment changes nothing
+    assert _signed_notification(client, order_id, "PAYU-1").json() == {"status": "ok"}
+    drain_jobs()
+    db.expire_all()
+    assert db.query(Invoice).count() == 1
+    assert db.query(WarehouseDocument).count() == 1
+    assert db.get(Product, product_id).stock_quantity == 7
+
+    detail = client.get(f"/orders/{order_id}", headers=headers).json()
+    assert detail["status"] == "processing"
+    assert detail["invoice_id"] == invoices[0].id
+
+
+def test_bad_signature_is_rejected(client, db):
+    add_user(db, "klient@example.com", "customer")
+    body = json.dumps({"order": {"orderId": "PAYU-1", "extOrderId": "1_1", "status": "COMPLETED"}}).encode()
+    response = client.post("/payu/notify", content=body, headers={"OpenPayU-Signature": "signature=deadbeef"})
+    assert response.status_code == 403
+    assert db.query(PayUNotification).count() == 0
@@ -0,0 +1,83 @@
+# backend/tests/test_orders.py
+# GET /orders: newest first by created_at, keyset pages on (created_at, id), statement count independent of the page
+from datetime import datetime, timedelta
+
+from models.invoice import Invoice
+from models.order import Order, OrderItem
+from models.WarehouseDoc import WarehouseDocument, WarehouseStatus
+
+from conftest import add_product, add_user, auth_header, count_statements
+
+START = datetime(2026, 1, 5, 8, 0)
+
+
+def _order_history(db, customer, count) -> list:
+    # Ids do not follow created_at (imported orders), and every third order shares the previous timestamp
+    product = add_product(db, stock=1000)
+    created = [START + timedelta(hours=(n * 7) % count) for n in range(count)]
+    for n in range(1, count, 3):
+        created[n] = created[n - 1]
+    for n, created_at in enumerate(created):
+        order = Order(user_id=customer.id, status="processing", total_amount=24.6, payment_status="paid",
+                      created_at=created_at, items=[OrderItem(product_id=product.id, qty=1, unit_price=12.3) for _ in range(2)])
+        db.add(order)
+        db.flush()
+        if n % 2 == 0:
+            invoice = Invoice(number=n + 1, order_id=order.id, user_id=customer.id, buyer_name="Jan Kowalski",
+                              total_net=20.0, total_vat=4.6, total_gross=24.6)
+            db.add(invoice)
+            db.flush()
+            db.add(WarehouseDocument(invoice_id=invoice.id, buyer_name="Jan Kowalski", status=WarehouseStatus.NEW))
+    db.commit()
+    # Expected order: created_at desc, then id desc
+    return [o.id for o in db.query(Order).order_by(Order.created_at.desc(), Order.id.desc())]
+
+
+def _page(client, url, headers):
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), len(statements)
+
+
+def test_order_list_query_count_does_not_depend_on_page_size(client, db):
+    customer = add_user(db, "klient@example.com", "customer")
+    _order_history(db, customer, 60)
+    headers = auth_header("klient@example.com")
+
+    small, small_count = _page(client, "/orders?page_size=5", headers)
+    large, large_count = _page(client, "/orders?page_size=50", headers)
+
+    assert (len(small["items"]), len(large["items"])) == (5, 50)
+    # User lookup, COUNT, the joined page, the items and their products: no per-order loads
+    assert small_count == large_count <= 5, (small_count, large_count)
+    assert {item["wz_status"] for item in large["items"]} == {"NEW", None}
+    assert all(len(item["items"]) == 2 for item in large["items"])
+
+
+def test_order_cursor_pages_follow_created_at(client, db):
+    customer = add_user(db, "klient@example.com", "customer")
+    expected = _order_history(db, customer, 60)
+    assert expected != sorted(expected, reverse=True)  # created_at order differs from id order
+    other = add_user(db, "inny@example.com", "customer")
+    headers = auth_header("klient@example.com")
+
+    first, first_count = _page(client, "/orders?page_size=25", headers)
+    assert [item["id"] for item in first["items"]] == expected[:25]
+    # The offset pages keep the same order
+    assert [item["id"] for item in client.get("/orders?page=2&page_size=25", headers=headers).json()["items"]] == expected[25:50]
+
+    seen, page, counts = [], first, []
+    while True:
+        seen += [item["id"] for item in page["items"]]
+        if not page["next_cursor"]:
+            break
+        page, statements = _page(client, f"/orders?page_size=25&cursor={page['next_cursor']}", headers)
+        counts.append(statements)
+    assert seen == expected
+    # Every cursor page costs the same: the first page's statements plus the cursor lookup
+    assert counts and all(c == first_count + 1 for c in counts), (first_count, counts)
+
+    # A cursor must point at one of the caller's orders
+    assert client.get("/orders?cursor=abc", headers=headers).status_code == 400
+    assert client.get(f"/orders?cursor={expected[0]}", headers=auth_header(other.email)).status_code == 400
@@ -0,0 +1,183 @@
+# backend/tests/test_payu_client.py
+# PayUClient against stubbed PayU endpoints: token caching, single-flight refresh, 401 retry, pooling
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from utils.payu_client import PayUClient
+
+AUTH_PATH = "/pl/standard/user/oauth/authorize"
+ORDERS_PATH = "/api/v2_1/orders"
+ORDER = {"description": "Zamówienie", "currencyCode": "PLN", "totalAmount": "12300"}
+
+
+class StubPayU:
+    """MockTransport handler counting calls per endpoint; tokens are tok1, tok2, ..."""
+
+    def __init__(self, reject_orders: int = 0, auth_delay: float = 0.0):
+        self.auth_calls = 0
+        self.order_tokens = []
+        self.reject_orders = reject_orders
+        self.auth_delay = auth_delay
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == AUTH_PATH:
+            self.auth_calls += 1
+            token = f"tok{self.auth_calls}"
+            await asyncio.sleep(self.auth_delay)
+            return httpx.Response(200, json={"access_token": token, "token_type": "bearer", "expires_in": 43199})
+        if request.url.path == ORDERS_PATH:
+            self.order_tokens.append(request.headers["Authorization"].removeprefix("Bearer "))
+            if self.reject_orders:
+                self.reject_orders -= 1
+                return httpx.Response(401, json={"error": "invalid_token"})
+            return httpx.Response(302, headers={"Location": "https://secure.payu.test/pay"})
+        return httpx.Response(404)
+
+
+def _client(stub: StubPayU) -> PayUClient:
+    payu = PayUClient()
+    payu._client = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+    return payu
+
+
+def test_token_is_fetched_once_across_orders():
+    stub = StubPayU()
+
+    async def scenario():
+        payu = _client(stub)
+        results = [await payu.submit_order(ORDER) for _ in range(10)]
+        await payu.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(r["redirectUri"] == "https://secure.payu.test/pay" for r in results)
+    assert stub.auth_calls == 1
+    assert stub.order_tokens == ["tok1"] * 10
+
+
+def test_concurrent_callers_share_one_refresh():
+    stub = StubPayU(auth_delay=0.05)
+
+    async def scenario():
+        payu = _client(stub)
+        tokens = await asyncio.gather(*[payu.get_auth_token() for _ in range(20)])
+        await asyncio.gather(*[payu.submit_order(ORDER) for _ in range(20)])
+        await payu.aclose()
+        return tokens
+
+    tokens = asyncio.run(scenario())
+    assert stub.auth_calls == 1
+    assert set(tokens) == {"tok1"}
+    assert len(stub.order_tokens) == 20
+
+
+def test_rejected_token_triggers_exactly_one_reauth():
+    stub = StubPayU(reject_orders=1)
+
+    async def scenario():
+        payu = _client(stub)
+        result = await payu.submit_order(ORDER)
+        again = await payu.submit_order(ORDER)
+        await payu.aclose()
+        return result, again
+
+    result, again = asyncio.run(scenario())
+    assert result["status_code"] == 302 and again["status_code"] == 302
+    assert stub.auth_calls == 2
+    assert stub.order_tokens == ["tok1", "tok2", "tok2"]
+
+
+def test_second_rejection_is_not_retried_again():
+    stub = StubPayU(reject_orders=2)
+
+    async def scenario():
+        payu = _client(stub)
+        try:
+            await payu.submit_order(ORDER)
+        finally:
+            await payu.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert stub.auth_calls == 2
+    assert len(stub.order_tokens) == 2
+
+
+def test_aclose_closes_the_pooled_client():
+    stub = StubPayU()
+
+    async def scenario():
+        payu = _client(stub)
+        pooled = payu._client
+        await payu.submit_order(ORDER)
+        await payu.aclose()
+        return payu, pooled
+
+    payu, pooled = asyncio.run(scenario())
+    assert pooled.is_closed
+    assert payu._client is None
+    assert payu._token is None
+
+
+# =========================
+# ROUND TRIPS PER CHECKOUT (LOCAL HTTP SERVER)
+# =========================
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stats = None
+
+    def setup(self):
+        super().setup()
+        self.stats["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.stats["requests"] += 1
+        if self.path == AUTH_PATH:
+            body, code = json.dumps({"access_token": "tok", "expires_in": 43199}).encode(), 200
+        else:
+            body, code = json.dumps({"redirectUri": "https://secure.payu.test/pay", "orderId": "X"}).encode(), 200
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def payu_server():
+    stats = {"connections": 0, "requests": 0}
+    handler = type("Handler", (_CountingHandler,), {"stats": stats})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", stats
+    server.shutdown()
+    server.server_close()
+
+
+def test_checkouts_reuse_token_and_connection(payu_server):
+    url, stats = payu_server
+    checkouts = 10
+
+    async def scenario():
+        payu = PayUClient()
+        payu.api_url = url
+        for _ in range(checkouts):
+            await payu.submit_order(ORDER)
+        await payu.aclose()
+
+    asyncio.run(scenario())
+    # Before pooling: 2 requests and 2 TCP connections per checkout (token + order).
+    # Now: one token for the whole run and one kept-alive connection.
+    assert stats["requests"] == checkouts + 1
+    assert stats["connections"] == 1
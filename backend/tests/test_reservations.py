@@ -0,0 +1,124 @@
+# backend/tests/test_reservations.py
+# Checkout holds: reserve / convert / expire, and a payment that arrives after the hold lapsed
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from models.invoice import Invoice
+from models.log import Log
+from models.order import Order, OrderItem, ORDER_AWAITING_STOCK
+from models.payu_notification import PayUNotification, NOTIFICATION_DONE
+from models.product import Product
+from models.reservation import (
+    StockReservation, RESERVATION_ACTIVE, RESERVATION_CONVERTED, RESERVATION_EXPIRED, RESERVATION_RELEASED,
+)
+from utils.inventory import (
+    StockDelta, available_quantities, convert_reservations, expire_reservations, release_reservations, reserve_stock,
+)
+
+from conftest import add_company, add_product, add_user, drain_jobs
+
+TTL = timedelta(minutes=30)
+
+
+def _pending_order(db, customer, product, qty) -> Order:
+    order = Order(user_id=customer.id, status="pending_payment", total_amount=123.0, invoice_buyer_name="Jan Kowalski",
+                  items=[OrderItem(product_id=product.id, qty=qty, unit_price=100.0)])
+    db.add(order)
+    db.flush()
+    results = reserve_stock(db, [StockDelta(product.id, qty)], user_id=customer.id, order_id=order.id, ttl=TTL)
+    assert all(r.ok for r in results)
+    db.commit()
+    return order
+
+
+def _lapse_holds(db, order_id):
+    # The customer took longer than the TTL to pay, and the sweep has run
+    db.query(StockReservation).filter(StockReservation.order_id == order_id).update(
+        {StockReservation.expires_at: datetime.utcnow() - timedelta(minutes=1)})
+    assert expire_reservations(db) == 1
+    db.commit()
+
+
+def _pay(client, order_id):
+    body = json.dumps({"order": {"orderId": f"PAYU-{order_id}", "extOrderId": f"{order_id}_1760000000", "status": "COMPLETED"}}).encode()
+    signature = hashlib.sha256(body + b"second-key").hexdigest()
+    response = client.post("/payu/notify", content=body,
+                           headers={"OpenPayU-Signature": f"sender=checkout;signature={signature};algorithm=SHA-256"})
+    assert response.status_code == 200
+    drain_jobs()
+
+
+def _statuses(db, order_id) -> list:
+    return [r.status for r in db.query(StockReservation).filter(StockReservation.order_id == order_id)]
+
+
+def test_reserve_convert_release_and_expire(db):
+    customer = add_user(db, "klient@example.com", "customer")
+    product = add_product(db, stock=5)
+    product_id = product.id
+
+    first = _pending_order(db, customer, product, 3)
+    # Holds count against availability, so a second checkout cannot take the same units
+    assert available_quantities(db, [product_id]) == {product_id: 2}
+    rejected = reserve_stock(db, [StockDelta(product_id, 3)], user_id=customer.id, order_id=None, ttl=TTL)
+    assert [(r.ok, r.error) for r in rejected] == [(False, "Insufficient available stock")]
+    second = _pending_order(db, customer, product, 2)
+    assert available_quantities(db, [product_id]) == {product_id: 0}
+
+    assert convert_reservations(db, first.id) == 1
+    assert release_reservations(db, second.id) == 1
+    db.commit()
+    assert (_statuses(db, first.id), _statuses(db, second.id)) == ([RESERVATION_CONVERTED], [RESERVATION_RELEASED])
+    # Only active holds are touched
+    assert release_reservations(db, first.id) == 0
+
+    # Holds past their TTL stop counting at once and are swept later
+    third = _pending_order(db, customer, product, 4)
+    later = datetime.utcnow() + TTL + timedelta(seconds=1)
+    assert available_quantities(db, [product_id], now=later) == {product_id: 5}
+    assert expire_reservations(db, now=datetime.utcnow()) == 0
+    assert expire_reservations(db, now=later) == 1
+    db.commit()
+    assert _statuses(db, third.id) == [RESERVATION_EXPIRED]
+    assert db.get(Product, product_id).stock_quantity == 5
+
+
+def test_payment_after_lapsed_hold_reacquires_free_stock(client, db):
+    add_company(db)
+    customer = add_user(db, "klient@example.com", "customer")
+    product = add_product(db, stock=5)
+    product_id = product.id
+    order_id = _pending_order(db, customer, product, 3).id
+    _lapse_holds(db, order_id)
+
+    _pay(client, order_id)
+    db.expire_all()
+    assert db.get(Order, order_id).status == "processing"
+    assert db.get(Product, product_id).stock_quantity == 2
+    assert db.query(Invoice).filter(Invoice.order_id == order_id).count() == 1
+
+
+def test_payment_after_lapsed_hold_and_sold_stock_is_flagged(client, db):
+    add_company(db)
+    customer = add_user(db, "klient@example.com", "customer")
+    other = add_user(db, "inny@example.com", "customer")
+    product = add_product(db, stock=5)
+    product_id = product.id
+    order_id = _pending_order(db, customer, product, 3).id
+    _lapse_holds(db, order_id)
+    # Meanwhile another customer holds the units that were freed
+    other_order_id = _pending_order(db, other, product, 3).id
+
+    _pay(client, order_id)
+    db.expire_all()
+    order = db.get(Order, order_id)
+    # Flagged for manual handling at once, instead of failing the notification after every retry
+    assert (order.status, order.payment_status) == (ORDER_AWAITING_STOCK, "paid")
+    assert db.query(PayUNotification).one().state == NOTIFICATION_DONE
+    assert db.query(Log).filter(Log.action == "ORDER_AWAITING_STOCK").count() == 1
+    # Nothing was issued or deducted, and the other customer's hold is intact
+    assert db.query(Invoice).count() == 0
+    assert db.get(Product, product_id).stock_quantity == 5
+    assert _statuses(db, other_order_id) == [RESERVATION_ACTIVE]
+    assert available_quantities(db, [product_id]) == {product_id: 2}
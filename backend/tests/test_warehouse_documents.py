@@ -0,0 +1,238 @@
+# backend/tests/test_warehouse_documents.py
+# WZ documents with fractional line quantities (order quantities are floats: 2.5 m, 0.5 t, ...)
+import importlib.util
+import os
+
+from sqlalchemy import event, update
+
+from config import settings
+from database import engine
+from models.invoice import Invoice
+from models.log import Log
+from models.order import Order
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentItem, WarehouseStatus
+
+from utils.pdf import get_wz_pdf_path
+from utils.pdf_storage import WZ_DIR, compact
+
+from conftest import BACKEND_DIR, add_product, add_user, auth_header, count_statements
+
+
+def _document(db, lines, status=WarehouseStatus.NEW) -> WarehouseDocument:
+    doc = WarehouseDocument(buyer_name="Budimex S.A.", status=status, items=[
+        WarehouseDocumentItem(product_id=p.id, product_name=p.name, product_code=p.code, quantity=q, location=p.location)
+        for p, q in lines
+    ])
+    db.add(doc)
+    db.commit()
+    return doc
+
+
+def _ordered_document(db, customer, status=WarehouseStatus.NEW, order_status="processing") -> int:
+    # Paid order -> invoice -> WZ, as written by order fulfilment
+    order = Order(user_id=customer.id, status=order_status, total_amount=123.0, payment_status="paid")
+    db.add(order)
+    db.flush()
+    invoice = Invoice(number=order.id, order_id=order.id, user_id=customer.id, buyer_name="Jan Kowalski",
+                      total_net=100.0, total_vat=23.0, total_gross=123.0)
+    db.add(invoice)
+    db.flush()
+    doc = WarehouseDocument(invoice_id=invoice.id, buyer_name="Jan Kowalski", status=status)
+    db.add(doc)
+    db.commit()
+    return doc.id
+
+
+def _order_statuses(db, doc_ids) -> list:
+    db.expire_all()
+    return [
+        db.query(Order.status).join(Invoice, Invoice.order_id == Order.id)
+        .join(WarehouseDocument, WarehouseDocument.invoice_id == Invoice.id)
+        .filter(WarehouseDocument.id == doc_id).scalar()
+        for doc_id in doc_ids
+    ]
+
+
+def test_pending_quantities_keep_fractions(client, db):
+    add_user(db, "magazyn@example.com", "warehouse")
+    sand, cement = add_product(db, location="Plac B1"), add_product(db, location="A-01-02")
+    sand_id = sand.id
+    _document(db, [(sand, 2.5), (cement, 3)])
+    _document(db, [(sand, 0.5)], status=WarehouseStatus.IN_PROGRESS)
+    _document(db, [(sand, 7)], status=WarehouseStatus.RELEASED)
+    headers = auth_header("magazyn@example.com")
+
+    response = client.get("/warehouse-documents/pending", headers=headers)
+    assert response.status_code == 200, response.text
+    assert {row["product_id"]: (row["pending_quantity"], row["documents"]) for row in response.json()} == {
+        sand_id: (3.0, 2), cement.id: (3.0, 1),
+    }
+
+    response = client.get(f"/warehouse-documents/pending/{sand_id}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["pending_quantity"] == 3.0
+    assert [d["quantity"] for d in response.json()["documents"]] == [2.5, 0.5]
+
+
+def test_backfill_keeps_fractional_quantities():
+    path = next((BACKEND_DIR / "alembic" / "versions").glob("3e9a7c5b1d28_*.py"))
+    spec = importlib.util.spec_from_file_location("migration_3e9a7c5b1d28", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    lines = migration._parse_lines('[{"product_name": "Piasek", "qty": 0.5}, {"quantity": "2.5"}, {"quantity": "x"}]')
+    assert [line["quantity"] for line in lines] == [0.5, 2.5, 0.0]
+
+
+def test_wave_with_fractional_lines(client, db):
+    add_user(db, "magazyn@example.com", "warehouse")
+    sand, cement = add_product(db, location="Plac B1"), add_product(db, location="A-01-02")
+    first, second = _document(db, [(sand, 2.5), (cement, 3)]), _document(db, [(sand, 0.5)])
+    ids = [first.id, second.id]
+    headers = auth_header("magazyn@example.com")
+
+    response = client.post("/warehouse-documents/wave", json={"document_ids": ids}, headers=headers)
+    assert response.status_code == 200, response.text
+    wave = response.json()
+    assert wave["total_quantity"] == 6.0
+    assert [(line["product_id"], line["quantity"]) for line in wave["lines"]] == [(cement.id, 3.0), (sand.id, 3.0)]
+    assert wave["lines"][1]["allocations"] == [{"document_id": ids[0], "quantity": 2.5}, {"document_id": ids[1], "quantity": 0.5}]
+
+    pdf = client.post("/warehouse-documents/wave/pdf", json={"document_ids": ids}, headers=headers)
+    assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+
+
+def test_wave_start_counts_only_documents_it_moved(client, db, monkeypatch):
+    from routes import warehouse as warehouse_routes
+    from utils import wz_feed
+
+    add_user(db, "magazyn@example.com", "warehouse")
+    product = add_product(db)
+    ids = [_document(db, [(product, 1)]).id for _ in range(3)]
+    headers = auth_header("magazyn@example.com")
+    assert wz_feed.resync() == 3
+
+    response = client.post("/warehouse-documents/wave", json={"document_ids": ids[:2], "mark_in_progress": True}, headers=headers)
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    assert [db.get(WarehouseDocument, i).status for i in ids] == [WarehouseStatus.IN_PROGRESS] * 2 + [WarehouseStatus.NEW]
+
+    # Another terminal cancels a document between loading the wave and starting it
+    build_wave = warehouse_routes.build_wave
+
+    def cancel_meanwhile(session, documents):
+        other = wz_feed.SessionLocal()
+        try:
+            other.get(WarehouseDocument, ids[2]).status = WarehouseStatus.CANCELLED
+            wz_feed.record_status_change(other, {WarehouseStatus.NEW: [ids[2]]}, WarehouseStatus.CANCELLED)
+            other.commit()
+        finally:
+            other.close()
+        return build_wave(session, documents)
+
+    monkeypatch.setattr(warehouse_routes, "build_wave", cancel_meanwhile)
+    response = client.post("/warehouse-documents/wave", json={"document_ids": [ids[2]], "mark_in_progress": True}, headers=headers)
+    assert response.status_code == 409
+    db.expire_all()
+    assert db.get(WarehouseDocument, ids[2]).status == WarehouseStatus.CANCELLED
+    # Two started, one cancelled: the in-memory count matches the database
+    assert wz_feed.active_count() == wz_feed.resync() == 2
+
+
+def test_wz_pdf_cache_follows_the_content_version(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "PDF_MEMORY_MAX_BYTES", 0)  # every render is "large" and gets cached
+    add_user(db, "magazyn@example.com", "warehouse")
+    doc = _document(db, [(add_product(db, location="A-01-02"), 3)])
+    doc_id = doc.id
+    headers = auth_header("magazyn@example.com")
+    # A legacy unversioned file is never served
+    WZ_DIR.mkdir(parents=True, exist_ok=True)
+    get_wz_pdf_path(doc_id).write_bytes(b"%PDF-stale")
+
+    first = client.get(f"/warehouse-documents/{doc_id}/download", headers=headers)
+    assert first.status_code == 200 and first.content != b"%PDF-stale"
+    version = first.headers["ETag"].strip('"')
+    assert sorted(p.name for p in WZ_DIR.glob("*.pdf")) == [f"WZ-{doc_id}-{version}.pdf"]
+    assert client.get(f"/warehouse-documents/{doc_id}/download", headers=headers).content == first.content
+
+    # A changed line is a new version: re-rendered, the old file dropped
+    doc.items[0].quantity = 2.5
+    db.commit()
+    second = client.get(f"/warehouse-documents/{doc_id}/download", headers=headers)
+    new_version = second.headers["ETag"].strip('"')
+    assert new_version != version and second.content != first.content
+    assert sorted(p.name for p in WZ_DIR.glob("*.pdf")) == [f"WZ-{doc_id}-{new_version}.pdf"]
+
+    # Compaction keeps one version per document and drops files of deleted documents
+    old = get_wz_pdf_path(doc_id, "0a1d")
+    old.write_bytes(b"%PDF-old")
+    os.utime(old, (1_000_000_000, 1_000_000_000))  # last accessed long ago
+    get_wz_pdf_path(doc_id + 1, "abc").write_bytes(b"%PDF-gone")
+    assert compact(invoice_ids=set(), wz_ids={doc_id})["removed_files"] == 2
+    assert [p.name for p in WZ_DIR.glob("*.pdf")] == [f"WZ-{doc_id}-{new_version}.pdf"]
+
+
+def test_bulk_release_updates_documents_and_orders_at_once(client, db):
+    add_user(db, "magazyn@example.com", "warehouse")
+    customer = add_user(db, "klient@example.com", "customer")
+    ids = [
+        _ordered_document(db, customer),
+        _ordered_document(db, customer, status=WarehouseStatus.IN_PROGRESS),
+        _ordered_document(db, customer, status=WarehouseStatus.IN_PROGRESS, order_status="shipped"),
+        _ordered_document(db, customer, status=WarehouseStatus.RELEASED, order_status="shipped"),
+    ]
+    headers = auth_header("magazyn@example.com")
+
+    with count_statements() as statements:
+        response = client.patch("/warehouse-documents/status", json={"document_ids": ids, "status": "RELEASED"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"status": "RELEASED", "updated": ids[:3], "unchanged": ids[3:], "orders_updated": 2}
+
+    # One guarded UPDATE per source status (NEW, IN_PROGRESS) and one set-based UPDATE of the orders
+    updates = [s for s in statements if s.startswith("UPDATE")]
+    assert sum(s.startswith("UPDATE warehouse_documents") for s in updates) == 2
+    assert sum(s.startswith("UPDATE orders") for s in updates) == 1
+    db.expire_all()
+    assert {db.get(WarehouseDocument, i).status for i in ids} == {WarehouseStatus.RELEASED}
+    assert _order_statuses(db, ids) == ["shipped"] * 4
+    logs = db.query(Log).filter(Log.action == "WZ_STATUS_BULK").all()
+    assert len(logs) == 1 and logs[0].meta["updated"] == ids[:3]
+
+
+def test_bulk_change_is_all_or_nothing(client, db):
+    add_user(db, "magazyn@example.com", "warehouse")
+    customer = add_user(db, "klient@example.com", "customer")
+    new_id = _ordered_document(db, customer)
+    started_id = _ordered_document(db, customer, status=WarehouseStatus.IN_PROGRESS)
+    released_id = _ordered_document(db, customer, status=WarehouseStatus.RELEASED, order_status="shipped")
+    headers = auth_header("magazyn@example.com")
+
+    # A disallowed transition for one document rejects the request before anything is written
+    response = client.patch("/warehouse-documents/status", json={"document_ids": [new_id, released_id], "status": "NEW"}, headers=headers)
+    assert response.status_code == 400
+
+    # Another terminal cancels one document after the request has read the statuses: the guard of its
+    # UPDATE matches fewer rows, and the whole change is rolled back, including the other group
+    interfered = []
+
+    def cancel_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        if interfered or not statement.startswith("UPDATE warehouse_documents"):
+            return
+        victim = started_id if new_id in parameters else new_id
+        interfered.append(victim)
+        with engine.begin() as other:
+            other.execute(update(WarehouseDocument).where(WarehouseDocument.id == victim).values(status=WarehouseStatus.CANCELLED))
+
+    event.listen(engine, "before_cursor_execute", cancel_meanwhile)
+    try:
+        response = client.patch("/warehouse-documents/status", json={"document_ids": [new_id, started_id], "status": "RELEASED"}, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", cancel_meanwhile)
+    assert response.status_code == 409
+
+    db.expire_all()
+    statuses = {new_id: WarehouseStatus.NEW, started_id: WarehouseStatus.IN_PROGRESS}
+    statuses[interfered[0]] = WarehouseStatus.CANCELLED
+    assert {i: db.get(WarehouseDocument, i).status for i in statuses} == statuses
+    assert _order_statuses(db, [new_id, started_id]) == ["processing", "processing"]
+    assert db.query(Log).filter(Log.action == "WZ_STATUS_BULK").count() == 0
@@ -0,0 +1,148 @@
+# backend/tests/test_wz_feed.py
+# Live WZ feed: changes go through the outbox, other processes' events reach the subscribers once, recounts lose nothing
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, update
+
+from config import settings
+from database import engine
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentEvent, WarehouseStatus
+from utils import wz_feed
+
+from conftest import add_user, auth_header, count_statements
+
+
+@pytest.fixture(autouse=True)
+def fresh_feed(monkeypatch):
+    for name, value in (("_active", None), ("_counted_through", None), ("_cursor", None), ("_counted_at", None),
+                        ("_generation", 0), ("_next_pump", 0.0), ("_subscribers", set())):
+        monkeypatch.setattr(wz_feed, name, value)
+    monkeypatch.setattr(settings, "JOBS_POLL_SECONDS", 0)
+
+
+def _create(db, buyer_name: str, origin: str = None) -> int:
+    with pytest.MonkeyPatch.context() as patch:
+        if origin:
+            # Committed "by another process": same outbox, another origin, and its own terminals are not ours
+            patch.setattr(wz_feed, "ORIGIN", origin)
+            patch.setattr(wz_feed, "_publish", lambda *args: None)
+        doc = WarehouseDocument(buyer_name=buyer_name)
+        db.add(doc)
+        db.commit()
+        return doc.id
+
+
+def _collect(action) -> list:
+    """Runs action in a worker thread with one subscriber attached; returns the messages it received."""
+    async def scenario():
+        queue = asyncio.Queue()
+        wz_feed._subscribers.add((asyncio.get_running_loop(), queue))
+        await asyncio.to_thread(action)
+        await asyncio.sleep(0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+    return asyncio.run(scenario())
+
+
+def test_changes_are_written_to_the_outbox_in_their_transaction(db):
+    doc_id = _create(db, "Z API")
+    db.add(WarehouseDocument(buyer_name="Wycofany"))
+    db.flush()
+    db.rollback()
+
+    doc = db.get(WarehouseDocument, doc_id)
+    doc.status = WarehouseStatus.RELEASED
+    wz_feed.record_status_change(db, {WarehouseStatus.NEW: [doc_id]}, WarehouseStatus.RELEASED)
+    db.commit()
+
+    events = db.query(WarehouseDocumentEvent).order_by(WarehouseDocumentEvent.id).all()
+    assert [(e.payload["type"], e.delta, e.origin) for e in events] == [("created", 1, wz_feed.ORIGIN), ("status", -1, wz_feed.ORIGIN)]
+    assert events[0].payload["buyer_name"] == "Z API"
+
+
+def test_events_of_other_processes_are_pumped_once(db):
+    _create(db, "Istniejący")
+    assert wz_feed.active_count() == 1
+
+    def create_both():
+        remote = _create(db, "Z workera", origin="worker-1")
+        _create(db, "Z API")
+        assert wz_feed.pump() == 1
+        assert wz_feed.pump() == 0
+        return remote
+
+    messages = _collect(create_both)
+    # The local document is pushed on commit, the remote one by the next pump; each exactly once
+    assert [(m["type"], m["buyer_name"], m["active"]) for m in messages] == [
+        ("created", "Z API", 2), ("created", "Z workera", 3),
+    ]
+    assert wz_feed.active_count() == wz_feed.resync() == 3
+
+
+def test_pump_reads_nothing_without_terminals(db):
+    _create(db, "Z workera", origin="worker-1")
+    with count_statements() as statements:
+        assert wz_feed.pump() == 0
+    assert statements == []
+
+
+def test_recount_overlapping_an_event_is_not_kept(db):
+    _create(db, "Istniejący")
+    wz_feed.resync()
+    interfered = []
+
+    # Another process releases the document and creates a new one while the COUNT runs
+    def change_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        if interfered or "count(*)" not in statement:
+            return
+        interfered.append(1)
+        with engine.begin() as other:
+            other.execute(update(WarehouseDocument).values(status=WarehouseStatus.RELEASED))
+        _create(db, "Z workera", origin="worker-1")
+
+    event.listen(engine, "before_cursor_execute", change_meanwhile)
+    try:
+        assert wz_feed.resync() == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", change_meanwhile)
+
+    # The overlapping count was discarded and retried; the pump does not apply the event again
+    assert interfered
+    messages = _collect(wz_feed.pump)
+    assert messages == []
+    assert wz_feed.active_count() == 1
+
+
+def test_old_events_are_purged(db):
+    _create(db, "Stary")
+    _create(db, "Nowy")
+    db.query(WarehouseDocumentEvent).filter(WarehouseDocumentEvent.payload["buyer_name"].as_string() == "Stary").update(
+        {WarehouseDocumentEvent.created_at: datetime.utcnow() - timedelta(seconds=settings.WZ_FEED_EVENT_RETENTION_SECONDS + 1)},
+        synchronize_session=False,
+    )
+    assert wz_feed.purge_events(db) == 1
+    db.commit()
+    assert [e.payload["buyer_name"] for e in db.query(WarehouseDocumentEvent)] == ["Nowy"]
+
+
+def test_feed_takes_a_short_lived_query_token(client, db):
+    from routes.warehouse import wz_event_feed
+
+    add_user(db, "magazyn@example.com", "warehouse")
+    add_user(db, "klient@example.com", "customer")
+    assert client.post("/warehouse-documents/feed-token", headers=auth_header("klient@example.com")).status_code == 403
+    response = client.post("/warehouse-documents/feed-token", headers=auth_header("magazyn@example.com"))
+    assert response.status_code == 200
+    token = response.json()["token"]
+    assert response.json()["expires_in"] == settings.WZ_FEED_TOKEN_SECONDS
+
+    # EventSource sends no headers: the feed is authorized by the query token alone (the stream itself is not read here)
+    stream = asyncio.run(wz_event_feed(request=None, token=token))
+    assert stream.media_type == "text/event-stream"
+    # No token, or a regular access token in the URL, is refused
+    assert client.get("/warehouse-documents/feed").status_code == 401
+    access_token = auth_header("magazyn@example.com")["Authorization"].split()[1]
+    assert client.get(f"/warehouse-documents/feed?token={access_token}").status_code == 401
+    # The feed token is good for the feed only
+    assert client.get("/warehouse-documents/active-count", headers={"Authorization": f"Bearer {token}"}).status_code == 401
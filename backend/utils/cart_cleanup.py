@@ -0,0 +1,83 @@
+# backend/utils/cart_cleanup.py
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.cart import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+# Cart statuses
+CART_OPEN = "open"
+CART_ORDERED = "ordered"
+CART_EXPIRED = "expired"
+# Carts that are no longer open: ordered ones are already copied into order_items,
+# expired ones were abandoned, pending_payment is a legacy status of older databases.
+# Listed explicitly (not != open) so the cleanup is a range scan of ix_carts_status_updated_at.
+RETIRED_STATUSES = (CART_ORDERED, CART_EXPIRED, "pending_payment")
+
+
+def _expire_idle_batch(db: Session, cutoff: datetime, limit: int) -> int:
+    # Filtered on updated_at itself (backfilled by the migration, set on every cart change) to use the index
+    ids = [cid for (cid,) in db.query(Cart.id).filter(
+        Cart.status == CART_OPEN, Cart.updated_at < cutoff
+    ).limit(limit).all()]
+    if not ids:
+        return 0
+    db.query(Cart).filter(Cart.id.in_(ids), Cart.status == CART_OPEN).update(
+        {Cart.status: CART_EXPIRED, Cart.updated_at: datetime.utcnow()}, synchronize_session=False
+    )
+    return len(ids)
+
+
+def _delete_retired_batch(db: Session, cutoff: datetime, limit: int) -> Dict[str, int]:
+    ids = [cid for (cid,) in db.query(Cart.id).filter(
+        Cart.status.in_(RETIRED_STATUSES), Cart.updated_at < cutoff
+    ).limit(limit).all()]
+    if not ids:
+        return {"carts": 0, "items": 0}
+    items = db.query(CartItem).filter(CartItem.cart_id.in_(ids)).delete(synchronize_session=False)
+    carts = db.query(Cart).filter(Cart.id.in_(ids)).delete(synchronize_session=False)
+    return {"carts": carts, "items": items}
+
+
+def cleanup_carts(db: Session, now: Optional[datetime] = None) -> Dict[str, float]:
+    """
+    Expires open carts idle for CART_IDLE_EXPIRY_DAYS and deletes closed
+    (ordered, expired) carts older than CART_RETENTION_DAYS. Works in batches of
+    CART_CLEANUP_BATCH_SIZE, committing after each, and stops after
+    CART_CLEANUP_MAX_BATCHES so one run never holds the database for long.
+    Returns row counts for monitoring.
+    """
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+    batch_size = settings.CART_CLEANUP_BATCH_SIZE
+    budget = settings.CART_CLEANUP_MAX_BATCHES
+    stats = {"expired_carts": 0, "deleted_carts": 0, "deleted_items": 0, "batches": 0}
+
+    idle_cutoff = now - timedelta(days=settings.CART_IDLE_EXPIRY_DAYS)
+    while stats["batches"] < budget:
+        expired = _expire_idle_batch(db, idle_cutoff, batch_size)
+        if not expired:
+            break
+        db.commit()
+        stats["expired_carts"] += expired
+        stats["batches"] += 1
+
+    retention_cutoff = now - timedelta(days=settings.CART_RETENTION_DAYS)
+    while stats["batches"] < budget:
+        deleted = _delete_retired_batch(db, retention_cutoff, batch_size)
+        if not deleted["carts"]:
+            break
+        db.commit()
+        stats["deleted_carts"] += deleted["carts"]
+        stats["deleted_items"] += deleted["items"]
+        stats["batches"] += 1
+
+    stats["duration_seconds"] = round(time.monotonic() - started, 3)
+    stats["backlog"] = stats["batches"] >= budget  # more rows left for the next run
+    return stats
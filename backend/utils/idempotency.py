@@ -0,0 +1,174 @@
+# backend/utils/idempotency.py
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import SessionLocal
+from models.idempotency import IdempotencyKey, IDEMPOTENCY_IN_PROGRESS, IDEMPOTENCY_COMPLETED
+
+# How often a duplicate request re-checks the in-flight original
+POLL_INTERVAL_SECONDS = 0.2
+
+
+# Response recorded for a completed request, replayed to retries
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: Any
+
+
+def request_hash(payload: Any) -> str:
+    """Stable fingerprint of a request body, used to reject key reuse with a different payload."""
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _key_filter(query, key: str, user_id: int, endpoint: str):
+    return query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.key == key,
+    )
+
+
+def acquire(key: str, user_id: int, endpoint: str, req_hash: str) -> Optional[StoredResponse]:
+    """
+    Claims the key for this request. Returns None when the caller should execute
+    the request, or the stored response when it already completed. A duplicate
+    of a request still in flight blocks until the original finishes (or
+    IDEMPOTENCY_WAIT_SECONDS pass). Records are committed in their own session
+    so concurrent requests see them immediately.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+
+            # Expired records (old results, or in-flight requests whose worker died) are taken over
+            _key_filter(db.query(IdempotencyKey), key, user_id, endpoint).filter(
+                IdempotencyKey.expires_at <= now
+            ).delete(synchronize_session=False)
+            db.commit()
+
+            db.add(IdempotencyKey(
+                key=key, user_id=user_id, endpoint=endpoint, request_hash=req_hash,
+                state=IDEMPOTENCY_IN_PROGRESS,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            record = _key_filter(db.query(IdempotencyKey), key, user_id, endpoint).first()
+            if record is not None:
+                if record.request_hash != req_hash:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+                if record.state == IDEMPOTENCY_COMPLETED:
+                    return StoredResponse(status_code=record.status_code, body=json.loads(record.response_body))
+        finally:
+            db.close()
+
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def complete(key: str, user_id: int, endpoint: str, status_code: int, body: Any) -> None:
+    """Stores the response of a finished request for replay until the TTL passes."""
+    db = SessionLocal()
+    try:
+        _key_filter(db.query(IdempotencyKey), key, user_id, endpoint).update({
+            IdempotencyKey.state: IDEMPOTENCY_COMPLETED,
+            IdempotencyKey.status_code: status_code,
+            IdempotencyKey.response_body: json.dumps(jsonable_encoder(body)),
+            IdempotencyKey.expires_at: datetime.utcnow() + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def release(key: str, user_id: int, endpoint: str) -> None:
+    """Drops the claim of a failed request so a retry executes it again."""
+    db = SessionLocal()
+    try:
+        _key_filter(db.query(IdempotencyKey), key, user_id, endpoint).filter(
+            IdempotencyKey.state == IDEMPOTENCY_IN_PROGRESS
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired() -> int:
+    """Deletes records past their TTL; returns the number of rows removed."""
+    db = SessionLocal()
+    try:
+        removed = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+
+# =========================
+# ROUTE HELPERS
+# =========================
+
+def _replay(stored: StoredResponse) -> JSONResponse:
+    return JSONResponse(status_code=stored.status_code, content=stored.body, headers={"Idempotent-Replayed": "true"})
+
+
+def _check_key(key: str) -> None:
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long (max 255 characters)")
+
+
+def run_idempotent(key: Optional[str], user_id: int, endpoint: str, payload: Any, handler: Callable[[], Any]):
+    """Executes a sync route handler at most once per Idempotency-Key (no key: runs as usual)."""
+    if not key:
+        return handler()
+    _check_key(key)
+    stored = acquire(key, user_id, endpoint, request_hash(payload))
+    if stored is not None:
+        return _replay(stored)
+    try:
+        result = handler()
+    except BaseException:
+        release(key, user_id, endpoint)
+        raise
+    complete(key, user_id, endpoint, 200, result)
+    return result
+
+
+async def run_idempotent_async(key: Optional[str], user_id: int, endpoint: str, payload: Any,
+                               handler: Callable[[], Awaitable[Any]]):
+    """Async variant of run_idempotent; blocking database waits run in the threadpool."""
+    if not key:
+        return await handler()
+    _check_key(key)
+    stored = await run_in_threadpool(acquire, key, user_id, endpoint, request_hash(payload))
+    if stored is not None:
+        return _replay(stored)
+    try:
+        result = await handler()
+    except BaseException:
+        await run_in_threadpool(release, key, user_id, endpoint)
+        raise
+    await run_in_threadpool(complete, key, user_id, endpoint, 200, result)
+    return result
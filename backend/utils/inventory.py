@@ -0,0 +1,242 @@
+# backend/utils/inventory.py
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, update, insert, select, func, literal, DateTime, String, Integer
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from models.stock import StockMovement
+from models.reservation import (
+    StockReservation, RESERVATION_ACTIVE, RESERVATION_CONVERTED,
+    RESERVATION_EXPIRED, RESERVATION_RELEASED,
+)
+
+
+# A signed stock change for one product (negative = release from stock)
+@dataclass
+class StockDelta:
+    product_id: int
+    qty: float
+
+
+# Outcome of applying one (merged) delta
+@dataclass
+class StockLineResult:
+    product_id: int
+    qty: float
+    ok: bool
+    error: Optional[str] = None
+    movement_id: Optional[int] = None
+
+
+def _merge_deltas(deltas: Iterable[StockDelta]) -> Dict[int, float]:
+    # Sum duplicate product lines, keeping first-seen order
+    merged: Dict[int, float] = {}
+    for d in deltas:
+        merged[d.product_id] = merged.get(d.product_id, 0) + d.qty
+    return merged
+
+
+def _normalize_qty(qty: float):
+    return int(qty) if float(qty).is_integer() else qty
+
+
+def _held_quantity(product_id_col, now: datetime):
+    # Correlated sum of active, unexpired holds for a product
+    return select(func.coalesce(func.sum(StockReservation.qty), 0)).where(
+        StockReservation.product_id == product_id_col,
+        StockReservation.status == RESERVATION_ACTIVE,
+        StockReservation.expires_at > now,
+    ).scalar_subquery()
+
+
+def apply_stock_deltas(
+    db: Session,
+    deltas: Iterable[StockDelta],
+    *,
+    user_id: int,
+    movement_type: str,
+    reason: Optional[str] = None,
+    supplier: Optional[str] = None,
+    respect_reservations: bool = False,
+) -> List[StockLineResult]:
+    """
+    Applies a batch of stock changes as one conditional, set-based UPDATE:
+    a line is applied only if it leaves stock_quantity >= 0, so concurrent
+    writers can never oversell or lose updates. A StockMovement is added for
+    every applied line (one multi-row INSERT). Nothing is committed; on any failed line the caller
+    decides whether to roll back the whole transaction.
+
+    With respect_reservations=True, stock held by active checkout
+    reservations is treated as unavailable.
+    """
+    merged = _merge_deltas(deltas)
+    if not merged:
+        return []
+
+    ids = list(merged.keys())
+    delta_expr = case({pid: _normalize_qty(qty) for pid, qty in merged.items()}, value=Product.id)
+
+    remaining = Product.stock_quantity + delta_expr
+    if respect_reservations:
+        remaining = remaining - _held_quantity(Product.id, datetime.utcnow())
+
+    stmt = (
+        update(Product)
+        .where(Product.id.in_(ids), remaining >= 0)
+        .values(stock_quantity=Product.stock_quantity + delta_expr)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    applied = set(db.execute(stmt).scalars().all())
+
+    # Product rows already loaded in this session now hold stale quantities
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Product) and obj.id in merged:
+            db.expire(obj, ["stock_quantity"])
+
+    # Resolve failure reasons only when something was rejected
+    existing: Dict[int, int] = {}
+    if len(applied) < len(ids):
+        missing_ids = [pid for pid in ids if pid not in applied]
+        existing = dict(
+            db.query(Product.id, Product.stock_quantity).filter(Product.id.in_(missing_ids)).all()
+        )
+
+    # Movements of all applied lines in one statement; product ids are unique after merging,
+    # so RETURNING maps the new ids back without relying on row order
+    movement_ids: Dict[int, int] = {}
+    movement_rows = [
+        dict(product_id=pid, user_id=user_id, qty=_normalize_qty(qty), type=movement_type, reason=reason, supplier=supplier)
+        for pid, qty in merged.items() if pid in applied
+    ]
+    if movement_rows:
+        stmt = insert(StockMovement).returning(StockMovement.id, StockMovement.product_id)
+        movement_ids = {pid: mid for mid, pid in db.execute(stmt, movement_rows)}
+
+    results: List[StockLineResult] = []
+    for pid, qty in merged.items():
+        qty = _normalize_qty(qty)
+        if pid in applied:
+            results.append(StockLineResult(product_id=pid, qty=qty, ok=True, movement_id=movement_ids.get(pid)))
+        elif pid in existing:
+            results.append(StockLineResult(
+                product_id=pid, qty=qty, ok=False,
+                error=f"Insufficient stock (available: {existing[pid]})",
+            ))
+        else:
+            results.append(StockLineResult(product_id=pid, qty=qty, ok=False, error="Product not found"))
+    return results
+
+
+def failed_lines(results: List[StockLineResult]) -> List[StockLineResult]:
+    return [r for r in results if not r.ok]
+
+
+# =========================
+# CHECKOUT RESERVATIONS
+# =========================
+
+def available_quantities(db: Session, product_ids: Iterable[int], now: Optional[datetime] = None) -> Dict[int, float]:
+    """Returns on-hand minus active holds for the given products (one grouped query)."""
+    ids = list(set(product_ids))
+    if not ids:
+        return {}
+    now = now or datetime.utcnow()
+
+    held = (
+        select(StockReservation.product_id, func.sum(StockReservation.qty).label("held"))
+        .where(
+            StockReservation.product_id.in_(ids),
+            StockReservation.status == RESERVATION_ACTIVE,
+            StockReservation.expires_at > now,
+        )
+        .group_by(StockReservation.product_id)
+        .subquery()
+    )
+    rows = (
+        db.query(Product.id, Product.stock_quantity - func.coalesce(held.c.held, 0))
+        .outerjoin(held, held.c.product_id == Product.id)
+        .filter(Product.id.in_(ids))
+        .all()
+    )
+    return {pid: max(_normalize_qty(avail or 0), 0) for pid, avail in rows}
+
+
+def reserve_stock(
+    db: Session,
+    lines: Iterable[StockDelta],
+    *,
+    user_id: int,
+    order_id: Optional[int],
+    ttl: timedelta,
+) -> List[StockLineResult]:
+    """
+    Creates TTL holds with one conditional INSERT ... SELECT: a line is only
+    inserted if on-hand minus active holds still covers it. Not committed.
+    """
+    merged = _merge_deltas(lines)
+    if not merged:
+        return []
+
+    now = datetime.utcnow()
+    ids = list(merged.keys())
+    qty_expr = case({pid: _normalize_qty(qty) for pid, qty in merged.items()}, value=Product.id)
+
+    source = select(
+        Product.id,
+        literal(order_id, Integer),
+        literal(user_id, Integer),
+        qty_expr,
+        literal(RESERVATION_ACTIVE, String),
+        literal(now + ttl, DateTime),
+    ).where(
+        Product.id.in_(ids),
+        Product.stock_quantity - _held_quantity(Product.id, now) >= qty_expr,
+    )
+    table = StockReservation.__table__
+    stmt = (
+        insert(table)
+        .from_select(["product_id", "order_id", "user_id", "qty", "status", "expires_at"], source)
+        .returning(table.c.product_id)
+    )
+    reserved = set(db.execute(stmt).scalars().all())
+
+    results = []
+    for pid, qty in merged.items():
+        qty = _normalize_qty(qty)
+        if pid in reserved:
+            results.append(StockLineResult(product_id=pid, qty=qty, ok=True))
+        else:
+            results.append(StockLineResult(product_id=pid, qty=qty, ok=False, error="Insufficient available stock"))
+    return results
+
+
+def _set_order_reservations_status(db: Session, order_id: int, status: str) -> int:
+    return (
+        db.query(StockReservation)
+        .filter(StockReservation.order_id == order_id, StockReservation.status == RESERVATION_ACTIVE)
+        .update({StockReservation.status: status}, synchronize_session=False)
+    )
+
+
+def convert_reservations(db: Session, order_id: int) -> int:
+    """Marks an order's holds as consumed once its stock has been deducted."""
+    return _set_order_reservations_status(db, order_id, RESERVATION_CONVERTED)
+
+
+def release_reservations(db: Session, order_id: int) -> int:
+    """Frees an order's holds (payment failed or order cancelled)."""
+    return _set_order_reservations_status(db, order_id, RESERVATION_RELEASED)
+
+
+def expire_reservations(db: Session, now: Optional[datetime] = None) -> int:
+    """Bulk-expires holds past their TTL; returns the number of rows swept."""
+    now = now or datetime.utcnow()
+    return (
+        db.query(StockReservation)
+        .filter(StockReservation.status == RESERVATION_ACTIVE, StockReservation.expires_at <= now)
+        .update({StockReservation.status: RESERVATION_EXPIRED}, synchronize_session=False)
+    )
@@ -0,0 +1,221 @@
+# backend/utils/invoice_export.py
+"""
+Bulk invoice PDF export.
+
+The ZIP is streamed to the client while it is being built: invoices are loaded
+in batches, PDFs already cached for their current version are added right away
+and missing ones are rendered in a process pool and added as they complete.
+Only one batch of invoices and one compressed file are held in memory at a time.
+
+Progress of exports is kept in memory of the API process that streams them.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import joinedload
+
+from config import settings
+from database import SessionLocal
+from models.invoice import Invoice
+from utils.pdf_storage import pinned_invoice_pdf, touch
+from utils.pdf import ensure_invoice_pdf, get_pdf_path, init_fonts, invoice_pdf_version
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# PROGRESS
+# =========================
+
+_exports: Dict[str, dict] = {}
+_exports_lock = threading.Lock()
+
+def start_export(user_id: int, total: int) -> str:
+    """Registers a new export and returns its id (the progress handle)."""
+    export_id = uuid.uuid4().hex
+    now = time.time()
+    with _exports_lock:
+        # Forget finished exports past the status TTL
+        for key, entry in list(_exports.items()):
+            if entry["finished_at"] and now - entry["finished_at"] > settings.INVOICE_EXPORT_STATUS_TTL_SECONDS:
+                del _exports[key]
+        _exports[export_id] = {
+            "export_id": export_id, "user_id": user_id, "state": "running",
+            "total": total, "done": 0, "rendered": 0, "failed": 0,
+            "started_at": now, "finished_at": None, "error": None,
+        }
+    return export_id
+
+def export_status(export_id: str) -> Optional[dict]:
+    """Snapshot of an export's progress, or None when unknown (or expired)."""
+    with _exports_lock:
+        entry = _exports.get(export_id)
+        return dict(entry) if entry else None
+
+def _progress(export_id: str, **increments: int) -> None:
+    with _exports_lock:
+        entry = _exports[export_id]
+        for key, value in increments.items():
+            entry[key] += value
+
+def _finish(export_id: str, state: str, error: Optional[str] = None) -> None:
+    with _exports_lock:
+        entry = _exports[export_id]
+        if entry["state"] == "running":
+            entry.update(state=state, error=error, finished_at=time.time())
+
+# =========================
+# RENDERING (PROCESS POOL)
+# =========================
+
+def _snapshot(invoice: Invoice) -> SimpleNamespace:
+    # Plain, picklable copy of everything the PDF needs (ORM objects cannot cross processes)
+    items = [
+        SimpleNamespace(
+            product_id=it.product_id, product_name=it.product_name, quantity=it.quantity,
+            price_net=it.price_net, tax_rate=it.tax_rate, total_net=it.total_net, total_gross=it.total_gross,
+        )
+        for it in invoice.items
+    ]
+    parent = invoice.parent if invoice.is_correction else None
+    return SimpleNamespace(
+        id=invoice.id, full_number=invoice.full_number, created_at=invoice.created_at,
+        buyer_name=invoice.buyer_name, buyer_nip=invoice.buyer_nip, buyer_address=invoice.buyer_address,
+        total_net=invoice.total_net, total_vat=invoice.total_vat, total_gross=invoice.total_gross,
+        is_correction=invoice.is_correction, correction_reason=invoice.correction_reason,
+        parent=_snapshot(parent) if parent else None, items=items,
+    )
+
+def _render_job(invoice: SimpleNamespace, company: Optional[dict]) -> str:
+    """Runs inside a pool process: renders (or reuses) the PDF and returns its path."""
+    path, _ = ensure_invoice_pdf(invoice, invoice.items, company=company)
+    return str(path.resolve())
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Lazily started; one process per core unless INVOICE_EXPORT_WORKERS is set
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INVOICE_EXPORT_WORKERS or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_fonts,
+            )
+        return _pool
+
+def shutdown_pool() -> None:
+    """Stops the export pool on application shutdown."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _render_batch(export_id: str, invoices: List[SimpleNamespace], company: Optional[dict]) -> Iterator[Tuple[SimpleNamespace, str]]:
+    # Pinned or cached PDFs first, then freshly rendered ones in completion order; failures are counted and skipped
+    missing = []
+    for invoice in invoices:
+        pinned = pinned_invoice_pdf(invoice.id)
+        path = pinned[0] if pinned else get_pdf_path(invoice.id, invoice_pdf_version(invoice, invoice.items, company))
+        if path.exists():
+            touch(path)
+            yield invoice, str(path)
+        else:
+            missing.append(invoice)
+    if not missing:
+        return
+
+    pool = _get_pool()
+    futures = {pool.submit(_render_job, invoice, company): invoice for invoice in missing}
+    try:
+        for future in as_completed(futures):
+            invoice = futures[future]
+            try:
+                path = future.result()
+            except Exception as e:
+                logger.error("Export %s: PDF of invoice %s failed: %s", export_id, invoice.id, e)
+                _progress(export_id, failed=1)
+                continue
+            _progress(export_id, rendered=1)
+            yield invoice, path
+    finally:
+        # Client went away mid-batch: do not keep rendering for nobody
+        for future in futures:
+            future.cancel()
+
+# =========================
+# ZIP STREAM
+# =========================
+
+class _ZipSink:
+    # Write-only file object for ZipFile; holds bytes until the stream hands them out.
+    # It has no tell()/seek(), so ZipFile writes sizes in data descriptors (streaming mode).
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _archive_name(invoice: SimpleNamespace, used: set) -> str:
+    name = f"Faktura_{invoice.full_number.replace('/', '_')}.pdf"
+    if name in used:
+        name = f"Faktura_{invoice.full_number.replace('/', '_')}_{invoice.id}.pdf"
+    used.add(name)
+    return name
+
+def stream_export(export_id: str, invoice_ids: List[int], company: Optional[dict]) -> Iterator[bytes]:
+    """
+    Yields the ZIP archive of the given invoices chunk by chunk (one chunk per
+    file). Uses its own DB sessions, since it runs after the request returned.
+    """
+    sink = _ZipSink()
+    used_names: set = set()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for start in range(0, len(invoice_ids), settings.INVOICE_EXPORT_BATCH_SIZE):
+                batch_ids = invoice_ids[start:start + settings.INVOICE_EXPORT_BATCH_SIZE]
+                db = SessionLocal()
+                try:
+                    invoices = [
+                        _snapshot(invoice)
+                        for invoice in db.query(Invoice).options(
+                            joinedload(Invoice.items),
+                            joinedload(Invoice.parent).joinedload(Invoice.items),
+                        ).filter(Invoice.id.in_(batch_ids)).order_by(Invoice.id).all()
+                    ]
+                finally:
+                    db.close()
+
+                for invoice, path in _render_batch(export_id, invoices, company):
+                    zf.write(path, arcname=_archive_name(invoice, used_names))
+                    _progress(export_id, done=1)
+                    yield sink.drain()
+        # Central directory
+        yield sink.drain()
+        _finish(export_id, "done")
+    except GeneratorExit:
+        _finish(export_id, "cancelled")
+        raise
+    except Exception as e:
+        logger.exception("Export %s failed: %s", export_id, e)
+        _finish(export_id, "failed", error=str(e))
+        raise
@@ -0,0 +1,175 @@
+# backend/utils/jobs.py
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import and_, or_, select, update, func
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.job import Job, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, PRIORITY_NORMAL
+
+logger = logging.getLogger(__name__)
+
+# Registered handlers: kind -> handler(db, payload)
+_handlers: Dict[str, Callable[[Session, dict], Any]] = {}
+
+
+def job_handler(kind: str):
+    """Registers a function as the handler of a job kind."""
+    def register(func: Callable[[Session, dict], Any]):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    priority: int = PRIORITY_NORMAL,
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """
+    Adds a job to the queue. Not committed: the job becomes visible together
+    with the caller's transaction, so work is never queued for rolled-back data.
+    """
+    now = datetime.utcnow()
+    job = Job(
+        kind=kind, payload=payload or {}, priority=priority,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        created_at=now, run_at=now + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    return job
+
+
+def _leasable(now: datetime):
+    # Due queued jobs, plus running jobs whose worker missed the visibility timeout
+    return or_(
+        and_(Job.state == JOB_QUEUED, Job.run_at <= now),
+        and_(Job.state == JOB_RUNNING, Job.leased_until <= now),
+    )
+
+
+def lease_next(db: Session, worker_id: str) -> Optional[Job]:
+    """Atomically leases the highest-priority due job (single UPDATE ... RETURNING)."""
+    now = datetime.utcnow()
+    candidate = (
+        select(Job.id).where(_leasable(now))
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(1).scalar_subquery()
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id == candidate, _leasable(now))
+        .values(
+            state=JOB_RUNNING,
+            attempts=Job.attempts + 1,
+            leased_until=now + timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT_SECONDS),
+            locked_by=worker_id,
+            started_at=func.coalesce(Job.started_at, now),
+        )
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    job_id = db.execute(stmt).scalar()
+    db.commit()
+    if job_id is None:
+        return None
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def _release(db: Session, job: Job, worker_id: str, values: dict) -> None:
+    # Only the current lease holder may settle the job
+    db.query(Job).filter(Job.id == job.id, Job.locked_by == worker_id, Job.state == JOB_RUNNING).update(
+        {**values, Job.leased_until: None}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _backoff_seconds(attempts: int) -> float:
+    return min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS)
+
+
+def run_next(worker_id: str) -> bool:
+    """Leases and runs one job; returns False when nothing was due."""
+    db = SessionLocal()
+    try:
+        job = lease_next(db, worker_id)
+        if job is None:
+            return False
+
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{job.kind}'")
+            handler(db, dict(job.payload or {}))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {e}"[:2000]
+            if job.attempts >= job.max_attempts:
+                logger.exception("Job %s (%s) failed permanently after %s attempts", job.id, job.kind, job.attempts)
+                _release(db, job, worker_id, {Job.state: JOB_FAILED, Job.finished_at: datetime.utcnow(), Job.last_error: error})
+            else:
+                delay = _backoff_seconds(job.attempts)
+                logger.warning("Job %s (%s) failed (attempt %s), retrying in %ss: %s", job.id, job.kind, job.attempts, delay, error)
+                _release(db, job, worker_id, {
+                    Job.state: JOB_QUEUED, Job.run_at: datetime.utcnow() + timedelta(seconds=delay), Job.last_error: error,
+                })
+            return True
+
+        _release(db, job, worker_id, {Job.state: JOB_DONE, Job.finished_at: datetime.utcnow(), Job.last_error: None})
+        return True
+    finally:
+        db.close()
+
+
+def purge_finished(db: Session, older_than: Optional[timedelta] = None) -> int:
+    """Deletes finished jobs past the retention window; failed jobs are kept for inspection."""
+    cutoff = datetime.utcnow() - (older_than or timedelta(hours=settings.JOBS_RETENTION_HOURS))
+    return db.query(Job).filter(Job.state == JOB_DONE, Job.finished_at < cutoff).delete(synchronize_session=False)
+
+
+def queue_stats(db: Session, window: timedelta = timedelta(hours=1)) -> dict:
+    """Queue depth per state/kind and wait/run latency of jobs finished within the window."""
+    now = datetime.utcnow()
+
+    depth: Dict[str, Dict[str, int]] = {}
+    for state, kind, count in db.query(Job.state, Job.kind, func.count(Job.id)).filter(
+        Job.state != JOB_DONE
+    ).group_by(Job.state, Job.kind).all():
+        depth.setdefault(state, {})[kind] = count
+
+    oldest_due = db.query(func.min(Job.run_at)).filter(Job.state == JOB_QUEUED, Job.run_at <= now).scalar()
+
+    # Latency of recent jobs (bounded sample, computed in Python to stay database-agnostic)
+    recent = db.query(Job.created_at, Job.started_at, Job.finished_at).filter(
+        Job.state == JOB_DONE, Job.finished_at >= now - window
+    ).order_by(Job.finished_at.desc()).limit(1000).all()
+    waits = sorted((s - c).total_seconds() for c, s, f in recent if c and s)
+    runs = sorted((f - s).total_seconds() for c, s, f in recent if s and f)
+
+    def summary(values):
+        if not values:
+            return {"avg": None, "p95": None, "max": None}
+        return {
+            "avg": round(sum(values) / len(values), 3),
+            "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+            "max": round(values[-1], 3),
+        }
+
+    return {
+        "depth": depth,
+        "queued": sum(depth.get(JOB_QUEUED, {}).values()),
+        "running": sum(depth.get(JOB_RUNNING, {}).values()),
+        "failed": sum(depth.get(JOB_FAILED, {}).values()),
+        "oldest_due_age_seconds": round((now - oldest_due).total_seconds(), 3) if oldest_due else None,
+        "completed_in_window": len(recent),
+        "wait_seconds": summary(waits),
+        "run_seconds": summary(runs),
+    }
@@ -0,0 +1,298 @@
+# backend/utils/jpk.py
+"""
+JPK_FA (4) export: the invoice part of the Polish SAF-T, for a date range.
+
+The schema lists all invoice headers (Faktura), their control totals, then all
+invoice lines (FakturaWiersz) with their control totals. The XML is therefore
+produced in two passes over the invoices, each reading them in id-ordered
+batches with its own DB session, and yielded chunk by chunk: memory use does
+not depend on the length of the period.
+
+Corrections (parent_id) are reported as KOREKTA with the difference to the
+state they correct: the previous correction of the same invoice, or the
+invoice itself. Their lines are the lines before the correction with negated
+quantities followed by the lines after it.
+"""
+import re
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from sqlalchemy.orm import selectinload
+
+from config import settings
+from database import SessionLocal
+from models.invoice import Invoice, InvoiceItem
+
+NS_TNS = "http://jpk.mf.gov.pl/wzor/2022/02/17/02171/"
+NS_ETD = "http://crd.gov.pl/xml/schematy/dziedzinowe/mf/2022/01/05/eD/DefinicjeTypy/"
+
+# VAT rate -> suffix of the P_13_x (net) / P_14_x (tax) fields of Faktura
+RATE_FIELDS = {23: "1", 22: "1", 8: "2", 7: "2", 5: "3", 4: "3", 3: "3"}
+# Domestic 0% supply: net amount only
+ZERO_RATE_FIELD = "P_13_6_1"
+
+
+_ADDRESS = re.compile(r"^(?P<street>.+?)\s+(?P<house>\d+[A-Za-z]?(?:/\w+)?)\s*,\s*(?P<postal>\d{2}-\d{3})\s+(?P<city>.+)$")
+
+CENT = Decimal("0.01")
+
+
+def _amount(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _el(name: str, value, attrs: str = "") -> str:
+    return f"<tns:{name}{attrs}>{escape(str(value))}</tns:{name}>"
+
+
+# Special procedures, none of which the shop uses, in schema order after P_15: plain flags set to false,
+# and the choice groups where FA(4) expects the "N" marker (no exempt supply, no new means of transport,
+# no margin scheme) instead of a false flag
+_PROCEDURE_FLAGS = (
+    _el("P_16", "false") + _el("P_17", "false") + _el("P_18", "false") + _el("P_18A", "false")
+    + "<tns:Zwolnienie>" + _el("P_19N", "true") + "</tns:Zwolnienie>"
+    + "<tns:NoweSrodkiTransportu>" + _el("P_22N", "true") + "</tns:NoweSrodkiTransportu>"
+    + _el("P_23", "false")
+    + "<tns:PMarzy>" + _el("P_PMarzyN", "true") + "</tns:PMarzy>"
+)
+
+
+def _rate_label(rate: float) -> str:
+    return str(int(rate)) if float(rate).is_integer() else str(rate)
+
+
+def is_supported_rate(rate: float) -> bool:
+    return rate is not None and float(rate).is_integer() and (int(rate) in RATE_FIELDS or rate == 0)
+
+
+def unsupported_tax_rates(db, date_from: date, date_to: date) -> List[float]:
+    """VAT rates used in the period that have no JPK_FA field (the export would be invalid)."""
+    start, end = _period_bounds(date_from, date_to)
+    rates = (
+        db.query(InvoiceItem.tax_rate).join(Invoice, Invoice.id == InvoiceItem.invoice_id)
+        .filter(Invoice.created_at >= start, Invoice.created_at < end).distinct().all()
+    )
+    return sorted(r.tax_rate for r in rates if not is_supported_rate(r.tax_rate))
+
+
+def _period_bounds(date_from: date, date_to: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(date_from, time.min), datetime.combine(date_to + timedelta(days=1), time.min)
+
+
+# =========================
+# SELLER (PODMIOT1)
+# =========================
+
+def seller_block(company: Optional[dict]) -> str:
+    """
+    Podmiot1 element. Raises ValueError listing what is missing: NIP and name
+    come from the company record, the address from its "ulica nr, kod miasto"
+    form plus the JPK_SELLER_* settings.
+    """
+    company = company or {}
+    missing = []
+    nip = re.sub(r"\D", "", company.get("nip") or "")
+    if len(nip) != 10:
+        missing.append("NIP firmy (10 cyfr)")
+    if not company.get("name"):
+        missing.append("nazwa firmy")
+    match = _ADDRESS.match((company.get("address") or "").strip())
+    if not match:
+        missing.append("adres firmy w formacie 'ulica nr, kod miasto'")
+    for setting in ("JPK_TAX_OFFICE_CODE", "JPK_SELLER_VOIVODESHIP", "JPK_SELLER_COUNTY", "JPK_SELLER_COMMUNE"):
+        if not getattr(settings, setting):
+            missing.append(setting)
+    if missing:
+        raise ValueError("Brak danych do JPK_FA: " + ", ".join(missing))
+
+    etd = lambda name, value: f"<etd:{name}>{escape(str(value))}</etd:{name}>"
+    return (
+        "<tns:Podmiot1>"
+        "<tns:IdentyfikatorPodmiotu>" + etd("NIP", nip) + etd("PelnaNazwa", company["name"]) + "</tns:IdentyfikatorPodmiotu>"
+        "<tns:AdresPodmiotu>"
+        + etd("KodKraju", "PL") + etd("Wojewodztwo", settings.JPK_SELLER_VOIVODESHIP)
+        + etd("Powiat", settings.JPK_SELLER_COUNTY) + etd("Gmina", settings.JPK_SELLER_COMMUNE)
+        + etd("Ulica", match["street"]) + etd("NrDomu", match["house"])
+        + etd("Miejscowosc", match["city"]) + etd("KodPocztowy", match["postal"])
+        + "</tns:AdresPodmiotu>"
+        "</tns:Podmiot1>"
+    )
+
+
+# =========================
+# DOCUMENTS
+# =========================
+
+def _batches(date_from: date, date_to: date) -> Iterator[List[Tuple[Invoice, Optional[Invoice], Optional[Invoice]]]]:
+    # (invoice, previous state, corrected invoice) in id order; previous/corrected are set for corrections only
+    start, end = _period_bounds(date_from, date_to)
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            invoices = (
+                db.query(Invoice).options(selectinload(Invoice.items))
+                .filter(Invoice.created_at >= start, Invoice.created_at < end, Invoice.id > last_id)
+                .order_by(Invoice.id).limit(settings.JPK_BATCH_SIZE).all()
+            )
+            if not invoices:
+                return
+            # Whole families of the corrections in this batch, to find what each of them corrects
+            family_ids = {inv.family_id or inv.parent_id for inv in invoices if inv.is_correction}
+            families = defaultdict(list)
+            if family_ids:
+                for member in (
+                    db.query(Invoice).options(selectinload(Invoice.items))
+                    .filter(Invoice.family_id.in_(family_ids)).order_by(Invoice.id)
+                ):
+                    families[member.family_id].append(member)
+            rows = []
+            for inv in invoices:
+                if not inv.is_correction:
+                    rows.append((inv, None, None))
+                    continue
+                members = families.get(inv.family_id or inv.parent_id, [])
+                earlier = [m for m in members if m.id < inv.id]
+                corrected = next((m for m in members if m.id == inv.parent_id), None)
+                rows.append((inv, earlier[-1] if earlier else None, corrected))
+        finally:
+            db.close()
+        yield rows
+        last_id = invoices[-1].id
+
+
+def _rate_totals(items) -> Dict[float, List[Decimal]]:
+    totals: Dict[float, List[Decimal]] = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for item in items:
+        net = _amount(item.total_net)
+        totals[item.tax_rate][0] += net
+        totals[item.tax_rate][1] += _amount(item.total_gross) - net
+    return totals
+
+
+def _faktura(invoice: Invoice, previous: Optional[Invoice], corrected: Optional[Invoice], seller_name: str,
+             seller_address: str, seller_nip: str) -> Tuple[str, Decimal]:
+    totals = _rate_totals(invoice.items)
+    gross = _amount(invoice.total_gross)
+    if invoice.is_correction and previous is not None:
+        for rate, (net, vat) in _rate_totals(previous.items).items():
+            totals[rate][0] -= net
+            totals[rate][1] -= vat
+        gross -= _amount(previous.total_gross)
+
+    parts = [
+        _el("KodWaluty", "PLN"),
+        _el("P_1", invoice.created_at.date().isoformat()),
+        _el("P_2A", invoice.full_number),
+        _el("P_3A", invoice.buyer_name),
+        _el("P_3B", invoice.buyer_address or invoice.shipping_address or "-"),
+        _el("P_3C", seller_name),
+        _el("P_3D", seller_address),
+        _el("P_4B", seller_nip),
+    ]
+    buyer_nip = re.sub(r"\D", "", invoice.buyer_nip or "")
+    if buyer_nip:
+        parts.append(_el("P_5B", buyer_nip))
+    for suffix in ("1", "2", "3"):
+        nets = [totals[r] for r in totals if r and int(r) in RATE_FIELDS and RATE_FIELDS[int(r)] == suffix]
+        if nets:
+            parts.append(_el(f"P_13_{suffix}", f"{sum(n for n, _ in nets):.2f}"))
+            parts.append(_el(f"P_14_{suffix}", f"{sum(v for _, v in nets):.2f}"))
+    if 0 in totals:
+        parts.append(_el(ZERO_RATE_FIELD, f"{totals[0][0]:.2f}"))
+    parts.append(_el("P_15", f"{gross:.2f}"))
+    parts.append(_PROCEDURE_FLAGS)
+
+    if invoice.is_correction:
+        # OkresFaKorygowanej is only for corrections of a whole period (e.g. a rebate), not of one invoice
+        parts.append(_el("RodzajFaktury", "KOREKTA"))
+        parts.append(_el("PrzyczynaKorekty", invoice.correction_reason or "-"))
+        if corrected is not None:
+            parts.append(_el("NrFaKorygowanej", corrected.full_number))
+    else:
+        parts.append(_el("RodzajFaktury", "VAT"))
+    return "<tns:Faktura>" + "".join(parts) + "</tns:Faktura>", gross
+
+
+def _wiersz(number: str, item, sign: int) -> Tuple[str, Decimal]:
+    net = _amount(item.total_net) * sign
+    xml = (
+        "<tns:FakturaWiersz>"
+        + _el("P_2B", number)
+        + _el("P_7", item.product_name)
+        + _el("P_8A", "szt.")
+        + _el("P_8B", item.quantity * sign)
+        + _el("P_9A", f"{_amount(item.price_net):.2f}")
+        + _el("P_11", f"{net:.2f}")
+        + _el("P_12", _rate_label(item.tax_rate))
+        + "</tns:FakturaWiersz>"
+    )
+    return xml, net
+
+
+# =========================
+# STREAM
+# =========================
+
+def stream_jpk_fa(date_from: date, date_to: date, company: Optional[dict]) -> Iterator[bytes]:
+    """
+    Yields the JPK_FA XML for invoices issued in [date_from, date_to], one chunk
+    per batch. Call seller_block() first to reject incomplete company data
+    before the response starts.
+    """
+    podmiot = seller_block(company)
+    match = _ADDRESS.match(company["address"].strip())
+    seller_name, seller_nip = company["name"], re.sub(r"\D", "", company["nip"])
+    seller_address = f"{match['street']} {match['house']}, {match['postal']} {match['city']}"
+
+    generated = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f"<tns:JPK xmlns:tns={quoteattr(NS_TNS)} xmlns:etd={quoteattr(NS_ETD)}>"
+        "<tns:Naglowek>"
+        + _el("KodFormularza", "JPK_FA", ' kodSystemowy="JPK_FA (4)" wersjaSchemy="1-0"')
+        + _el("WariantFormularza", 4)
+        + _el("CelZlozenia", 1)
+        + _el("DataWytworzeniaJPK", generated)
+        + _el("DataOd", date_from.isoformat())
+        + _el("DataDo", date_to.isoformat())
+        + _el("KodUrzedu", settings.JPK_TAX_OFFICE_CODE)
+        + "</tns:Naglowek>"
+        + podmiot
+    ).encode("utf-8")
+
+    # Pass 1: invoice headers
+    count, total = 0, Decimal(0)
+    for rows in _batches(date_from, date_to):
+        chunk = []
+        for invoice, previous, corrected in rows:
+            xml, gross = _faktura(invoice, previous, corrected, seller_name, seller_address, seller_nip)
+            chunk.append(xml)
+            count += 1
+            total += gross
+        yield "".join(chunk).encode("utf-8")
+    yield (
+        "<tns:FakturaCtrl>" + _el("LiczbaFaktur", count) + _el("WartoscFaktur", f"{total:.2f}") + "</tns:FakturaCtrl>"
+    ).encode("utf-8")
+
+    # Pass 2: invoice lines
+    count, total = 0, Decimal(0)
+    for rows in _batches(date_from, date_to):
+        chunk = []
+        for invoice, previous, _ in rows:
+            lines = [(item, 1) for item in invoice.items]
+            if invoice.is_correction and previous is not None:
+                lines = [(item, -1) for item in previous.items] + lines
+            for item, sign in lines:
+                xml, net = _wiersz(invoice.full_number, item, sign)
+                chunk.append(xml)
+                count += 1
+                total += net
+        yield "".join(chunk).encode("utf-8")
+    yield (
+        "<tns:FakturaWierszCtrl>" + _el("LiczbaWierszyFaktur", count) + _el("WartoscWierszyFaktur", f"{total:.2f}")
+        + "</tns:FakturaWierszCtrl></tns:JPK>"
+    ).encode("utf-8")
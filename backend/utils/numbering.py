@@ -0,0 +1,59 @@
+# backend/utils/numbering.py
+from typing import Callable, Optional
+
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.counter import DocumentCounter, INVOICE_COUNTER, NO_PERIOD
+from models.invoice import Invoice
+
+
+def _increment(db: Session, name: str, period: int) -> Optional[int]:
+    # Atomic increment-and-return; the row lock is held until the caller's transaction ends
+    stmt = (
+        update(DocumentCounter)
+        .where(DocumentCounter.name == name, DocumentCounter.period == period)
+        .values(value=DocumentCounter.value + 1)
+        .returning(DocumentCounter.value)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).scalar()
+
+
+def allocate_number(
+    db: Session,
+    name: str,
+    period: int = NO_PERIOD,
+    seed: Optional[Callable[[Session], int]] = None,
+) -> int:
+    """
+    Returns the next number of a counter in O(1), independent of table size.
+    The increment is part of the caller's transaction: a rollback returns the
+    number, so committed numbers stay unique and gap-free. A missing counter
+    row is created once, starting from seed(db) (default 0).
+    """
+    value = _increment(db, name, period)
+    if value is not None:
+        return value
+
+    # First use of this counter/period: insert the row, tolerating a concurrent creator
+    start = seed(db) if seed else 0
+    try:
+        with db.begin_nested():
+            db.add(DocumentCounter(name=name, period=period, value=start))
+    except IntegrityError:
+        pass
+    return _increment(db, name, period)
+
+
+def _max_invoice_number(db: Session) -> int:
+    # One-time seed for databases numbered before the counter existed
+    return db.query(func.max(Invoice.number)).filter(
+        (Invoice.is_correction == False) | (Invoice.is_correction == None)
+    ).scalar() or 0
+
+
+def next_invoice_number(db: Session) -> int:
+    """Allocates the next regular (non-correction) invoice number."""
+    return allocate_number(db, INVOICE_COUNTER, seed=_max_invoice_number)
@@ -1,6 +1,9 @@
 # backend/utils/payu_client.py
+import asyncio
+import time
 import httpx
 import logging
+from typing import Optional
 from urllib.parse import urljoin
 from config import settings
 
@@ -16,7 +19,35 @@ class PayUClient:
         self.notify_url = urljoin(settings.BACKEND_URL, "/payu/notify")
         self.continue_url = urljoin(settings.FRONTEND_URL, "/my-orders")
 
-    async def get_auth_token(self) -> str:
+        # Shared keep-alive connection pool, created on first use
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Cached OAuth token; refreshed by a single caller at a time
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Lazily open the pooled client (re-opened if it was closed on shutdown)
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.PAYU_TIMEOUT_SECONDS, connect=settings.PAYU_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.PAYU_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PAYU_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.PAYU_KEEPALIVE_SECONDS,
+                ),
+            )
+        return self._client
+
+    def _token_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._token_expires_at
+
+    def invalidate_token(self) -> None:
+        self._token = None
+        self._token_expires_at = 0.0
+
+    async def _fetch_auth_token(self) -> str:
         # Retrieve OAuth access token using client credentials
         auth_url = urljoin(self.api_url, "/pl/standard/user/oauth/authorize")
         payload = {
@@ -24,14 +55,28 @@ class PayUClient:
             "client_id": self.client_id,
             "client_secret": self.client_secret,
         }
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(auth_url, data=payload)
-                response.raise_for_status()
-                return response.json()["access_token"]
-            except (httpx.RequestError, httpx.HTTPStatusError) as e:
-                logger.error(f"PayU auth error: {e}")
-                raise
+        try:
+            response = await self._get_client().post(auth_url, data=payload)
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.RequestError, httpx.HTTPStatusError) as e:
+            logger.error(f"PayU auth error: {e}")
+            raise
+
+        # Keep the token until shortly before PayU expires it
+        expires_in = float(data.get("expires_in") or 0)
+        self._token = data["access_token"]
+        self._token_expires_at = time.monotonic() + max(expires_in - settings.PAYU_TOKEN_REFRESH_MARGIN_SECONDS, 0)
+        return self._token
+
+    async def get_auth_token(self, force_refresh: bool = False) -> str:
+        # Return the cached token; concurrent callers share one refresh
+        if not force_refresh and self._token_valid():
+            return self._token
+        async with self._token_lock:
+            if not force_refresh and self._token_valid():
+                return self._token
+            return await self._fetch_auth_token()
 
     async def create_order(self, token: str, order_data: dict):
         # Submit order request to PayU API
@@ -40,29 +85,47 @@ class PayUClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}"
         }
-        async with httpx.AsyncClient() as client:
+        try:
+            # Disable auto-redirects to handle 3xx responses manually
+            response = await self._get_client().post(order_url, json=order_data, headers=headers, follow_redirects=False)
+
+            # Extract redirect URL from headers if status is 3xx
+            if 300 <= response.status_code < 400:
+                loc = response.headers.get("Location") or response.headers.get("location")
+                return {"redirectUri": loc, "status_code": response.status_code}
+
+            # Enforce error checks for client/server errors
+            if response.status_code >= 400:
+                response.raise_for_status()
+
+            # Return standard JSON response
+            return response.json()
+        except (httpx.RequestError, httpx.HTTPStatusError) as e:
+            # Log detailed error information before re-raising
             try:
-                # Disable auto-redirects to handle 3xx responses manually
-                response = await client.post(order_url, json=order_data, headers=headers, follow_redirects=False)
-
-                # Extract redirect URL from headers if status is 3xx
-                if 300 <= response.status_code < 400:
-                    loc = response.headers.get("Location") or response.headers.get("location")
-                    return {"redirectUri": loc, "status_code": response.status_code}
-
-                # Enforce error checks for client/server errors
-                if response.status_code >= 400:
-                    response.raise_for_status()
-
-                # Return standard JSON response
-                return response.json()
-            except (httpx.RequestError, httpx.HTTPStatusError) as e:
-                # Log detailed error information before re-raising
-                try:
-                    resp_text = e.response.text if hasattr(e, 'response') and e.response is not None else str(e)
-                except Exception:
-                    resp_text = str(e)
-                logger.error(f"PayU create order error: {resp_text}")
+                resp_text = e.response.text if hasattr(e, 'response') and e.response is not None else str(e)
+            except Exception:
+                resp_text = str(e)
+            logger.error(f"PayU create order error: {resp_text}")
+            raise
+
+    async def submit_order(self, order_data: dict):
+        # Create an order with the cached token; retry once if PayU rejected the token
+        token = await self.get_auth_token()
+        try:
+            return await self.create_order(token, order_data)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
                 raise
+            if self._token == token:
+                self.invalidate_token()
+            return await self.create_order(await self.get_auth_token(), order_data)
+
+    async def aclose(self) -> None:
+        # Close pooled connections on application shutdown
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.invalidate_token()
 
-payu_client = PayUClient()
\ No newline at end of file
+payu_client = PayUClient()
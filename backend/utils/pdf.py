@@ -1,71 +1,266 @@
 # backend/utils/pdf.py
-
+"""
+Shared PDF rendering (invoices and WZ documents).
+
+Fonts are registered once per process (init_fonts() at startup, or lazily on
+first render). Static page elements (table header chrome, signature lines) are
+recorded once per document as form XObjects and referenced wherever they
+repeat. Documents are rendered to in-memory buffers; callers decide where the
+bytes go.
+
+This layout is for maintainability, not speed: forms cannot be shared between
+documents, and rendering is as fast as with the static elements drawn inline
+(see benchmark_pdf.py).
+"""
+import hashlib
+import io
+import json
+import os
+import threading
 from pathlib import Path
-from typing import List, Any
+from typing import List, Any, Callable, Optional, Tuple, Union
+from fastapi.responses import FileResponse, Response
+from config import settings
+from utils.pdf_storage import INVOICE_DIR, WZ_DIR, touch
 # Import models solely for type hinting
 from models.invoice import Invoice, InvoiceItem 
 
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+except ImportError:
+    canvas = None
+
 # Path configuration
-STORAGE_DIR = Path("storage/invoices")
-FONT_DIR = Path("assets/fonts")
-FONT_REGULAR_PATH = FONT_DIR / "DejaVuSans.ttf"
-FONT_BOLD_PATH = FONT_DIR / "DejaVuSans-Bold.ttf"
+STORAGE_DIR = INVOICE_DIR
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+FONT_DIRS = [BACKEND_DIR / "assets" / "fonts", BACKEND_DIR / "fonts"]
 
+# Switched to the built-in Helvetica when the DejaVu files are missing (no Polish glyphs then)
 FONT_REGULAR_NAME = "DejaVuSans"
 FONT_BOLD_NAME = "DejaVuSans-Bold"
 
 def ensure_storage_dir() -> None:
     STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
-def get_pdf_path(invoice_id: int) -> Path:
-    """Returns the filesystem path for a specific invoice PDF."""
+# Bump when the invoice layout changes, so every cached PDF is re-rendered
+PDF_LAYOUT_VERSION = 1
+
+def get_pdf_path(invoice_id: int, version: Optional[str] = None) -> Path:
+    """Returns the filesystem path for a specific invoice PDF (optionally a content version of it)."""
     ensure_storage_dir()
+    if version:
+        return STORAGE_DIR / f"INV-{invoice_id}-{version}.pdf"
     return STORAGE_DIR / f"INV-{invoice_id}.pdf"
 
-_fonts_inited = False
-def _init_fonts():
-    """Initializes TrueType fonts to support UTF-8 characters in ReportLab."""
-    global _fonts_inited, FONT_BOLD_NAME
-    if _fonts_inited:
-        return
+def _invoice_fingerprint(invoice: Invoice, items: List[InvoiceItem]) -> dict:
+    # Everything printed on the PDF for one invoice
+    return {
+        "id": invoice.id,
+        "number": invoice.full_number,
+        "created_at": str(invoice.created_at),
+        "buyer": [invoice.buyer_name, invoice.buyer_nip, invoice.buyer_address],
+        "totals": [invoice.total_net, invoice.total_vat, invoice.total_gross],
+        "correction_reason": invoice.correction_reason,
+        "items": [
+            [it.product_id, it.product_name, it.quantity, it.price_net, it.tax_rate, it.total_gross]
+            for it in items
+        ],
+    }
+
+def invoice_pdf_version(invoice: Invoice, items: List[InvoiceItem], company: dict | None = None) -> str:
+    """
+    Content version of an invoice PDF: a hash of the invoice, its items, the
+    corrected invoice (for corrections) and the seller data. Any change yields
+    a new version, so a cached file never outlives the data it was rendered from.
+    """
+    parent = invoice.parent if invoice.is_correction else None
+    data = {
+        "layout": PDF_LAYOUT_VERSION,
+        "invoice": _invoice_fingerprint(invoice, items),
+        "parent": _invoice_fingerprint(parent, parent.items) if parent else None,
+        "company": company,
+    }
+    raw = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:20]
+
+def _remove_stale_versions(invoice_id: int, keep: Path) -> None:
+    # Older versions (and the legacy unversioned file) of the same invoice
+    for path in [STORAGE_DIR / f"INV-{invoice_id}.pdf", *STORAGE_DIR.glob(f"INV-{invoice_id}-*.pdf")]:
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+def write_pdf_atomic(path: Path, data: bytes) -> None:
+    """Writes to a temp file renamed into place, so readers never see a partial PDF."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
     try:
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def store_invoice_pdf(invoice_id: int, version: str, data: bytes) -> Path:
+    """Caches a rendered version of an invoice PDF and drops the older ones."""
+    path = get_pdf_path(invoice_id, version)
+    write_pdf_atomic(path, data)
+    _remove_stale_versions(invoice_id, keep=path)
+    return path
+
+def ensure_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], company: dict | None = None) -> Tuple[Path, str]:
+    """
+    Returns (path, version) of the current invoice PDF, rendering and caching
+    it only when that version is not cached yet.
+    """
+    version = invoice_pdf_version(invoice, items, company)
+    path = get_pdf_path(invoice.id, version)
+    if not path.exists():
+        path = store_invoice_pdf(invoice.id, version, render_invoice_pdf(invoice, items, company=company))
+    return path, version
 
-        if not FONT_REGULAR_PATH.exists():
-            print(f"Warning: Font file not found at {FONT_REGULAR_PATH}")
-            return 
+def invoice_pdf_content(invoice: Invoice, items: List[InvoiceItem], company: dict | None, version: str) -> Union[Path, bytes]:
+    """
+    PDF for a download: the cached file when present, otherwise rendered in
+    memory. Renders up to PDF_MEMORY_MAX_BYTES are handed out as bytes without
+    touching the disk; larger ones are worth caching and are stored as well.
+    """
+    path = get_pdf_path(invoice.id, version)
+    if path.exists():
+        return path
+    data = render_invoice_pdf(invoice, items, company=company)
+    if len(data) > settings.PDF_MEMORY_MAX_BYTES:
+        store_invoice_pdf(invoice.id, version, data)
+    return data
+
+def etag_matches(if_none_match: Optional[str], version: str) -> bool:
+    """True when an If-None-Match header already names this content version."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or f'"{version}"' in tags or f'W/"{version}"' in tags
+
+def pdf_cache_headers(version: str) -> dict:
+    # The browser may reuse the PDF for PDF_BROWSER_MAX_AGE_SECONDS, then revalidates with the ETag
+    return {
+        "ETag": f'"{version}"',
+        "Cache-Control": f"private, max-age={settings.PDF_BROWSER_MAX_AGE_SECONDS}, must-revalidate",
+    }
+
+def pdf_response(content: Union[Path, bytes], filename: str, version: str) -> Response:
+    """Serves a PDF from disk or straight from memory, with cache headers."""
+    headers = pdf_cache_headers(version)
+    if isinstance(content, Path):
+        touch(content)
+        return FileResponse(str(content), media_type="application/pdf", filename=filename, headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return Response(content=content, media_type="application/pdf", headers=headers)
+
+def _require_reportlab() -> None:
+    if canvas is None:
+        raise ImportError("reportlab is not installed. Run: python -m pip install reportlab")
 
-        pdfmetrics.registerFont(TTFont(FONT_REGULAR_NAME, str(FONT_REGULAR_PATH)))
+# Locate font file in known directories
+def _find_font(name: str) -> Optional[Path]:
+    for d in FONT_DIRS:
+        p = d / name
+        if p.exists():
+            return p
+    return None
 
-        if FONT_BOLD_PATH.exists():
-            pdfmetrics.registerFont(TTFont(FONT_BOLD_NAME, str(FONT_BOLD_PATH)))
+_fonts_inited = False
+_fonts_lock = threading.Lock()
+
+def init_fonts() -> None:
+    """Registers the TrueType fonts (UTF-8 support) once per process; later calls are free."""
+    global _fonts_inited, FONT_REGULAR_NAME, FONT_BOLD_NAME
+    if _fonts_inited:
+        return
+    _require_reportlab()
+    with _fonts_lock:
+        if _fonts_inited:
+            return
+        regular_path = _find_font("DejaVuSans.ttf")
+        bold_path = _find_font("DejaVuSans-Bold.ttf")
+        if regular_path:
+            pdfmetrics.registerFont(TTFont(FONT_REGULAR_NAME, str(regular_path)))
         else:
-            FONT_BOLD_NAME = FONT_REGULAR_NAME 
-        
+            print(f"Warning: DejaVuSans.ttf not found in {[str(d) for d in FONT_DIRS]}, using Helvetica")
+            FONT_REGULAR_NAME = "Helvetica"
+        if regular_path and bold_path:
+            pdfmetrics.registerFont(TTFont(FONT_BOLD_NAME, str(bold_path)))
+        else:
+            FONT_BOLD_NAME = FONT_REGULAR_NAME if regular_path else "Helvetica-Bold"
         _fonts_inited = True
 
-    except ImportError:
-        print("ReportLab not installed. Run: pip install reportlab")
-    except Exception as e:
-        print(f"Font init warning: {e}")
+def _new_canvas() -> Tuple[Any, io.BytesIO]:
+    # A4 canvas writing into a memory buffer
+    _require_reportlab()
+    init_fonts()
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1 if settings.PDF_PAGE_COMPRESSION else 0)
+    c._static_forms = set()
+    return c, buffer
+
+def _static_form(c, name: str, draw: Callable[[Any], None], x: float = 0, y: float = 0,
+                 bbox: Optional[Tuple[float, float, float, float]] = None) -> None:
+    # Static content goes through a form XObject: recorded on first use in the document,
+    # referenced (not redrawn) afterwards. Form coordinates are relative to (x, y).
+    if name not in c._static_forms:
+        if bbox:
+            c.beginForm(name, *bbox)
+        else:
+            c.beginForm(name)
+        draw(c)
+        c.endForm()
+        c._static_forms.add(name)
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(name)
+    c.restoreState()
+
+# Invoice items table header: gray band with column labels, baseline at y=0
+def _draw_invoice_table_header(c) -> None:
+    c.setFillColorRGB(0.95, 0.95, 0.95)
+    c.rect(20 * mm, -2 * mm, 170 * mm, 8 * mm, fill=1, stroke=0)
+    c.setFillColorRGB(0, 0, 0)
+
+    c.setFont(FONT_BOLD_NAME, 9)
+    c.drawString(22 * mm, 0, "Lp.")
+    c.drawString(32 * mm, 0, "Produkt")
+    c.drawRightString(105 * mm, 0, "Ilość")
+    c.drawRightString(130 * mm, 0, "Cena netto")
+    c.drawRightString(150 * mm, 0, "VAT")
+    c.drawRightString(185 * mm, 0, "Wartość brutto")
+
+# Invoice footer: signature lines for issuer and recipient
+def _draw_invoice_signatures(c) -> None:
+    y_signatures = 35 * mm
+    c.setLineWidth(0.5)
+    c.setFont(FONT_REGULAR_NAME, 8)
+    
+    # Left signature line
+    c.line(25 * mm, y_signatures, 85 * mm, y_signatures)
+    c.drawCentredString(55 * mm, y_signatures - 4 * mm, "Imię, nazwisko i podpis osoby")
+    c.drawCentredString(55 * mm, y_signatures - 8 * mm, "upoważnionej do wystawienia dokumentu")
+
+    # Right signature line
+    c.line(125 * mm, y_signatures, 185 * mm, y_signatures)
+    c.drawCentredString(155 * mm, y_signatures - 4 * mm, "Imię, nazwisko i podpis osoby")
+    c.drawCentredString(155 * mm, y_signatures - 8 * mm, "upoważnionej do odebrania dokumentu")
 
 def generate_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], out_path: Path, company: dict | None = None) -> None:
+    """Renders the invoice PDF and writes it to out_path (atomically, downloads may serve it)."""
+    write_pdf_atomic(out_path, render_invoice_pdf(invoice, items, company=company))
+
+def render_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], company: dict | None = None) -> bytes:
     """
-    Generates PDF invoice with header, parties, items table, and summary.
+    Renders the invoice PDF (header, parties, items table, summary) to bytes.
     Handles layout for standard invoices and corrections.
     """
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import mm
-    except ImportError:
-        raise ImportError("reportlab is not installed. Run: python -m pip install reportlab")
-
-    _init_fonts()
-    ensure_storage_dir()
-
-    c = canvas.Canvas(str(out_path), pagesize=A4)
+    c, buffer = _new_canvas()
     width, height = A4
 
     # Helper function to render text with alignment and color
@@ -202,19 +397,9 @@ def generate_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], out_path: P
         # --- FIX: Adjust spacing to prevent header overlap ---
         current_y -= 10 * mm 
 
-        # Table header with gray background
-        c.setFillColorRGB(0.95, 0.95, 0.95)
-        # Header background rectangle
-        c.rect(20 * mm, current_y - 2*mm, 170 * mm, 8 * mm, fill=1, stroke=0)
-        c.setFillColorRGB(0, 0, 0)
-
-        c.setFont(FONT_BOLD_NAME, 9)
-        c.drawString(22 * mm, current_y, "Lp.")
-        c.drawString(32 * mm, current_y, "Produkt")
-        c.drawRightString(105 * mm, current_y, "Ilość")
-        c.drawRightString(130 * mm, current_y, "Cena netto")
-        c.drawRightString(150 * mm, current_y, "VAT")
-        c.drawRightString(185 * mm, current_y, "Wartość brutto")
+        # Table header with gray background (shared form)
+        _static_form(c, "invoice_table_header", _draw_invoice_table_header, y=current_y,
+                     bbox=(0, -5 * mm, width, 10 * mm))
         current_y -= 8 * mm
 
         # Table rows
@@ -285,18 +470,187 @@ def generate_invoice_pdf(invoice: Invoice, items: List[InvoiceItem], out_path: P
     if y < y_signatures + 20 * mm:
         c.showPage()
     
-    c.setLineWidth(0.5)
-    c.setFont(FONT_REGULAR_NAME, 8)
+    _static_form(c, "invoice_signatures", _draw_invoice_signatures)
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+# =========================
+# WZ (WAREHOUSE RELEASE) DOCUMENTS
+# =========================
+
+# Quantities are floats (fractional units are allowed); whole ones print without ".0"
+def _format_quantity(value: Any) -> str:
+    try:
+        return f"{float(value):.3f}".rstrip("0").rstrip(".")
+    except (TypeError, ValueError):
+        return str(value or "")
+
+# WZ items table header, baseline at y=0
+def _draw_wz_table_header(c) -> None:
+    c.setFont(FONT_BOLD_NAME, 10)
+    c.drawString(20 * mm, 0, "Produkt")
+    c.drawString(95 * mm, 0, "Kod")
+    c.drawString(130 * mm, 0, "Ilość")
+    c.drawString(155 * mm, 0, "Lokalizacja")
+    c.line(20 * mm, -6 * mm, 190 * mm, -6 * mm)
+
+# WZ footer: remarks and signature fields, top line at y=0
+def _draw_wz_footer(c) -> None:
+    c.setFont(FONT_REGULAR_NAME, 10)
+    c.line(20 * mm, 0, 190 * mm, 0)
+    c.drawString(20 * mm, -8 * mm, "Uwagi: __________________________")
+    c.drawString(20 * mm, -23 * mm, "Wydal: __________________________")
+    c.drawString(110 * mm, -23 * mm, "Odebral: ________________________")
+
+def render_wz_pdf(doc: Any) -> bytes:
+    """Renders a WZ document (header, recipient, items with locations, signatures) to bytes."""
+    c, buffer = _new_canvas()
+    width, height = A4
+    y = height - 30 * mm
+
+    c.setFont(FONT_BOLD_NAME, 16)
+    c.drawString(20 * mm, y, f"Wydanie zewnętrzne WZ-{doc.id}")
+    y -= 10 * mm
+
+    c.setFont(FONT_REGULAR_NAME, 10)
     
-    # Left signature line
-    c.line(25 * mm, y_signatures, 85 * mm, y_signatures)
-    c.drawCentredString(55 * mm, y_signatures - 4 * mm, "Imię, nazwisko i podpis osoby")
-    c.drawCentredString(55 * mm, y_signatures - 8 * mm, "upoważnionej do wystawienia dokumentu")
+    date_str = doc.created_at.strftime('%Y-%m-%d') if doc.created_at else "BRAK DATY"
+    c.drawString(20 * mm, y, f"Data dokumentu: {date_str}")
+    y -= 6 * mm
+    
+    c.drawString(20 * mm, y, f"Odbiorca: {str(doc.buyer_name or '')}")
+    y -= 5 * mm
+    
+    if doc.shipping_address:
+        c.drawString(20 * mm, y, f"Adres dostawy: {doc.shipping_address}")
+        y -= 5 * mm
+    
+    y -= 5 * mm 
 
-    # Right signature line
-    c.line(125 * mm, y_signatures, 185 * mm, y_signatures)
-    c.drawCentredString(155 * mm, y_signatures - 4 * mm, "Imię, nazwisko i podpis osoby")
-    c.drawCentredString(155 * mm, y_signatures - 8 * mm, "upoważnionej do odebrania dokumentu")
+    _static_form(c, "wz_table_header", _draw_wz_table_header, y=y, bbox=(0, -8 * mm, width, 8 * mm))
+    y -= 12 * mm
+
+    c.setFont(FONT_REGULAR_NAME, 10)
+    
+    for it in doc.items:
+        name = str(it.product_name or "")
+        code = str(it.product_code or "")
+        qty  = _format_quantity(it.quantity)
+        loc  = str(it.location or "")
+
+        c.drawString(20 * mm, y, name[:45])
+        c.drawString(95 * mm, y, code[:20])
+        c.drawRightString(145 * mm, y, str(qty))
+        c.drawString(155 * mm, y, loc[:20])
+        y -= 6 * mm
+        if y < 30 * mm:
+            c.showPage()
+            y = height - 20 * mm
+            c.setFont(FONT_REGULAR_NAME, 10)
+
+    y -= 15 * mm
+    _static_form(c, "wz_footer", _draw_wz_footer, y=y, bbox=(0, -30 * mm, width, 5 * mm))
+    
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def generate_wz_pdf(doc: Any, out_path: Path) -> None:
+    """Renders the WZ PDF and writes it to out_path (atomically, downloads may serve it)."""
+    write_pdf_atomic(out_path, render_wz_pdf(doc))
+
+def wz_pdf_version(doc: Any) -> str:
+    """Content version of a WZ PDF (used as its ETag and in the cached file name)."""
+    lines = [(it.product_name, it.product_code, it.quantity, it.location) for it in doc.items]
+    data = [PDF_LAYOUT_VERSION, doc.id, str(doc.created_at), doc.buyer_name, doc.shipping_address, lines]
+    return hashlib.sha256(json.dumps(data, default=str).encode("utf-8")).hexdigest()[:20]
+
+def get_wz_pdf_path(doc_id: int, version: Optional[str] = None) -> Path:
+    """Returns the filesystem path for a WZ PDF (optionally a content version of it)."""
+    if version:
+        return WZ_DIR / f"WZ-{doc_id}-{version}.pdf"
+    return WZ_DIR / f"WZ-{doc_id}.pdf"
+
+def store_wz_pdf(doc_id: int, version: str, data: bytes) -> Path:
+    """Caches a rendered version of a WZ PDF and drops the older ones."""
+    path = get_wz_pdf_path(doc_id, version)
+    write_pdf_atomic(path, data)
+    # Older versions and the legacy unversioned file
+    for old in [get_wz_pdf_path(doc_id), *WZ_DIR.glob(f"WZ-{doc_id}-*.pdf")]:
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+def ensure_wz_pdf(doc: Any) -> Tuple[Path, str]:
+    """Returns (path, version) of the current WZ PDF, rendering and caching it only when missing."""
+    version = wz_pdf_version(doc)
+    path = get_wz_pdf_path(doc.id, version)
+    if not path.exists():
+        path = store_wz_pdf(doc.id, version, render_wz_pdf(doc))
+    return path, version
+
+# =========================
+# WAVE PICK LISTS
+# =========================
+
+# Pick list table header, baseline at y=0
+def _draw_wave_table_header(c) -> None:
+    c.setFont(FONT_BOLD_NAME, 10)
+    c.drawString(20 * mm, 0, "Lp.")
+    c.drawString(30 * mm, 0, "Lokalizacja")
+    c.drawString(62 * mm, 0, "Kod")
+    c.drawString(90 * mm, 0, "Produkt")
+    c.drawRightString(170 * mm, 0, "Ilość")
+    c.drawString(176 * mm, 0, "Pobr.")
+    c.line(20 * mm, -6 * mm, 190 * mm, -6 * mm)
+
+def render_wave_pdf(documents: List[Any], lines: List[Any], created_at: Any) -> bytes:
+    """
+    Renders a wave pick list: one row per product in pick path order, with a
+    tick box and the split of the quantity between the WZ documents.
+    """
+    c, buffer = _new_canvas()
+    width, height = A4
+    y = height - 30 * mm
+
+    c.setFont(FONT_BOLD_NAME, 16)
+    c.drawString(20 * mm, y, "Lista kompletacji (fala)")
+    y -= 10 * mm
+
+    c.setFont(FONT_REGULAR_NAME, 10)
+    c.drawString(20 * mm, y, f"Data: {created_at.strftime('%Y-%m-%d %H:%M')}")
+    y -= 6 * mm
+    doc_numbers = ", ".join(f"WZ-{doc.id}" for doc in documents)
+    c.drawString(20 * mm, y, f"Dokumenty ({len(documents)}): {doc_numbers[:110]}{'...' if len(doc_numbers) > 110 else ''}")
+    y -= 6 * mm
+    c.drawString(20 * mm, y, f"Pozycje: {len(lines)}   Sztuk razem: {_format_quantity(sum(line.quantity for line in lines))}")
+    y -= 10 * mm
+
+    _static_form(c, "wave_table_header", _draw_wave_table_header, y=y, bbox=(0, -8 * mm, width, 8 * mm))
+    y -= 12 * mm
+
+    for no, line in enumerate(lines, start=1):
+        if y < 30 * mm:
+            c.showPage()
+            y = height - 20 * mm
+            _static_form(c, "wave_table_header", _draw_wave_table_header, y=y, bbox=(0, -8 * mm, width, 8 * mm))
+            y -= 12 * mm
+        c.setFont(FONT_REGULAR_NAME, 10)
+        c.drawString(20 * mm, y, str(no))
+        c.drawString(30 * mm, y, str(line.location or "-")[:16])
+        c.drawString(62 * mm, y, str(line.product_code or "")[:14])
+        c.drawString(90 * mm, y, str(line.product_name or "")[:40])
+        c.setFont(FONT_BOLD_NAME, 10)
+        c.drawRightString(170 * mm, y, _format_quantity(line.quantity))
+        c.rect(178 * mm, y - 1 * mm, 4 * mm, 4 * mm, fill=0, stroke=1)
+        y -= 4.5 * mm
+        c.setFont(FONT_REGULAR_NAME, 8)
+        split = "  ".join(f"WZ-{a.document_id}: {_format_quantity(a.quantity)}" for a in line.allocations)
+        c.drawString(30 * mm, y, split[:120])
+        y -= 6 * mm
 
     c.showPage()
-    c.save()
\ No newline at end of file
+    c.save()
+    return buffer.getvalue()
@@ -0,0 +1,233 @@
+# backend/utils/pdf_storage.py
+"""
+Lifecycle of generated PDFs under storage/.
+
+Every file in storage/invoices and storage/wz can be regenerated from the
+database, so both directories are treated as a cache: serving a file refreshes
+its mtime (last access) and enforce_quota() evicts the least recently used
+files once their total size exceeds PDF_STORAGE_QUOTA_MB.
+
+Every issued invoice and correction additionally gets a pinned copy in
+storage/invoices/pinned: the document as issued, whatever its payment status.
+Pinned copies are never evicted and do not count towards the quota.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+STORAGE_ROOT = Path("storage")
+INVOICE_DIR = STORAGE_ROOT / "invoices"
+WZ_DIR = STORAGE_ROOT / "wz"
+PINNED_DIR = INVOICE_DIR / "pinned"
+
+# Cache areas subject to the quota (pinned/ is a subdirectory and is not scanned)
+CACHE_DIRS = {"invoices": INVOICE_DIR, "wz": WZ_DIR}
+
+# Eviction stops once usage drops to this fraction of the quota, so it does not run on every write
+EVICT_TO_FRACTION = 0.9
+# Leftover temp files of interrupted writes older than this are removed
+TMP_MAX_AGE_SECONDS = 3600
+
+_INVOICE_NAME = re.compile(r"^INV-(\d+)(?:-([0-9a-f]+))?\.pdf$")
+_WZ_NAME = re.compile(r"^WZ-(\d+)(?:-([0-9a-f]+))?\.pdf$")
+
+
+def touch(path: Path) -> None:
+    """Records an access to a cached PDF (mtime is the LRU clock)."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _cache_files() -> List[Tuple[Path, os.stat_result]]:
+    files = []
+    for directory in CACHE_DIRS.values():
+        if not directory.exists():
+            continue
+        for path in directory.glob("*.pdf"):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                pass
+    return files
+
+
+def _remove_stale_tmp() -> int:
+    removed = 0
+    cutoff = time.time() - TMP_MAX_AGE_SECONDS
+    for directory in [*CACHE_DIRS.values(), PINNED_DIR]:
+        if not directory.exists():
+            continue
+        for path in directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+_evict_lock = threading.Lock()
+
+def enforce_quota(quota_bytes: Optional[int] = None) -> dict:
+    """
+    Evicts least recently used cached PDFs while their total size exceeds the
+    quota (down to EVICT_TO_FRACTION of it). Returns what was reclaimed.
+    """
+    quota = settings.PDF_STORAGE_QUOTA_MB * 1024 * 1024 if quota_bytes is None else quota_bytes
+    with _evict_lock:
+        tmp_removed = _remove_stale_tmp()
+        files = _cache_files()
+        total = sum(st.st_size for _, st in files)
+        evicted_files = evicted_bytes = 0
+        if total > quota:
+            target = quota * EVICT_TO_FRACTION
+            for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                total -= st.st_size
+                evicted_files += 1
+                evicted_bytes += st.st_size
+    return {"evicted_files": evicted_files, "evicted_bytes": evicted_bytes, "total_bytes": total, "tmp_removed": tmp_removed}
+
+
+# =========================
+# PINNED (ISSUED) INVOICES
+# =========================
+
+def pinned_invoice_pdf(invoice_id: int) -> Optional[Tuple[Path, str]]:
+    """(path, version) of the pinned copy of an invoice, if it has one."""
+    if not PINNED_DIR.exists():
+        return None
+    for path in PINNED_DIR.glob(f"INV-{invoice_id}-*.pdf"):
+        match = _INVOICE_NAME.match(path.name)
+        if match and match.group(2):
+            return path, match.group(2)
+    return None
+
+
+def pin_invoice_pdf(invoice_id: int, version: str, data: bytes) -> Path:
+    """
+    Keeps a permanent copy of an issued invoice PDF. The first pinned version
+    is final: later calls return it unchanged.
+    """
+    existing = pinned_invoice_pdf(invoice_id)
+    if existing:
+        return existing[0]
+    PINNED_DIR.mkdir(parents=True, exist_ok=True)
+    path = PINNED_DIR / f"INV-{invoice_id}-{version}.pdf"
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+
+# =========================
+# METRICS
+# =========================
+
+def _area_stats(files: List[Tuple[Path, os.stat_result]]) -> dict:
+    mtimes = [st.st_mtime for _, st in files]
+    now = time.time()
+    return {
+        "files": len(files),
+        "bytes": sum(st.st_size for _, st in files),
+        "oldest_access_age_seconds": round(now - min(mtimes), 1) if mtimes else None,
+    }
+
+
+def storage_stats() -> dict:
+    """Disk usage of the PDF storage: cache areas vs quota, pinned copies and the free disk space."""
+    areas: Dict[str, dict] = {}
+    for area, directory in CACHE_DIRS.items():
+        files = []
+        if directory.exists():
+            for path in directory.glob("*.pdf"):
+                try:
+                    files.append((path, path.stat()))
+                except FileNotFoundError:
+                    pass
+        areas[area] = _area_stats(files)
+
+    pinned = []
+    if PINNED_DIR.exists():
+        pinned = [(p, p.stat()) for p in PINNED_DIR.glob("*.pdf")]
+
+    quota = settings.PDF_STORAGE_QUOTA_MB * 1024 * 1024
+    cache_bytes = sum(a["bytes"] for a in areas.values())
+    disk = shutil.disk_usage(STORAGE_ROOT if STORAGE_ROOT.exists() else Path("."))
+    return {
+        "areas": areas,
+        "pinned": _area_stats(pinned),
+        "cache_bytes": cache_bytes,
+        "quota_bytes": quota,
+        "quota_used_ratio": round(cache_bytes / quota, 4) if quota else None,
+        "disk_total_bytes": disk.total,
+        "disk_free_bytes": disk.free,
+    }
+
+
+# =========================
+# COMPACTION
+# =========================
+
+def compact(invoice_ids: set, wz_ids: set, purge_cache: bool = False, dry_run: bool = False) -> dict:
+    """
+    Reclaims space on an existing deployment:
+    - leftover temp files,
+    - PDFs of invoices / WZ documents that no longer exist,
+    - superseded versions of an invoice or WZ document (the most recently used
+      one is kept), including legacy unversioned INV-{id}.pdf / WZ-{id}.pdf files,
+    - with purge_cache, every regenerable PDF (pinned copies are always kept),
+    then applies the quota.
+    """
+    doomed: List[Tuple[Path, int]] = []
+    newest: Dict[Tuple[str, int], Tuple[Path, os.stat_result, tuple]] = {}
+
+    for path, st in _cache_files():
+        if purge_cache:
+            doomed.append((path, st.st_size))
+            continue
+        invoice_match = _INVOICE_NAME.match(path.name)
+        match = invoice_match or _WZ_NAME.match(path.name)
+        if not match:
+            continue
+        kind, doc_id = ("invoice" if invoice_match else "wz"), int(match.group(1))
+        if doc_id not in (invoice_ids if invoice_match else wz_ids):
+            doomed.append((path, st.st_size))
+            continue
+        # Versioned beats legacy; otherwise the later access wins
+        rank = (match.group(2) is not None, st.st_mtime)
+        kept = newest.get((kind, doc_id))
+        if kept is None:
+            newest[(kind, doc_id)] = (path, st, rank)
+            continue
+        if rank > kept[2]:
+            newest[(kind, doc_id)] = (path, st, rank)
+            doomed.append((kept[0], kept[1].st_size))
+        else:
+            doomed.append((path, st.st_size))
+
+    stats = {"removed_files": len(doomed), "removed_bytes": sum(size for _, size in doomed), "dry_run": dry_run}
+    if dry_run:
+        return stats
+
+    for path, _ in doomed:
+        path.unlink(missing_ok=True)
+    stats["quota"] = enforce_quota()
+    return stats
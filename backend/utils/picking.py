@@ -0,0 +1,93 @@
+# backend/utils/picking.py
+"""
+Wave picking: several open WZ documents picked in one walk through the warehouse.
+
+Lines of all documents in the wave are aggregated per product and sorted by
+the pick path over Product.location. A location reads as zone-aisle-shelf
+(e.g. "A-03-12", "Plac B1", "magazyn 2"): it is split into parts, numbers
+compare as numbers, and shelves run in a serpentine - up odd aisles, down even
+ones - so the picker never walks back to the head of an aisle.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentItem
+
+_PART = re.compile(r"\d+|[^\W\d_]+")
+
+
+# Quantity of a pick line taken for one document (for sorting goods into orders after the walk)
+@dataclass
+class WaveAllocation:
+    document_id: int
+    quantity: float
+
+
+# One stop of the pick walk: a product, where it is and how much of it the wave needs
+@dataclass
+class WaveLine:
+    product_id: Optional[int]
+    product_code: Optional[str]
+    product_name: str
+    location: Optional[str]
+    quantity: float = 0
+    allocations: List[WaveAllocation] = field(default_factory=list)
+
+
+def _part_key(part: str) -> Tuple[int, object]:
+    return (0, int(part)) if part.isdigit() else (1, part.lower())
+
+
+def location_path_key(location: Optional[str]) -> tuple:
+    """Sort key of a location along the pick path; lines without a location go last."""
+    parts = _PART.findall(location or "")
+    if not parts:
+        return (1,)
+    keys = [_part_key(p) for p in parts]
+    # zone-aisle-shelf with a numeric aisle and shelf: walk even aisles backwards
+    if len(keys) >= 3 and keys[1][0] == 0 and keys[2][0] == 0 and keys[1][1] % 2 == 0:
+        keys[2] = (0, -keys[2][1])
+    return (0, *keys)
+
+
+def build_wave(db: Session, documents: List[WarehouseDocument]) -> List[WaveLine]:
+    """Aggregates the lines of the given documents per product, in pick path order."""
+    doc_ids = [doc.id for doc in documents]
+    items = (
+        db.query(WarehouseDocumentItem)
+        .filter(WarehouseDocumentItem.document_id.in_(doc_ids))
+        .order_by(WarehouseDocumentItem.document_id, WarehouseDocumentItem.id)
+        .all()
+    )
+    product_ids = {it.product_id for it in items if it.product_id is not None}
+    # Current location from the catalog, the snapshot on the line for products that no longer exist
+    locations = dict(db.query(Product.id, Product.location).filter(Product.id.in_(product_ids)).all()) if product_ids else {}
+
+    lines: Dict[tuple, WaveLine] = {}
+    for it in items:
+        key = ("id", it.product_id) if it.product_id is not None else ("code", it.product_code, it.product_name)
+        line = lines.get(key)
+        if line is None:
+            location = locations.get(it.product_id) or it.location
+            line = lines[key] = WaveLine(it.product_id, it.product_code, it.product_name, location)
+        line.quantity += it.quantity
+        if line.allocations and line.allocations[-1].document_id == it.document_id:
+            line.allocations[-1].quantity += it.quantity
+        else:
+            line.allocations.append(WaveAllocation(it.document_id, it.quantity))
+
+    return sorted(lines.values(), key=lambda l: (location_path_key(l.location), l.product_code or "", l.product_name))
+
+
+def load_wave_documents(db: Session, doc_ids: List[int]) -> List[WarehouseDocument]:
+    """Documents of a wave in id order (missing ids are simply absent)."""
+    return (
+        db.query(WarehouseDocument)
+        .filter(WarehouseDocument.id.in_(doc_ids))
+        .order_by(WarehouseDocument.id)
+        .all()
+    )
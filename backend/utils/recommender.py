@@ -1,28 +1,47 @@
 # backend/utils/recommender.py
 
-import pandas as pd
-from sqlalchemy import create_engine
-from mlxtend.frequent_patterns import apriori, association_rules
 import os
 import sys
+import threading
+import logging
+import multiprocessing
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
 
 # Configure system path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Database connection configuration
 DATABASE_URL = "sqlite:///./database_warehouseapp.db"
-engine = create_engine(DATABASE_URL)
 
-def get_transaction_data() -> pd.DataFrame:
+# Resource limits for a single mining run (overridable via environment)
+MINING_TIMEOUT_SECONDS = float(os.getenv("RECOMMENDER_TIMEOUT_SECONDS", "60"))
+MINING_MEMORY_LIMIT_MB = int(os.getenv("RECOMMENDER_MEMORY_LIMIT_MB", "1024"))
+MINING_MAX_RULES = int(os.getenv("RECOMMENDER_MAX_RULES", "500"))
+# Mined rules are served from memory for this long before a run refreshes them
+RULES_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDER_CACHE_TTL_SECONDS", "900"))
+
+logger = logging.getLogger(__name__)
+
+# pandas/mlxtend are imported lazily so the API process never loads them;
+# all heavy work happens inside the mining worker process.
+
+def get_transaction_data():
     """Fetches sales data and transforms it into a One-Hot encoded basket format."""
+    import pandas as pd
+    from sqlalchemy import create_engine
+
     query = """
-    SELECT 
-        oi.order_id, 
-        p.name AS product_name 
+    SELECT
+        oi.order_id,
+        p.name AS product_name
     FROM order_items oi
     JOIN "products" p ON oi.product_id = p.id
     ORDER BY oi.order_id
     """
+    engine = create_engine(DATABASE_URL)
     try:
         data = pd.read_sql(query, engine)
         if data.empty:
@@ -30,41 +49,176 @@ def get_transaction_data() -> pd.DataFrame:
     except Exception as e:
         print(f"Recommender DB Error: {e}")
         return pd.DataFrame()
+    finally:
+        engine.dispose()
 
     # Pivot data: rows=orders, cols=products
     # Note: Using apply with map for binary conversion to ensure compatibility
     basket = (data.groupby(['order_id', 'product_name'])['product_name']
                 .count().unstack().fillna(0))
-    
+
     # Convert counts to binary (0/1) values
     basket = basket.apply(lambda x: x.map(lambda y: 1 if y > 0 else 0))
-    
+
     # Filter out orders with fewer than 2 items to ensure associations
     basket['__Total'] = basket.sum(axis=1)
     basket = basket[basket['__Total'] >= 2]
     basket.drop(columns=['__Total'], inplace=True)
-    
+
     return basket
 
-def generate_recommendations(min_support: float = 0.01, min_confidence: float = 0.2) -> pd.DataFrame:
+def generate_recommendations(min_support: float = 0.01, min_confidence: float = 0.2):
     """
     Generates association rules using the Apriori algorithm.
-    Function name unified with 'salesman.py'.
+    Returns a pandas DataFrame; runs in the calling process.
     """
+    import pandas as pd
+    from mlxtend.frequent_patterns import apriori, association_rules
+
     basket = get_transaction_data()
     if basket.empty:
         return pd.DataFrame()
-        
+
     # 1. Identify frequent itemsets
     frequent_itemsets = apriori(basket, min_support=min_support, use_colnames=True)
-    
+
     if frequent_itemsets.empty:
         return pd.DataFrame()
 
     # 2. Derive rules based on lift metric
     rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
-    
+
     # Sort by lift to prioritize strongest associations
     rules.sort_values('lift', ascending=False, inplace=True)
-    
-    return rules
\ No newline at end of file
+
+    return rules
+
+
+# =========================
+# ISOLATED MINING (PROCESS POOL)
+# =========================
+
+def _limit_worker_memory(limit_mb: int) -> None:
+    # Cap the address space of the mining process (POSIX only)
+    try:
+        import resource
+        limit = limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+def _mine_rules_job(min_support: float, min_confidence: float, max_rules: int) -> List[Dict[str, Any]]:
+    """Runs inside the worker process and returns only plain, picklable rule data."""
+    rules = generate_recommendations(min_support=min_support, min_confidence=min_confidence)
+    if rules.empty:
+        return []
+
+    results = []
+    for _, row in rules.head(max_rules).iterrows():
+        results.append({
+            "product_in": sorted(row['antecedents']),
+            "product_out": sorted(row['consequents']),
+            "confidence": float(row['confidence']),
+            "lift": float(row['lift']),
+        })
+    return results
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Lazily start a single-worker pool; each worker process serves one job and exits,
+    # so DataFrame memory is returned to the OS after every run
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_memory,
+                initargs=(MINING_MEMORY_LIMIT_MB,),
+                max_tasks_per_child=1,
+            )
+        return _pool
+
+def _reset_pool(expected: Optional[ProcessPoolExecutor] = None) -> None:
+    # Drop a pool whose worker hung or crashed so the next call starts fresh
+    # (only if it is still the expected one, a newer pool is left alone)
+    global _pool
+    with _pool_lock:
+        if expected is not None and _pool is not expected:
+            return
+        pool, _pool = _pool, None
+    with _cache_lock:
+        _inflight.clear()
+    if pool is not None:
+        for proc in list(getattr(pool, "_processes", {}).values()):
+            proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Last mined rule set and the run in flight, per (min_support, min_confidence)
+_rules_cache: Dict[Tuple[float, float], Tuple[float, List[Dict[str, Any]]]] = {}
+_inflight: Dict[Tuple[float, float], Tuple[float, Future, ProcessPoolExecutor]] = {}
+_cache_lock = threading.Lock()
+
+def _store_rules(key: Tuple[float, float], future: Future) -> None:
+    # Done callback of a mining run: keep its result, forget the run
+    with _cache_lock:
+        if key in _inflight and _inflight[key][1] is future:
+            del _inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        _rules_cache[key] = (time.monotonic(), future.result())
+
+def mine_rules(min_support: float = 0.01, min_confidence: float = 0.2,
+               timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Returns association rules mined in a separate process with memory and time limits.
+
+    Rules are cached for RULES_CACHE_TTL_SECONDS. Concurrent callers share one
+    mining run; once a rule set exists, an expired one is returned while the
+    refresh runs in the background. Only callers without any rule set block
+    (the caller, not the GIL) until the run finishes.
+    """
+    key = (min_support, min_confidence)
+    limit = timeout or MINING_TIMEOUT_SECONDS
+    with _cache_lock:
+        cached = _rules_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < RULES_CACHE_TTL_SECONDS:
+            return cached[1]
+        run = _inflight.get(key)
+        if run is None:
+            pool = _get_pool()
+            future = pool.submit(_mine_rules_job, min_support, min_confidence, MINING_MAX_RULES)
+            run = _inflight[key] = (time.monotonic(), future, pool)
+        else:
+            future = None
+    if future is not None:
+        future.add_done_callback(lambda f: _store_rules(key, f))
+    started, future, pool = run
+    if cached is not None:
+        # Nobody waits on a background refresh, so a hung one is terminated here
+        if time.monotonic() - started > limit:
+            logger.error("Recommendation mining exceeded %ss, terminating worker", limit)
+            _reset_pool(pool)
+        return cached[1]
+
+    # The limit runs from the submission of the shared run, so every waiter gives up at the same time
+    try:
+        return future.result(timeout=max(0.0, started + limit - time.monotonic()))
+    except FutureTimeoutError:
+        logger.error("Recommendation mining exceeded %ss, terminating worker", limit)
+        _reset_pool(pool)
+        raise
+    except BrokenProcessPool:
+        # Worker died (e.g. hit the memory limit); the pool is unusable afterwards
+        logger.error("Recommendation mining worker crashed, restarting pool")
+        _reset_pool(pool)
+        raise
+    except CancelledError:
+        # Another waiter of the same run already terminated it
+        raise FutureTimeoutError()
+
+def shutdown_pool() -> None:
+    """Stops the mining pool on application shutdown."""
+    _reset_pool()
@@ -27,22 +27,25 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Retrieve the currently authenticated user based on the JWT token
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db)
-):
-    token = credentials.credentials
-    credentials_exception = HTTPException(
+# Short-lived token usable for one purpose only (e.g. a query-string token where no header can be sent)
+def create_scoped_token(email: str, scope: str, expires_seconds: int) -> str:
+    return create_access_token({"sub": email, "scope": scope}, timedelta(seconds=expires_seconds))
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Resolve the user of a token; scope=None accepts only regular access tokens
+def _user_from_token(token: str, db: Session, scope: str = None):
+    credentials_exception = _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        # Ensure email is present in the token payload
-        if email is None:
+        # Ensure email is present in the token payload, and a scoped token is not used elsewhere
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
@@ -52,6 +55,19 @@ def get_current_user(
         raise credentials_exception
     return user
 
+# Retrieve the user of a scoped token (see create_scoped_token)
+def get_scoped_user(token: str, scope: str, db: Session):
+    if not token:
+        raise _credentials_exception()
+    return _user_from_token(token, db, scope)
+
+# Retrieve the currently authenticated user based on the JWT token
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: Session = Depends(get_db)
+):
+    return _user_from_token(credentials.credentials, db)
+
 # Dependency factory for Role-Based Access Control
 def role_required(*allowed_roles):
     def _checker(current_user = Depends(get_current_user)):
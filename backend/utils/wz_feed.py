@@ -0,0 +1,289 @@
+# backend/utils/wz_feed.py
+"""
+Live count of active WZ documents (NEW + IN_PROGRESS) and a feed of WZ events
+for warehouse terminals (GET /warehouse-documents/feed, Server-Sent Events).
+
+Changes are recorded on the DB session that makes them (new documents
+automatically, status changes via record_status_change) and written to the
+warehouse_document_events outbox in the same transaction, so rolled back
+changes are never announced. The committing process pushes them to its own
+terminals right after the commit.
+
+Events committed by other processes (the job worker, other API workers) are
+picked up from the outbox by pump(), which the API process' worker thread
+calls on every turn of its loop. It reads nothing while no terminal is
+connected, and at most one primary-key range per JOBS_POLL_SECONDS otherwise.
+
+The count lives in memory of the API process. resync() recounts it from the
+database on first use and every WZ_COUNTER_RESYNC_SECONDS while terminals are
+connected. Outbox ids are the commit sequence: a count is only kept if no event
+committed or was applied while it ran, so no delta is lost or applied twice.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session, object_session
+
+from config import settings
+from database import SessionLocal
+from models.WarehouseDoc import WarehouseDocument, WarehouseDocumentEvent, WarehouseStatus
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (WarehouseStatus.NEW, WarehouseStatus.IN_PROGRESS)
+# Events kept per subscriber; a terminal that falls further behind misses events (not the count)
+QUEUE_SIZE = 100
+# Attempts of resync() when events keep arriving during the count
+RESYNC_ATTEMPTS = 3
+
+ORIGIN = f"{socket.gethostname()}-{os.getpid()}"
+
+_lock = threading.Lock()
+_active: Optional[int] = None
+_counted_through: Optional[int] = None # Highest outbox id included in the last count
+_cursor: Optional[int] = None # Highest outbox id read by pump()
+_counted_at: Optional[float] = None # time.monotonic() of the last count
+_generation = 0 # Bumped by every applied event; a count that overlaps one is discarded
+_next_pump = 0.0
+_subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+_PENDING_KEY = "wz_feed_events"
+_COMMITTED_KEY = "wz_feed_committed"
+
+
+def _is_active(status) -> bool:
+    return status in ACTIVE_STATUSES
+
+
+# =========================
+# RECORDING (IN THE TRANSACTION)
+# =========================
+
+def _record(session: Session, payload: dict, delta: int) -> None:
+    session.info.setdefault(_PENDING_KEY, []).append((payload, delta))
+
+
+def _created(doc: WarehouseDocument) -> Tuple[dict, int]:
+    status = doc.status or WarehouseStatus.NEW
+    return {
+        "type": "created", "id": doc.id, "status": status.value, "buyer_name": doc.buyer_name,
+        "invoice_id": doc.invoice_id, "created_at": str(doc.created_at) if doc.created_at else None,
+    }, 1 if _is_active(status) else 0
+
+
+@event.listens_for(WarehouseDocument, "after_insert")
+def _record_created(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    _record(session, *_created(target))
+
+
+def record_status_change(db: Session, changes: Dict[WarehouseStatus, Iterable[int]], new_status: WarehouseStatus) -> None:
+    """Records documents moved to new_status, grouped by their previous status."""
+    ids: List[int] = []
+    delta = 0
+    for old_status, doc_ids in changes.items():
+        doc_ids = list(doc_ids)
+        if old_status == new_status or not doc_ids:
+            continue
+        ids.extend(doc_ids)
+        delta += (int(_is_active(new_status)) - int(_is_active(old_status))) * len(doc_ids)
+    if ids:
+        _record(db, {"type": "status", "ids": sorted(ids), "status": new_status.value}, delta)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_outbox(session):
+    # The commit would flush anyway; flushing first lets after_insert record new documents
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    stmt = insert(WarehouseDocumentEvent).returning(WarehouseDocumentEvent.id)
+    session.info[_COMMITTED_KEY] = [
+        (session.execute(stmt.values(payload=payload, delta=delta, origin=ORIGIN)).scalar_one(), payload, delta)
+        for payload, delta in pending
+    ]
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for event_id, payload, delta in session.info.pop(_COMMITTED_KEY, None) or ():
+        _publish(event_id, payload, delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTED_KEY, None)
+
+
+# =========================
+# COUNTER + FAN-OUT
+# =========================
+
+def _offer(queue: asyncio.Queue, message: dict) -> None:
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+def _broadcast(message: dict) -> None:
+    with _lock:
+        subscribers = list(_subscribers)
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(_offer, queue, message)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+def _apply(event_id: int, payload: dict, delta: int) -> Optional[dict]:
+    # Under _lock: the message to push, or None when the last count already includes the event
+    global _active, _generation
+    if _counted_through is not None and event_id <= _counted_through:
+        return None
+    _generation += 1
+    if _active is not None:
+        _active = max(0, _active + delta)
+    return dict(payload, active=_active)
+
+def _publish(event_id: int, payload: dict, delta: int) -> None:
+    with _lock:
+        message = _apply(event_id, payload, delta)
+    if message is not None:
+        _broadcast(message)
+
+
+def _last_event_id(db: Session) -> int:
+    return db.query(func.max(WarehouseDocumentEvent.id)).scalar() or 0
+
+
+def resync() -> int:
+    """Recounts active documents in the database; pushes the count if it drifted."""
+    global _active, _counted_through, _cursor, _counted_at
+    for _ in range(RESYNC_ATTEMPTS):
+        with _lock:
+            generation = _generation
+        db = SessionLocal()
+        try:
+            # Events up to `before` are in the count; the count is ambiguous about any event after it
+            before = _last_event_id(db)
+            count = db.query(WarehouseDocument).filter(WarehouseDocument.status.in_(ACTIVE_STATUSES)).count()
+            after = _last_event_id(db)
+        finally:
+            db.close()
+        with _lock:
+            if before == after and generation == _generation:
+                break
+    else:
+        # Busy: keep the last count, or take this one as a start; the next resync corrects it
+        with _lock:
+            if _active is not None:
+                return _active
+    with _lock:
+        drifted = _active is not None and _active != count
+        _active, _counted_through, _counted_at = count, before, time.monotonic()
+        _cursor = max(_cursor or 0, before)
+    if drifted:
+        _broadcast({"type": "count", "active": count})
+    return count
+
+
+def active_count() -> int:
+    """Current number of active documents, from memory (recounted when older than WZ_COUNTER_RESYNC_SECONDS)."""
+    with _lock:
+        active, counted_at = _active, _counted_at
+    if active is None or time.monotonic() - counted_at >= settings.WZ_COUNTER_RESYNC_SECONDS:
+        return resync()
+    return active
+
+
+def pump() -> int:
+    """
+    Pushes events committed by other processes to this process' terminals;
+    returns how many. Called from the worker loop of the API process, it does
+    nothing while no terminal is connected and reads at most once per
+    JOBS_POLL_SECONDS.
+    """
+    global _cursor, _next_pump
+    with _lock:
+        if not _subscribers or time.monotonic() < _next_pump:
+            return 0
+        _next_pump = time.monotonic() + settings.JOBS_POLL_SECONDS
+    active_count()  # recounts (and moves the cursor) when the count is stale
+    with _lock:
+        cursor = _cursor
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(WarehouseDocumentEvent.id, WarehouseDocumentEvent.payload, WarehouseDocumentEvent.delta,
+                     WarehouseDocumentEvent.origin)
+            .filter(WarehouseDocumentEvent.id > cursor).order_by(WarehouseDocumentEvent.id).all()
+        )
+    finally:
+        db.close()
+    messages = []
+    with _lock:
+        for event_id, payload, delta, origin in rows:
+            # This process' own events are pushed by _publish_committed
+            if origin != ORIGIN:
+                message = _apply(event_id, payload, delta)
+                if message is not None:
+                    messages.append(message)
+        if rows:
+            _cursor = max(_cursor, rows[-1].id)
+    for message in messages:
+        _broadcast(message)
+    return len(messages)
+
+
+def purge_events(db: Session) -> int:
+    """Deletes outbox events older than WZ_FEED_EVENT_RETENTION_SECONDS; returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.WZ_FEED_EVENT_RETENTION_SECONDS)
+    return (
+        db.query(WarehouseDocumentEvent)
+        .filter(WarehouseDocumentEvent.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+
+
+# =========================
+# SSE STREAM
+# =========================
+
+def _sse(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+
+
+async def feed_events(request) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one terminal: the current count first, then every
+    committed WZ event; comment lines keep idle connections open.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    subscriber = (asyncio.get_running_loop(), queue)
+    with _lock:
+        _subscribers.add(subscriber)
+    try:
+        active = await asyncio.to_thread(active_count)
+        yield _sse({"type": "count", "active": active})
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.WZ_FEED_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(message)
+    finally:
+        with _lock:
+            _subscribers.discard(subscriber)
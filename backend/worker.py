@@ -0,0 +1,165 @@
+# backend/worker.py
+"""
+Job worker: runs queued jobs (utils/jobs.py) and periodic maintenance.
+
+The API starts one embedded worker thread unless JOBS_EMBEDDED_WORKER is off;
+dedicated workers can be started with:
+
+    python worker.py [--threads N]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import settings
+from database import SessionLocal, init_db
+from utils.jobs import run_next, purge_finished
+from utils.inventory import expire_reservations
+from utils.idempotency import purge_expired as purge_idempotency_keys
+from utils.cart_cleanup import cleanup_carts
+from utils.audit import write_log
+from utils.pdf import init_fonts
+from utils.pdf_storage import enforce_quota
+from utils import wz_feed
+
+# Modules that register job handlers
+import routes.invoice  # noqa: F401
+import routes.warehouse  # noqa: F401
+from routes.payu import process_pending_notifications
+
+logger = logging.getLogger(__name__)
+
+
+# Expire checkout stock reservations past their TTL
+def _sweep_reservations() -> int:
+    db = SessionLocal()
+    try:
+        swept = expire_reservations(db)
+        db.commit()
+        return swept
+    finally:
+        db.close()
+
+# Drop finished jobs past the retention window
+def _purge_jobs() -> int:
+    db = SessionLocal()
+    try:
+        removed = purge_finished(db)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+# Expire abandoned carts and delete retired ones; reclaimed rows are recorded in the audit log
+def _cleanup_carts() -> dict:
+    db = SessionLocal()
+    try:
+        stats = cleanup_carts(db)
+        if stats["expired_carts"] or stats["deleted_carts"]:
+            logger.info("Cart cleanup: %s", stats)
+            write_log(db, user_id=None, action="CART_CLEANUP", resource="carts", status="SUCCESS", meta=stats)
+        return stats
+    finally:
+        db.close()
+
+# Evict least recently used cached PDFs beyond the storage quota
+def _enforce_pdf_quota() -> dict:
+    stats = enforce_quota()
+    if stats["evicted_files"]:
+        logger.info("PDF storage quota: %s", stats)
+    return stats
+
+# Drop WZ feed events past the retention window
+def _purge_wz_events() -> int:
+    db = SessionLocal()
+    try:
+        removed = wz_feed.purge_events(db)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+# (name, interval in seconds, function)
+PERIODIC_TASKS = [
+    ("Reservation sweep", settings.RESERVATION_SWEEP_SECONDS, _sweep_reservations),
+    ("PayU notification retry", settings.PAYU_NOTIFY_SWEEP_SECONDS, process_pending_notifications),
+    ("Idempotency key purge", settings.IDEMPOTENCY_PURGE_SECONDS, purge_idempotency_keys),
+    ("Job purge", settings.JOBS_PURGE_SECONDS, _purge_jobs),
+    ("Cart cleanup", settings.CART_CLEANUP_SECONDS, _cleanup_carts),
+    ("PDF storage quota", settings.PDF_STORAGE_SWEEP_SECONDS, _enforce_pdf_quota),
+    ("WZ event purge", settings.WZ_FEED_PURGE_SECONDS, _purge_wz_events),
+]
+
+
+def run_worker(stop: threading.Event, worker_id: str, run_periodic: bool = True, run_jobs: bool = True,
+               serve_feed: bool = False) -> None:
+    """
+    Processes jobs until `stop` is set; sleeps JOBS_POLL_SECONDS when the queue is empty.
+    With serve_feed (the API process) it also pushes WZ events committed by other
+    processes to the terminals connected to this process (utils/wz_feed.py).
+    """
+    next_run = {name: time.monotonic() + interval for name, interval, _ in PERIODIC_TASKS}
+    while not stop.is_set():
+        if run_periodic:
+            for name, interval, func in PERIODIC_TASKS:
+                if time.monotonic() >= next_run[name]:
+                    next_run[name] = time.monotonic() + interval
+                    try:
+                        func()
+                    except Exception as e:
+                        logger.exception("%s failed: %s", name, e)
+
+        if serve_feed:
+            try:
+                wz_feed.pump()
+            except Exception as e:
+                logger.exception("WZ feed failed: %s", e)
+
+        worked = False
+        if run_jobs:
+            try:
+                worked = run_next(worker_id)
+            except Exception as e:
+                logger.exception("Job worker %s error: %s", worker_id, e)
+        if not worked:
+            stop.wait(settings.JOBS_POLL_SECONDS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warehouse App job worker")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker threads")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    init_db()
+    init_fonts()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(target=run_worker, args=(stop, f"{base_id}-{i}", i == 0), daemon=True)
+        for i in range(max(args.threads, 1))
+    ]
+    for t in threads:
+        t.start()
+    logger.info("Job worker started with %s thread(s)", len(threads))
+
+    while not stop.is_set():
+        stop.wait(1)
+    for t in threads:
+        t.join(timeout=settings.JOBS_POLL_SECONDS + 5)
+
+
+if __name__ == "__main__":
+    main()
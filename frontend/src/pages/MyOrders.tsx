@@ -44,6 +44,7 @@ function OrderCard({ order }: { order: Order }) {
     pending: "Oczekujące",
     pending_payment: "W trakcie realizacji",
     processing: "W trakcie realizacji",
+    awaiting_stock: "Opłacone, oczekuje na towar",
     shipped: "Wysłane",
     cancelled: "Anulowane",
     CANCELLED: "Anulowane",
@@ -99,7 +100,7 @@ function OrderCard({ order }: { order: Order }) {
         </div>
         <div className="flex justify-between items-center">
           <span className={`px-3 py-1 rounded-full text-sm font-semibold ${
-            normalize(order.status) === 'pending' ? 'bg-yellow-100 text-yellow-800' :
+            (normalize(order.status) === 'pending' || normalize(order.status) === 'awaiting_stock') ? 'bg-yellow-100 text-yellow-800' :
             normalize(order.status) === 'shipped' ? 'bg-green-100 text-green-800' :
             (normalize(order.status) === 'cancelled' || normalize(order.status) === 'CANCELLED') ? 'bg-red-100 text-red-800' :
             (normalize(order.status) === 'processing' || normalize(order.status) === 'pending_payment') ? 'bg-blue-100 text-blue-800' :
@@ -1,4 +1,4 @@
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { api } from "../lib/api";
 import { ArrowUpDown, ArrowLeft, Loader2, Download, Package } from "lucide-react"; 
 import { useSearchParams } from "react-router-dom"; 
@@ -190,16 +190,6 @@ export default function WZPage() {
   const docIdParam = searchParams.get('doc_id');
   const currentDocId = docIdParam ? parseInt(docIdParam, 10) : null;
 
-  // === USE NEW ENDPOINT ===
-  const fetchActiveCount = useCallback(async () => {
-      try {
-          const res = await api.get<{ total: number }>("/warehouse-documents/active-count");
-          setActiveCount(res.data.total);
-      } catch (err) {
-          console.error("Błąd pobierania licznika WZ", err);
-      }
-  }, []);
-
   const handleViewDetail = useCallback((id: number) => {
       setSearchParams({ doc_id: String(id) });
   }, [setSearchParams]);
@@ -249,11 +239,53 @@ export default function WZPage() {
   }, [buyer, status, fromDt, toDt, sortBy, order, page, currentDocId]);
 
   useEffect(() => {
-      if (!currentDocId) {
-          load();
-          fetchActiveCount();
-      }
-  }, [currentDocId, fetchActiveCount, load]);
+      if (!currentDocId) load();
+  }, [currentDocId, load]);
+
+  // === LIVE FEED (counter + list refresh, no polling) ===
+  const loadRef = useRef(load);
+  loadRef.current = load;
+
+  useEffect(() => {
+      let source: EventSource | null = null;
+      let retry: ReturnType<typeof setTimeout> | undefined;
+      let closed = false;
+
+      const onEvent = (refresh: boolean) => (e: MessageEvent) => {
+          const data = JSON.parse(e.data);
+          if (data.active != null) setActiveCount(data.active);
+          if (refresh) loadRef.current();
+      };
+
+      // EventSource cannot send the Authorization header: a short-lived token goes in the URL
+      const connect = async () => {
+          try {
+              const res = await api.post<{ token: string }>("/warehouse-documents/feed-token");
+              if (closed) return;
+              source = new EventSource(
+                  `${api.defaults.baseURL}/warehouse-documents/feed?token=${encodeURIComponent(res.data.token)}`
+              );
+              source.addEventListener("count", onEvent(false));
+              source.addEventListener("created", onEvent(true));
+              source.addEventListener("status", onEvent(true));
+              // The token is only valid for a minute, so reconnect with a fresh one instead of the built-in retry
+              source.onerror = () => {
+                  source?.close();
+                  if (!closed) retry = setTimeout(connect, 5000);
+              };
+          } catch (err) {
+              console.error("Błąd połączenia z kanałem WZ", err);
+              if (!closed) retry = setTimeout(connect, 5000);
+          }
+      };
+
+      connect();
+      return () => {
+          closed = true;
+          clearTimeout(retry);
+          source?.close();
+      };
+  }, []);
 
   useEffect(() => {
     const timeout = setTimeout(() => {
@@ -269,19 +301,13 @@ export default function WZPage() {
       if (!currentDocId) load(); 
   }, [page]);
 
-  useEffect(() => {
-      fetchActiveCount();
-  }, [fetchActiveCount]);
-  
   const changeStatus = async (id: number, newStatus: WZStatus) => {
     try {
       await api.patch(`/warehouse-documents/${id}/status`, { status: newStatus });
       toast.success(`Status WZ ${id} zmieniony na ${newStatus}`);
       
+      // The counter is updated by the live feed
       setRows((r) => r.map((x) => (x.id === id ? { ...x, status: newStatus } : x)));
-      
-      // Refresh counter after status change
-      await fetchActiveCount(); 
     } catch {
       toast.error("Nie udało się zmienić statusu");
     }